@@ -1,10 +1,12 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import PokemonType, Pokemon, Evolution, BattleHistory
+from .models import PokemonType, Pokemon, PokemonAlias, Evolution, BattleHistory, MatchupMatrix
 
 admin.site.register(PokemonType)
 admin.site.register(Pokemon)
+admin.site.register(PokemonAlias)
 admin.site.register(Evolution)
 admin.site.register(BattleHistory)
+admin.site.register(MatchupMatrix)
 
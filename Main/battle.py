@@ -0,0 +1,280 @@
+# battle.py
+import random
+import secrets
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+
+from .battle_log import CPU, USER, BattleEvent, decode_battle, decode_teams, render_battle_log
+from .snapshot import STAT_NAMES, get_snapshot
+
+
+# Verze pravidel bitvy; uložená bitva se přehrává enginem své verze
+ENGINE_VERSION = 2
+
+# Strop kol celé bitvy; bitva, která ho dosáhne, končí remízou
+MAX_TURNS = 200
+
+# Zjednodušená type effectiveness enginu verze 1
+LEGACY_TYPE_CHART = {
+    'fire': {'grass': 2.0, 'water': 0.5, 'fire': 0.5},
+    'water': {'fire': 2.0, 'grass': 0.5, 'water': 0.5},
+    'grass': {'water': 2.0, 'fire': 0.5, 'grass': 0.5},
+    'electric': {'water': 2.0, 'grass': 0.5, 'electric': 0.5},
+}
+
+# Všech 18 typů v pořadí PokeAPI; pořadí určuje index do TYPE_MATRIX
+TYPES = (
+    'normal', 'fighting', 'flying', 'poison', 'ground', 'rock', 'bug', 'ghost', 'steel',
+    'fire', 'water', 'grass', 'electric', 'psychic', 'ice', 'dragon', 'dark', 'fairy',
+)
+TYPE_INDEX = {name: i for i, name in enumerate(TYPES)}
+
+# Násobky poškození odlišné od 1 (útočící typ -> bránící typ)
+TYPE_CHART = {
+    'normal': {'rock': 0.5, 'ghost': 0.0, 'steel': 0.5},
+    'fighting': {'normal': 2.0, 'flying': 0.5, 'poison': 0.5, 'rock': 2.0, 'bug': 0.5, 'ghost': 0.0,
+                 'steel': 2.0, 'psychic': 0.5, 'ice': 2.0, 'dark': 2.0, 'fairy': 0.5},
+    'flying': {'fighting': 2.0, 'rock': 0.5, 'bug': 2.0, 'steel': 0.5, 'grass': 2.0, 'electric': 0.5},
+    'poison': {'poison': 0.5, 'ground': 0.5, 'rock': 0.5, 'ghost': 0.5, 'steel': 0.0, 'grass': 2.0, 'fairy': 2.0},
+    'ground': {'flying': 0.0, 'poison': 2.0, 'rock': 2.0, 'bug': 0.5, 'steel': 2.0, 'fire': 2.0,
+               'grass': 0.5, 'electric': 2.0},
+    'rock': {'fighting': 0.5, 'flying': 2.0, 'ground': 0.5, 'bug': 2.0, 'steel': 0.5, 'fire': 2.0, 'ice': 2.0},
+    'bug': {'fighting': 0.5, 'flying': 0.5, 'poison': 0.5, 'ghost': 0.5, 'steel': 0.5, 'fire': 0.5,
+            'grass': 2.0, 'psychic': 2.0, 'dark': 2.0, 'fairy': 0.5},
+    'ghost': {'normal': 0.0, 'ghost': 2.0, 'psychic': 2.0, 'dark': 0.5},
+    'steel': {'rock': 2.0, 'steel': 0.5, 'fire': 0.5, 'water': 0.5, 'electric': 0.5, 'ice': 2.0, 'fairy': 2.0},
+    'fire': {'rock': 0.5, 'bug': 2.0, 'steel': 2.0, 'fire': 0.5, 'water': 0.5, 'grass': 2.0, 'ice': 2.0,
+             'dragon': 0.5},
+    'water': {'ground': 2.0, 'rock': 2.0, 'fire': 2.0, 'water': 0.5, 'grass': 0.5, 'dragon': 0.5},
+    'grass': {'flying': 0.5, 'poison': 0.5, 'ground': 2.0, 'rock': 2.0, 'bug': 0.5, 'steel': 0.5,
+              'fire': 0.5, 'water': 2.0, 'grass': 0.5, 'dragon': 0.5},
+    'electric': {'flying': 2.0, 'ground': 0.0, 'water': 2.0, 'grass': 0.5, 'electric': 0.5, 'dragon': 0.5},
+    'psychic': {'fighting': 2.0, 'poison': 2.0, 'steel': 0.5, 'psychic': 0.5, 'dark': 0.0},
+    'ice': {'flying': 2.0, 'ground': 2.0, 'steel': 0.5, 'fire': 0.5, 'water': 0.5, 'grass': 2.0,
+            'ice': 0.5, 'dragon': 2.0},
+    'dragon': {'steel': 0.5, 'dragon': 2.0, 'fairy': 0.0},
+    'dark': {'fighting': 0.5, 'ghost': 2.0, 'psychic': 2.0, 'dark': 0.5, 'fairy': 0.5},
+    'fairy': {'fighting': 2.0, 'poison': 0.5, 'steel': 0.5, 'fire': 0.5, 'dragon': 2.0, 'dark': 2.0},
+}
+
+# Plochá matice 18×18: TYPE_MATRIX[útočník * len(TYPES) + obránce]
+TYPE_MATRIX = array('d', [1.0] * len(TYPES) ** 2)
+for _attacking, _row in TYPE_CHART.items():
+    for _defending, _multiplier in _row.items():
+        TYPE_MATRIX[TYPE_INDEX[_attacking] * len(TYPES) + TYPE_INDEX[_defending]] = _multiplier
+
+
+class BattleResult(NamedTuple):
+    result: str
+    events: List[BattleEvent]
+    user_hp: List[int]
+    cpu_hp: List[int]
+
+
+def new_seed() -> int:
+    """Náhodný seed nové bitvy"""
+    return secrets.randbits(32)
+
+
+def base_stat(pokemon: Dict, name: str) -> int:
+    return next(stat['base_stat'] for stat in pokemon['stats'] if stat['stat']['name'] == name)
+
+
+def calculate_attack(attacker: Dict, defender: Dict, rng: random.Random) -> int:
+    """Výpočet útoku s type effectiveness"""
+    attack = base_stat(attacker, 'attack')
+    defense = base_stat(defender, 'defense')
+
+    # Základní damage
+    damage = max(0, attack - defense + rng.randint(-5, 5))
+
+    effectiveness = 1.0
+    for att_type in (t['type']['name'] for t in attacker.get('types', [])):
+        for def_type in (t['type']['name'] for t in defender.get('types', [])):
+            effectiveness *= LEGACY_TYPE_CHART.get(att_type, {}).get(def_type, 1.0)
+
+    return int(damage * effectiveness)
+
+
+def run_battle(user_team: List[Dict], cpu_team: List[Dict], rng: random.Random, max_turns=MAX_TURNS) -> BattleResult:
+    """
+    Engine verze 1. Odehraje bitvu týmů (slovníky ve formátu API) v pořadí nasazení.
+    Veškerá náhoda jde z `rng`, takže stejné týmy a seed dají vždy stejnou bitvu.
+    V každém kole útočí nejdřív rychlejší Pokémon (při shodě uživatel), poražený
+    je nahrazen dalším z týmu.
+    """
+    teams = (user_team, cpu_team)
+    hp = ([base_stat(p, 'hp') for p in user_team], [base_stat(p, 'hp') for p in cpu_team])
+    active = [0, 0]
+    events = []
+    turn = 0
+
+    while active[USER] < len(user_team) and active[CPU] < len(cpu_team) and turn < max_turns:
+        turn += 1
+        user_speed = base_stat(user_team[active[USER]], 'speed')
+        cpu_speed = base_stat(cpu_team[active[CPU]], 'speed')
+        first = USER if user_speed >= cpu_speed else CPU
+
+        for side in (first, 1 - first):
+            other = 1 - side
+            damage = calculate_attack(teams[side][active[side]], teams[other][active[other]], rng)
+            hp[other][active[other]] = max(0, hp[other][active[other]] - damage)
+            events.append(BattleEvent(turn, side, active[side], damage, hp[other][active[other]]))
+            if hp[other][active[other]] == 0:
+                active[other] += 1
+                break
+
+    if active[USER] >= len(user_team):
+        result = 'lose'
+    elif active[CPU] >= len(cpu_team):
+        result = 'win'
+    else:
+        result = 'draw'
+    return BattleResult(result, events, hp[USER], hp[CPU])
+
+
+class Combatant:
+    """Pokémon připravený do bitvy: předpočítané statistiky a indexy typů do TYPE_MATRIX"""
+    __slots__ = ('pokedex_id', 'name', 'stats', 'hp', 'attack', 'defense', 'speed', 'types')
+
+    def __init__(self, pokedex_id: int, name: str, stats: tuple, type_names):
+        self.pokedex_id = pokedex_id
+        self.name = name
+        self.stats = stats
+        self.hp, self.attack, self.defense, _, _, self.speed = stats
+        self.types = tuple(TYPE_INDEX[t] for t in type_names if t in TYPE_INDEX)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, i) -> 'Combatant':
+        return cls(snapshot.pokedex_ids[i], snapshot.names[i], snapshot.stats_of(i), snapshot.type_names_of(i))
+
+    @classmethod
+    def from_api(cls, data: Dict) -> 'Combatant':
+        stats = {stat['stat']['name']: stat['base_stat'] for stat in data['stats']}
+        return cls(
+            data['id'], data['name'], tuple(stats.get(name, 0) for name in STAT_NAMES),
+            [t['type']['name'] for t in data.get('types', [])],
+        )
+
+
+def effectiveness(attacker_types: tuple, defender_types: tuple) -> float:
+    """Násobek poškození mezi typy útočníka a obránce (součin přes všechny dvojice typů)"""
+    multiplier = 1.0
+    for attacking in attacker_types:
+        row = attacking * len(TYPES)
+        for defending in defender_types:
+            multiplier *= TYPE_MATRIX[row + defending]
+    return multiplier
+
+
+def simulate(team_a: List[Combatant], team_b: List[Combatant], rng: random.Random,
+             max_turns=MAX_TURNS, record=True) -> BattleResult:
+    """
+    Engine verze 2: stejná pravidla jako verze 1 s úplnou tabulkou typů. Pořadí útoků
+    a násobky typů se počítají jednou na souboj dvojice. `team_a` je strana uživatele;
+    s `record=False` se nesbírají události (hromadné simulace).
+    """
+    hp = ([c.hp for c in team_a], [c.hp for c in team_b])
+    active = [0, 0]
+    events = []
+    turn = 0
+    randint = rng.randint
+
+    while active[USER] < len(team_a) and active[CPU] < len(team_b) and turn < max_turns:
+        a = team_a[active[USER]]
+        b = team_b[active[CPU]]
+        order = (
+            (USER, CPU, a.attack - b.defense, effectiveness(a.types, b.types)),
+            (CPU, USER, b.attack - a.defense, effectiveness(b.types, a.types)),
+        )
+        if b.speed > a.speed:
+            order = order[::-1]
+
+        fainted = False
+        while not fainted and turn < max_turns:
+            turn += 1
+            for side, other, base_damage, multiplier in order:
+                damage = base_damage + randint(-5, 5)
+                damage = int(damage * multiplier) if damage > 0 else 0
+                defender = active[other]
+                remaining = hp[other][defender] - damage
+                if remaining < 0:
+                    remaining = 0
+                hp[other][defender] = remaining
+                if record:
+                    events.append(BattleEvent(turn, side, active[side], damage, remaining))
+                if remaining == 0:
+                    active[other] += 1
+                    fainted = True
+                    break
+
+    if active[USER] >= len(team_a):
+        result = 'lose'
+    elif active[CPU] >= len(team_b):
+        result = 'win'
+    else:
+        result = 'draw'
+    return BattleResult(result, events, hp[USER], hp[CPU])
+
+
+def simulate_teams(user_team: List[Dict], cpu_team: List[Dict], rng: random.Random) -> BattleResult:
+    """`simulate` nad týmy ve formátu API"""
+    return simulate([Combatant.from_api(p) for p in user_team], [Combatant.from_api(p) for p in cpu_team], rng)
+
+
+# Enginy podle verze, kterou si bitva uložila
+ENGINES = {
+    1: run_battle,
+    2: simulate_teams,
+}
+
+REPLAY_UNAVAILABLE = 'Bitvu nelze přehrát, někteří její Pokémoni už nejsou v Pokédexu.'
+
+
+def replay_battle(battle) -> Optional[BattleResult]:
+    """
+    Znovu odehraje uloženou bitvu ze seedu, týmů a verze enginu. Výsledek odpovídá
+    původní bitvě, dokud se nezmění statistiky nebo typy jejích Pokémonů.
+    Pokémoni se berou jen ze snímku Pokédexu (čtení nikdy nesahá na API ani nezapisuje);
+    vrací None, pokud některý z nich už v Pokédexu není.
+    """
+    snapshot = get_snapshot()
+    teams = []
+    for pokedex_ids in decode_teams(battle.teams):
+        indices = [snapshot.index_of(pokedex_id) for pokedex_id in pokedex_ids]
+        if None in indices:
+            return None
+        teams.append([snapshot.to_api(i) for i in indices])
+    engine = ENGINES[battle.engine_version]
+    return engine(teams[0], teams[1], random.Random(battle.seed))
+
+
+def battle_log_lines(battle) -> List[str]:
+    """
+    Řádky průběhu uložené bitvy. Bitvy se seedem se přehrají, kompaktní záznam
+    událostí se převede na text; starší bitvy mají text uložený.
+    """
+    snapshot = get_snapshot()
+
+    def names(pokedex_ids):
+        indices = [snapshot.index_of(pokedex_id) for pokedex_id in pokedex_ids]
+        return [
+            snapshot.names[i] if i is not None else f'#{pokedex_id}'
+            for i, pokedex_id in zip(indices, pokedex_ids)
+        ]
+
+    if battle.seed is not None:
+        replayed = replay_battle(battle)
+        if replayed is not None:
+            user_ids, cpu_ids = decode_teams(battle.teams)
+            return render_battle_log(names(user_ids), names(cpu_ids), replayed.events, replayed.result)
+
+    if battle.battle_events:
+        user_ids, cpu_ids, events = decode_battle(battle.battle_events)
+        return render_battle_log(names(user_ids), names(cpu_ids), events, battle.result)
+
+    if battle.battle_log:
+        return battle.battle_log.split('\n')
+    if battle.seed is not None:
+        return [REPLAY_UNAVAILABLE]
+    return []
@@ -0,0 +1,84 @@
+# battle_log.py
+import struct
+import zlib
+from typing import List, NamedTuple, Tuple
+
+
+# Kompaktní záznam bitvy: zlib(hlavička, pokedex_id obou týmů v pořadí nasazení, události útoků)
+LOG_FORMAT = 1
+HEADER = struct.Struct('<BBB')  # verze formátu, velikost týmu uživatele a počítače
+EVENT = struct.Struct('<IBBHH')  # kolo, strana útočníka, index útočníka v týmu, poškození, HP obránce po útoku
+
+USER = 0
+CPU = 1
+
+RESULT_MESSAGES = {
+    'win': "🎉 Tví pokémoni vyhráli!",
+    'lose': "💀 Počítač vyhrál!",
+    'draw': "🤝 Remíza!",
+}
+
+
+class BattleEvent(NamedTuple):
+    turn: int
+    side: int
+    attacker: int
+    damage: int
+    hp: int
+
+
+def encode_teams(user_team: List[int], cpu_team: List[int]) -> bytes:
+    """Pořadí nasazení obou týmů (pokedex_id) pro bitvy, které se dají přehrát ze seedu"""
+    teams = list(user_team) + list(cpu_team)
+    return struct.pack(f'<BB{len(teams)}H', len(user_team), len(cpu_team), *teams)
+
+
+def decode_teams(blob: bytes) -> Tuple[List[int], List[int]]:
+    user_size, cpu_size = struct.unpack_from('<BB', blob)
+    teams = struct.unpack_from(f'<{user_size + cpu_size}H', blob, 2)
+    return list(teams[:user_size]), list(teams[user_size:])
+
+
+def decode_battle(blob: bytes) -> Tuple[List[int], List[int], List[BattleEvent]]:
+    """Týmy uživatele a počítače a seznam událostí z kompaktního záznamu (viz migrace 0007)"""
+    data = zlib.decompress(bytes(blob))
+    log_format, user_size, cpu_size = HEADER.unpack_from(data)
+    if log_format != LOG_FORMAT:
+        raise ValueError(f'Nepodporovaný formát záznamu bitvy: {log_format}')
+
+    teams = struct.unpack_from(f'<{user_size + cpu_size}H', data, HEADER.size)
+    offset = HEADER.size + 2 * len(teams)
+    events = [BattleEvent(*values) for values in EVENT.iter_unpack(data[offset:])]
+    return list(teams[:user_size]), list(teams[user_size:]), events
+
+
+def render_battle_log(user_names: List[str], cpu_names: List[str], events: List[BattleEvent], result: str) -> List[str]:
+    """Textový průběh bitvy (stejné řádky, jaké vypisuje aréna) poskládaný z událostí"""
+    user_names = [name.capitalize() for name in user_names]
+    cpu_names = [name.capitalize() for name in cpu_names]
+    lines = ["=== PRŮBĚH BITVY ==="]
+
+    user_idx = 0
+    cpu_idx = 0
+    if user_names and cpu_names:
+        lines.append(f"🆚 {user_names[0]} vs {cpu_names[0]}")
+
+    for event in events:
+        if event.side == USER:
+            lines.append(f"⚔️ {user_names[event.attacker]} útočí za {event.damage} poškození! (Oponent HP: {event.hp})")
+        else:
+            lines.append(f"💥 {cpu_names[event.attacker]} útočí za {event.damage} poškození! (Tvůj HP: {event.hp})")
+
+        if event.hp == 0:
+            if event.side == USER:
+                lines.append(f"💀 {cpu_names[cpu_idx]} byl poražen!")
+                cpu_idx += 1
+            else:
+                lines.append(f"💀 {user_names[user_idx]} byl poražen!")
+                user_idx += 1
+            if user_idx < len(user_names) and cpu_idx < len(cpu_names):
+                lines.append(f"🆚 {user_names[user_idx]} vs {cpu_names[cpu_idx]}")
+
+    lines.append("=" * 30)
+    lines.append(RESULT_MESSAGES[result])
+    return lines
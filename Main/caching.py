@@ -0,0 +1,86 @@
+# caching.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DexVersion
+
+
+DEX_VERSION_KEY = 'dex_version'
+
+# Značka pro uložený "nenalezeno" (negativní cache)
+NOT_FOUND = '__not_found__'
+
+
+class LRUCache:
+    """Omezená in-process LRU cache s expirací položek, bezpečná pro vlákna"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _stored_version() -> int:
+    return DexVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def get_dex_version() -> str:
+    """
+    Aktuální verze dat Pokédexu. Zdrojem pravdy je čítač v DB, sdílený všemi procesy;
+    cache ho drží jen po dobu DEX_VERSION_TTL, takže změnu z jiného procesu (import,
+    administrace) uvidí každý worker nejpozději po této době i s cache jen v procesu.
+    Verze je součástí klíčů, takže její změna zneplatní všechny vrstvy cache.
+    """
+    version = cache.get(DEX_VERSION_KEY)
+    if version is None:
+        version = str(_stored_version())
+        cache.set(DEX_VERSION_KEY, version, getattr(settings, 'DEX_VERSION_TTL', 2))
+    return version
+
+
+def bump_dex_version() -> str:
+    """Zvýší verzi dat po zápisu do DB (import, uložení Pokémona z API)"""
+    with transaction.atomic():
+        DexVersion.objects.get_or_create(pk=1)
+        DexVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        version = str(_stored_version())
+    cache.set(DEX_VERSION_KEY, version, getattr(settings, 'DEX_VERSION_TTL', 2))
+    return version
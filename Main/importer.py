@@ -0,0 +1,538 @@
+# importer.py
+import hashlib
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Pokemon, PokemonType, PokemonAlias, Ability, Evolution, ImportCheckpoint
+from .names import normalize_name
+from .pokeapi import api_client
+from .caching import bump_dex_version
+from .services import rebuild_evolution_index
+
+
+POKEAPI_LIST_PATH = 'pokemon?limit={limit}'
+
+TYPE_COLORS = {
+    'normal': '#A8A77A',
+    'fire': '#EE8130',
+    'water': '#6390F0',
+    'electric': '#F7D02C',
+    'grass': '#7AC74C',
+    'ice': '#96D9D6',
+    'fighting': '#C22E28',
+    'poison': '#A33EA1',
+    'ground': '#E2BF65',
+    'flying': '#A98FF3',
+    'psychic': '#F95587',
+    'bug': '#A6B91A',
+    'rock': '#B6A136',
+    'ghost': '#735797',
+    'dragon': '#6F35FC',
+    'dark': '#705746',
+    'steel': '#B7B7CE',
+    'fairy': '#D685AD',
+}
+
+# Zdroje z dumpu PokeAPI (rozložení api-data), species se čtou jako první
+DUMP_RESOURCES = ('pokemon-species', 'pokemon', 'evolution-chain')
+DUMP_PATH_RE = re.compile(r'(?:^|/)(pokemon-species|pokemon|evolution-chain)/(\d+)/index\.json$')
+
+POKEMON_UPDATE_FIELDS = [
+    'name', 'slug', 'height', 'weight', 'base_experience', 'sprite_url',
+    'hp', 'attack', 'defense', 'special_attack', 'special_defense', 'speed',
+    'is_legendary', 'is_mythical', 'updated_at',
+]
+
+
+class HostLimiter:
+    """
+    Omezuje počet souběžných požadavků na jeden host (per-host politeness).
+    Volitelně drží minimální rozestup mezi starty požadavků na stejný host.
+    Požadavky posílá sdíleným klientem PokeAPI (nebo zadaným `client`).
+    """
+
+    def __init__(self, max_per_host=8, min_interval=0.0, client=None):
+        self.max_per_host = max(1, max_per_host)
+        self.min_interval = min_interval
+        self.client = client
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def _wait_for_slot(self, host):
+        if not self.min_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def get(self, url, **kwargs):
+        host = urlparse(url).netloc
+        with self._semaphore(host):
+            self._wait_for_slot(host)
+            return (self.client or api_client).get(url, **kwargs)
+
+
+class ResourceMemo:
+    """
+    Sdílená paměť stažených zdrojů mezi vlákny. Každá URL se stáhne jen jednou;
+    vlákna, která ji chtějí současně, počkají na výsledek prvního.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get(self, url, fetch):
+        with self._lock:
+            future = self._futures.get(url)
+            owner = future is None
+            if owner:
+                future = self._futures[url] = Future()
+        if owner:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def fetch_resource(limiter: HostLimiter, url: str, checkpoint: Optional[ImportCheckpoint] = None) -> Dict:
+    """
+    Stáhne jeden zdroj z PokeAPI. Pokud je k dispozici dokončený kontrolní bod,
+    pošle podmíněný požadavek (If-None-Match / If-Modified-Since).
+
+    Vrací slovník s daty, validátory a příznakem `unchanged`; při 304
+    je `data` None. Při chybě je `data` None a `unchanged` False.
+    """
+    resource = {
+        'url': url,
+        'data': None,
+        'etag': '',
+        'last_modified': '',
+        'content_hash': '',
+        'child_url': checkpoint.child_url if checkpoint else '',
+        'unchanged': False,
+    }
+
+    headers = {}
+    if checkpoint is not None and checkpoint.completed:
+        if checkpoint.etag:
+            headers['If-None-Match'] = checkpoint.etag
+        if checkpoint.last_modified:
+            headers['If-Modified-Since'] = checkpoint.last_modified
+
+    try:
+        response = limiter.get(url, headers=headers) if headers else limiter.get(url)
+    except requests.RequestException:
+        return resource
+
+    if response.status_code == 304 and checkpoint is not None:
+        resource.update(
+            etag=checkpoint.etag,
+            last_modified=checkpoint.last_modified,
+            content_hash=checkpoint.content_hash,
+            unchanged=True,
+        )
+        return resource
+
+    if response.status_code != 200:
+        return resource
+
+    resource.update(
+        data=response.json(),
+        etag=response.headers.get('ETag', ''),
+        last_modified=response.headers.get('Last-Modified', ''),
+        content_hash=hashlib.sha256(response.content).hexdigest(),
+    )
+    resource['unchanged'] = bool(
+        checkpoint is not None and checkpoint.completed and checkpoint.content_hash == resource['content_hash']
+    )
+    return resource
+
+
+def fetch_pokemon_bundle(limiter: HostLimiter, entry: Dict, checkpoints: Optional[Dict] = None,
+                         chains: Optional[ResourceMemo] = None) -> Dict:
+    """
+    Stáhne vše, co import potřebuje pro jednoho Pokémona:
+    detail, species a evoluční řetězec.
+
+    S `checkpoints` (url -> ImportCheckpoint) stahuje podmíněně. Pokud se
+    nezměnil žádný ze zdrojů, má bundle příznak `unchanged` a do DB se nezapisuje.
+    Když se změnil jen detail nebo jen species, druhý zdroj se dostáhne celý,
+    protože záznam Pokémona potřebuje obojí.
+
+    Evoluční řetězce se přes `chains` stahují jen jednou pro celou rodinu.
+    """
+    checkpoints = checkpoints or {}
+    chains = chains or ResourceMemo()
+    bundle = {'entry': entry, 'pokemon': None, 'species': None, 'evolution_chain': None,
+              'resources': [], 'unchanged': False}
+
+    def fetch(url, memo=None):
+        if memo is not None:
+            resource = memo.get(url, lambda: fetch_resource(limiter, url, checkpoints.get(url)))
+        else:
+            resource = fetch_resource(limiter, url, checkpoints.get(url))
+        bundle['resources'].append(resource)
+        return resource
+
+    def refetch(resource):
+        if resource['data'] is None:
+            resource.update(fetch_resource(limiter, resource['url']))
+        return resource['data']
+
+    pokemon = fetch(entry['url'])
+    if pokemon['data'] is not None:
+        pokemon['child_url'] = pokemon['data']['species']['url']
+    if not pokemon['child_url']:
+        return bundle
+
+    species = fetch(pokemon['child_url'])
+    if species['data'] is not None:
+        species['child_url'] = species['data']['evolution_chain']['url']
+
+    chain = fetch(species['child_url'], chains) if species['child_url'] else None
+
+    bundle['unchanged'] = all(r['unchanged'] for r in bundle['resources'])
+    if bundle['unchanged']:
+        return bundle
+
+    if pokemon['unchanged'] and species['unchanged']:
+        # Změnil se jen evoluční řetězec, záznam Pokémona se nepřepisuje
+        bundle['pokemon_unchanged'] = True
+    else:
+        bundle['pokemon'] = refetch(pokemon)
+        bundle['species'] = refetch(species)
+    if chain is not None and not chain['unchanged']:
+        bundle['evolution_chain'] = chain['data']
+
+    return bundle
+
+
+def iter_pokemon_bundles(entries: List[Dict], workers=1, limiter: Optional[HostLimiter] = None,
+                         checkpoints: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Stahuje data Pokémonů ve vlákně nebo v poolu `workers` vláken.
+    Výsledky vrací v pořadí vstupního seznamu, takže zápis do DB
+    může probíhat v jediném (volajícím) vlákně.
+    """
+    limiter = limiter or HostLimiter()
+    chains = ResourceMemo()
+
+    if workers <= 1:
+        for entry in entries:
+            yield fetch_pokemon_bundle(limiter, entry, checkpoints, chains)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pokeapi') as executor:
+        yield from executor.map(lambda entry: fetch_pokemon_bundle(limiter, entry, checkpoints, chains), entries)
+
+
+def load_checkpoints() -> Dict[str, ImportCheckpoint]:
+    """Načte všechny kontrolní body jedním dotazem"""
+    return {checkpoint.url: checkpoint for checkpoint in ImportCheckpoint.objects.all()}
+
+
+def is_entry_completed(entry: Dict, checkpoints: Dict[str, ImportCheckpoint]) -> bool:
+    """Zda byly detail, species i evoluční řetězec Pokémona kompletně uloženy"""
+    url = entry['url']
+    while url:
+        checkpoint = checkpoints.get(url)
+        if checkpoint is None or not checkpoint.completed:
+            return False
+        url = checkpoint.child_url
+    return True
+
+
+def save_checkpoints(resources: Iterable[Dict], completed=True):
+    """Hromadně uloží kontrolní body stažených zdrojů"""
+    checkpoints = {
+        r['url']: ImportCheckpoint(
+            url=r['url'],
+            etag=r['etag'],
+            last_modified=r['last_modified'],
+            content_hash=r['content_hash'],
+            child_url=r['child_url'],
+            completed=completed,
+        )
+        for r in resources if r['content_hash']
+    }
+    ImportCheckpoint.objects.bulk_create(
+        list(checkpoints.values()),
+        update_conflicts=True,
+        unique_fields=['url'],
+        update_fields=['etag', 'last_modified', 'content_hash', 'child_url', 'completed', 'updated_at'],
+    )
+
+
+def parse_species(species_data: Dict) -> Dict:
+    """Ze species vezme příznaky legendární/mytický a aliasy (jméno species, lokalizované názvy)"""
+    names = [species_data.get('name', '')] + [n['name'] for n in species_data.get('names', [])]
+    return {
+        'is_legendary': species_data.get('is_legendary', False),
+        'is_mythical': species_data.get('is_mythical', False),
+        'aliases': sorted({normalize_name(name)[:100] for name in names} - {''}),
+    }
+
+
+def parse_pokemon(poke_data: Dict, species_data: Optional[Dict] = None) -> Dict:
+    """Převede detail (a species) z PokeAPI na plochý záznam pro hromadný zápis"""
+    stats = {stat['stat']['name']: stat['base_stat'] for stat in poke_data['stats']}
+
+    return {
+        'pokedex_id': poke_data['id'],
+        'name': poke_data['name'],
+        'slug': normalize_name(poke_data['name']),
+        'height': poke_data['height'],  # decimetry
+        'weight': poke_data['weight'],  # hectogramy
+        'base_experience': poke_data.get('base_experience') or 0,
+        'sprite_url': poke_data['sprites']['front_default'],
+        'hp': stats.get('hp', 1),
+        'attack': stats.get('attack', 1),
+        'defense': stats.get('defense', 1),
+        'special_attack': stats.get('special-attack', 1),
+        'special_defense': stats.get('special-defense', 1),
+        'speed': stats.get('speed', 1),
+        'types': [t['type']['name'] for t in poke_data['types']],
+        'abilities': [a['ability']['name'] for a in poke_data['abilities']],
+        **parse_species(species_data or {}),
+    }
+
+
+EVOLUTION_CONDITION_KEYS = (
+    'gender', 'held_item', 'known_move', 'known_move_type', 'location', 'min_affection',
+    'min_beauty', 'min_happiness', 'needs_overworld_rain', 'party_species', 'party_type',
+    'relative_physical_stats', 'time_of_day', 'trade_species', 'turn_upside_down',
+)
+
+
+def _evolution_condition(details: Dict) -> str:
+    """Poskládá čitelný popis podmínky evoluce (trigger a další nenulové podmínky)"""
+    parts = []
+    if details.get('trigger'):
+        parts.append(details['trigger']['name'])
+    for key in EVOLUTION_CONDITION_KEYS:
+        value = details.get(key)
+        if value in (None, '', False):
+            continue
+        if isinstance(value, dict):
+            value = value.get('name', '')
+        parts.append(f'{key}={value}')
+    return ', '.join(parts)[:200]
+
+
+def parse_evolution_chain(chain_node: Dict) -> List[Dict]:
+    """
+    Rekurzivně rozparsuje evoluční řetězec z PokeAPI na hrany rodič -> potomek.
+    Větvení (např. Eevee) zůstává zachováno, každá hrana nese level/item/condition.
+    """
+    edges = []
+    from_name = chain_node['species']['name']
+    for evo in chain_node.get('evolves_to', []):
+        details = (evo.get('evolution_details') or [{}])[0]
+        edges.append({
+            'from': from_name,
+            'to': evo['species']['name'],
+            'level': details.get('min_level'),
+            'item': (details.get('item') or {}).get('name', ''),
+            'condition': _evolution_condition(details),
+        })
+        edges.extend(parse_evolution_chain(evo))
+    return edges
+
+
+def write_pokemon_batch(records: List[Dict]) -> Dict[int, int]:
+    """
+    Hromadně zapíše dávku záznamů z `parse_pokemon` v jedné transakci.
+    Počet dotazů nezávisí na velikosti dávky. Vrací mapu pokedex_id -> pk.
+    """
+    if not records:
+        return {}
+
+    type_names = sorted({t for r in records for t in r['types']})
+    ability_names = sorted({a for r in records for a in r['abilities']})
+    field_names = [f for f in POKEMON_UPDATE_FIELDS if f != 'updated_at'] + ['pokedex_id']
+
+    with transaction.atomic():
+        PokemonType.objects.bulk_create(
+            [PokemonType(name=name, color=TYPE_COLORS.get(name, '#000000')) for name in type_names],
+            update_conflicts=True, unique_fields=['name'], update_fields=['color'],
+        )
+        Ability.objects.bulk_create(
+            [Ability(name=name) for name in ability_names],
+            ignore_conflicts=True,
+        )
+        Pokemon.objects.bulk_create(
+            [Pokemon(**{f: r[f] for f in field_names}) for r in records],
+            update_conflicts=True, unique_fields=['pokedex_id'], update_fields=POKEMON_UPDATE_FIELDS,
+        )
+
+        type_ids = dict(PokemonType.objects.filter(name__in=type_names).values_list('name', 'id'))
+        ability_ids = dict(Ability.objects.filter(name__in=ability_names).values_list('name', 'id'))
+        pokemon_ids = dict(
+            Pokemon.objects.filter(pokedex_id__in=[r['pokedex_id'] for r in records]).values_list('pokedex_id', 'id')
+        )
+
+        # Vazební tabulky M2M se přepisují celé
+        TypeLink = Pokemon.types.through
+        AbilityLink = Pokemon.abilities.through
+        TypeLink.objects.filter(pokemon_id__in=pokemon_ids.values()).delete()
+        AbilityLink.objects.filter(pokemon_id__in=pokemon_ids.values()).delete()
+        TypeLink.objects.bulk_create([
+            TypeLink(pokemon_id=pokemon_ids[r['pokedex_id']], pokemontype_id=type_ids[name])
+            for r in records for name in dict.fromkeys(r['types'])
+        ])
+        AbilityLink.objects.bulk_create([
+            AbilityLink(pokemon_id=pokemon_ids[r['pokedex_id']], ability_id=ability_ids[name])
+            for r in records for name in dict.fromkeys(r['abilities'])
+        ])
+
+        # Aliasy se také přepisují; alias sdílený více formami (jméno species) dostane první z nich
+        PokemonAlias.objects.filter(pokemon_id__in=pokemon_ids.values()).delete()
+        PokemonAlias.objects.bulk_create([
+            PokemonAlias(alias=alias, pokemon_id=pokemon_ids[r['pokedex_id']])
+            for r in records for alias in r.get('aliases', []) if alias != r['slug']
+        ], ignore_conflicts=True)
+        transaction.on_commit(bump_dex_version)
+
+    return pokemon_ids
+
+
+def write_evolutions(edges: Iterable[Dict]) -> int:
+    """
+    Hromadně uloží hrany evolučních stromů z `parse_evolution_chain`.
+    Dosavadní evoluce Pokémonů z dotčených řetězců se nahradí, takže zmizí
+    i dříve chybně uložené vazby. Hrany s neznámým Pokémonem se přeskočí,
+    bez hran se nic nezapisuje. Vrací počet uložených hran.
+    """
+    edges = {(edge['from'], edge['to']): edge for edge in edges}
+    if not edges:
+        return 0
+    names = {name for pair in edges for name in pair}
+    pokemon_ids = dict(Pokemon.objects.filter(name__in=names).values_list('name', 'id'))
+
+    evolutions = [
+        Evolution(
+            from_pokemon_id=pokemon_ids[from_name],
+            to_pokemon_id=pokemon_ids[to_name],
+            level=edge['level'],
+            item=edge['item'],
+            condition=edge['condition'],
+        )
+        for (from_name, to_name), edge in edges.items()
+        if from_name in pokemon_ids and to_name in pokemon_ids
+    ]
+
+    with transaction.atomic():
+        Evolution.objects.filter(
+            Q(from_pokemon_id__in=pokemon_ids.values()) | Q(to_pokemon_id__in=pokemon_ids.values())
+        ).delete()
+        Evolution.objects.bulk_create(evolutions)
+        rebuild_evolution_index()
+        transaction.on_commit(bump_dex_version)
+    return len(evolutions)
+
+
+def _resource_id(url: str) -> int:
+    """Vrátí číselné ID z URL zdroje PokeAPI (…/pokemon-species/25/ -> 25)"""
+    return int(url.rstrip('/').rsplit('/', 1)[1])
+
+
+def _iter_dump_dir(root: str) -> Iterator:
+    for dirpath, dirnames, filenames in os.walk(root):
+        if not any(kind in dirnames for kind in DUMP_RESOURCES):
+            dirnames.sort()
+            continue
+
+        for kind in DUMP_RESOURCES:
+            kind_dir = os.path.join(dirpath, kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            ids = sorted(int(name) for name in os.listdir(kind_dir) if name.isdigit())
+            for resource_id in ids:
+                index_path = os.path.join(kind_dir, str(resource_id), 'index.json')
+                if os.path.isfile(index_path):
+                    with open(index_path, encoding='utf-8') as f:
+                        yield kind, resource_id, json.load(f)
+        dirnames.clear()
+
+
+def _iter_dump_tar(path: str) -> Iterator:
+    # Režim 'r|*' čte archiv proudově, bez indexu všech členů v paměti
+    with tarfile.open(path, mode='r|*') as tar:
+        for member in tar:
+            match = DUMP_PATH_RE.search(member.name)
+            if not member.isfile() or not match:
+                continue
+            f = tar.extractfile(member)
+            yield match.group(1), int(match.group(2)), json.load(f)
+
+
+def iter_dump_documents(path: str) -> Iterator:
+    """
+    Proudově čte JSON dokumenty z lokálního dumpu PokeAPI (adresář nebo tarball
+    v rozložení api-data, např. data/api/v2/pokemon/1/index.json).
+    Vrací trojice (druh zdroje, id, data); v paměti je vždy jen jeden dokument.
+    """
+    if os.path.isdir(path):
+        return _iter_dump_dir(path)
+    return _iter_dump_tar(path)
+
+
+def iter_dump_records(path: str, limit: Optional[int] = None) -> Iterator:
+    """
+    Převede dokumenty z dumpu na položky pro hromadný zápis:
+    ('pokemon', záznam z `parse_pokemon`) a ('evolutions', hrany z `parse_evolution_chain`).
+
+    Ze species se drží jen výsledek `parse_species`. Pokémon, jehož species
+    ještě nebyla přečtena (tarball v libovolném pořadí), čeká do jejího načtení.
+    """
+    species_flags = {}
+    pending = {}
+
+    for kind, resource_id, data in iter_dump_documents(path):
+        if kind == 'pokemon-species':
+            species_flags[resource_id] = parse_species(data)
+            for record in pending.pop(resource_id, []):
+                record.update(species_flags[resource_id])
+                yield 'pokemon', record
+
+        elif kind == 'pokemon':
+            if limit and resource_id > limit:
+                continue
+            species_id = _resource_id(data['species']['url'])
+            record = parse_pokemon(data)
+            if species_id in species_flags:
+                record.update(species_flags[species_id])
+                yield 'pokemon', record
+            else:
+                pending.setdefault(species_id, []).append(record)
+
+        elif kind == 'evolution-chain':
+            yield 'evolutions', parse_evolution_chain(data['chain'])
+
+    # Pokémoni bez species v dumpu
+    for records in pending.values():
+        for record in records:
+            yield 'pokemon', record
@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from Main.models import MatchupMatrix
+from Main.tournament import WIN_RATE_SCALE, MatchupTable, recommend_team
+
+
+class Command(BaseCommand):
+    help = 'Změří doporučení týmu nad náhodnou hustou maticí soubojů (bez DB)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000, help='Počet Pokémonů v matici')
+        parser.add_argument('--opponents', type=int, default=6, help='Počet soupeřů')
+        parser.add_argument('--team', type=int, default=3, help='Velikost doporučeného týmu')
+        parser.add_argument('--repeat', type=int, default=20, help='Počet měření (s náhodnými soupeři)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        size = kwargs['size']
+        if size < kwargs['opponents'] + kwargs['team'] or kwargs['opponents'] < 1 or kwargs['repeat'] < 1:
+            raise CommandError('Matice musí pojmout soupeře i tým, --opponents a --repeat musí být kladné')
+
+        rng = np.random.default_rng(kwargs['seed'])
+        table = MatchupTable(MatchupMatrix(
+            dex_version='benchmark', engine_version=0, battles_per_pair=0,
+            pokedex_ids=np.arange(1, size + 1, dtype='<u2').tobytes(),
+            win_rates=(rng.random((size, size)) * WIN_RATE_SCALE).astype('<u2').tobytes(),
+        ))
+
+        timings = []
+        for _ in range(kwargs['repeat']):
+            opponents = [int(p) for p in rng.choice(np.arange(1, size + 1), kwargs['opponents'], replace=False)]
+            started = time.perf_counter()
+            recommend_team(table, opponents, kwargs['team'])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Doporučení týmu {kwargs["team"]} proti {kwargs["opponents"]} soupeřům v matici {size}×{size}: '
+            f'medián {np.median(timings):.1f} ms, nejhorší {max(timings):.1f} ms ({kwargs["repeat"]} měření)'
+        ))
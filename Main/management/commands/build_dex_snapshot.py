@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from Main.snapshot import snapshot_path, write_snapshot_file
+
+
+class Command(BaseCommand):
+    help = 'Zapíše binární snímek Pokédexu, který workery mapují do paměti'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', metavar='PATH',
+                            help='Cílový soubor (výchozí je DEX_SNAPSHOT_PATH z nastavení)')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs.get('output') or snapshot_path()
+        if not path:
+            raise CommandError('Není nastavena cesta ke snímku (DEX_SNAPSHOT_PATH ani --output)')
+
+        size = write_snapshot_file(path)
+        self.stdout.write(self.style.SUCCESS(f'Snímek Pokédexu zapsán do {path} ({size // 1024} kB)'))
@@ -1,141 +1,165 @@
-import requests
 from django.core.management.base import BaseCommand
-from Main.models import Pokemon, PokemonType, Ability, Evolution
+from django.db import transaction
+from Main.pokeapi import api_client
+from Main.snapshot import snapshot_path, write_snapshot_file
+from Main.importer import (
+    POKEAPI_LIST_PATH,
+    HostLimiter,
+    fetch_resource,
+    iter_pokemon_bundles,
+    iter_dump_records,
+    load_checkpoints,
+    is_entry_completed,
+    save_checkpoints,
+    parse_pokemon,
+    parse_evolution_chain,
+    write_pokemon_batch,
+    write_evolutions,
+)
 
 class Command(BaseCommand):
     help = 'Import Pokémonů z PokeAPI (prvních 150)'
 
-    def parse_evolution_chain(self, chain_node):
-        """Rekurzivně rozparsuje evoluční řetězec z PokeAPI do seznamu jmen."""
-        evolutions = [chain_node['species']['name']]
-        for evo in chain_node.get('evolves_to', []):
-            evolutions.extend(self.parse_evolution_chain(evo))
-        return evolutions
-
-    def save_evolutions(self, evolutions_list):
-        """
-        Uloží evoluce do DB podle pořadí v seznamu.
-        evolutions_list = ['bulbasaur', 'ivysaur', 'venusaur']
-        """
-        for i in range(len(evolutions_list) - 1):
-            from_name = evolutions_list[i]
-            to_name = evolutions_list[i + 1]
-            try:
-                from_pokemon = Pokemon.objects.get(name=from_name)
-                to_pokemon = Pokemon.objects.get(name=to_name)
-                Evolution.objects.get_or_create(from_pokemon=from_pokemon, to_pokemon=to_pokemon)
-            except Pokemon.DoesNotExist:
-                pass
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=150, help='Počet importovaných Pokémonů')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Počet souběžně stahujících vláken (1 = sériově)')
+        parser.add_argument('--max-per-host', type=int, default=8,
+                            help='Maximální počet souběžných požadavků na jeden host')
+        parser.add_argument('--delay', type=float, default=0.0,
+                            help='Minimální rozestup mezi požadavky na stejný host (s)')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Počet Pokémonů zapsaných do DB v jedné transakci')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Podmíněné požadavky, přeskočení nezměněných dat a navázání na přerušený import')
+        parser.add_argument('--revalidate', action='store_true',
+                            help='S --incremental ověří i Pokémony dokončené před přerušením importu')
+        parser.add_argument('--from-dump', metavar='PATH',
+                            help='Import z lokálního dumpu PokeAPI (adresář nebo tarball api-data) bez sítě')
+
+    def flush(self, records, resources):
+        """Zapíše nasbírané záznamy jednou dávkou spolu s jejich kontrolními body."""
+        with transaction.atomic():
+            write_pokemon_batch(records)
+            save_checkpoints(resources)
+        for record in records:
+            self.stdout.write(f'Importován Pokémon: {record["name"]} (#{record["pokedex_id"]})')
+        records.clear()
+        resources.clear()
+
+    def write_snapshot(self):
+        """Po importu zapíše snímek Pokédexu pro workery (verze už je zvýšená po commitu)."""
+        path = snapshot_path()
+        if path:
+            size = write_snapshot_file(path)
+            self.stdout.write(f'Snímek Pokédexu zapsán do {path} ({size // 1024} kB)')
+
+    def import_from_dump(self, path, limit, batch_size):
+        """Import z lokálního dumpu stejnou hromadnou cestou jako z API."""
+        records = []
+        evolution_edges = []
+        for kind, item in iter_dump_records(path, limit=limit):
+            if kind == 'pokemon':
+                records.append(item)
+                if len(records) >= batch_size:
+                    self.flush(records, [])
+            else:
+                evolution_edges.extend(item)
+
+        self.flush(records, [])
+        write_evolutions(evolution_edges)
+        self.write_snapshot()
+
+        self.stdout.write(self.style.SUCCESS('Import dokončen!'))
 
     def handle(self, *args, **kwargs):
-        url = 'https://pokeapi.co/api/v2/pokemon?limit=150'
-        response = requests.get(url)
-        if response.status_code != 200:
+        batch_size = max(1, kwargs.get('batch_size', 50))
+        if kwargs.get('from_dump'):
+            self.import_from_dump(kwargs['from_dump'], kwargs.get('limit', 150), batch_size)
+            return
+
+        incremental = kwargs.get('incremental', False)
+        limiter = HostLimiter(
+            max_per_host=kwargs.get('max_per_host', 8),
+            min_interval=kwargs.get('delay', 0.0),
+        )
+        checkpoints = load_checkpoints() if incremental else {}
+
+        url = api_client.url(POKEAPI_LIST_PATH.format(limit=kwargs.get('limit', 150)))
+        list_resource = fetch_resource(limiter, url)
+        if list_resource['data'] is None:
             self.stdout.write(self.style.ERROR('Nepodařilo se stáhnout seznam Pokémonů'))
             return
 
-        data = response.json()
-        results = data['results']
+        results = list_resource['data']['results']
+
+        list_checkpoint = checkpoints.get(url)
+        list_unchanged = bool(
+            incremental and list_checkpoint and list_checkpoint.content_hash == list_resource['content_hash']
+        )
+        if list_unchanged:
+            if not list_checkpoint.completed and not kwargs.get('revalidate', False):
+                # Přerušený import se stejným seznamem: navazujeme jen na nedokončené Pokémony
+                results = [entry for entry in results if not is_entry_completed(entry, checkpoints)]
+            # Jinak se dokončení Pokémoni ověří podmíněnými požadavky (ETag / Last-Modified)
+        else:
+            save_checkpoints([list_resource], completed=False)
+
+        # Stahování běží paralelně, zápis do DB jen v tomto vlákně (SQLite nesnese souběžné zápisy)
+        bundles = iter_pokemon_bundles(results, workers=kwargs.get('workers', 1), limiter=limiter,
+                                       checkpoints=checkpoints)
+
+        records = []
+        resources = []
+        chain_resources = []
+        evolution_edges = []
+        seen_chains = set()
+        skipped = 0
+        for bundle in bundles:
+            if bundle['unchanged']:
+                skipped += 1
+                continue
 
-        for pokemon_entry in results:
-            poke_url = pokemon_entry['url']
-            poke_response = requests.get(poke_url)
-            if poke_response.status_code != 200:
-                self.stdout.write(self.style.WARNING(f'Nepodařilo se stáhnout data pro {pokemon_entry["name"]}'))
+            if bundle['pokemon'] is None and not bundle.get('pokemon_unchanged'):
+                self.stdout.write(self.style.WARNING(f'Nepodařilo se stáhnout data pro {bundle["entry"]["name"]}'))
                 continue
 
-            poke_data = poke_response.json()
-
-            pokedex_id = poke_data['id']
-            name = poke_data['name']
-            height = poke_data['height']  # decimetry
-            weight = poke_data['weight']  # hectogramy
-            base_experience = poke_data.get('base_experience', 0)
-            sprite_url = poke_data['sprites']['front_default']
-
-            # stats mapping podle tvého modelu
-            stats = {stat['stat']['name']: stat['base_stat'] for stat in poke_data['stats']}
-            hp = stats.get('hp', 1)
-            attack = stats.get('attack', 1)
-            defense = stats.get('defense', 1)
-            special_attack = stats.get('special-attack', 1)
-            special_defense = stats.get('special-defense', 1)
-            speed = stats.get('speed', 1)
-
-            # Určení, jestli je legendární nebo mytický (z "species" endpointu)
-            species_url = poke_data['species']['url']
-            species_response = requests.get(species_url)
-            is_legendary = False
-            is_mythical = False
-            if species_response.status_code == 200:
-                species_data = species_response.json()
-                is_legendary = species_data.get('is_legendary', False)
-                is_mythical = species_data.get('is_mythical', False)
-
-            # Vytvoření nebo update Pokémona
-            pokemon_obj, created = Pokemon.objects.update_or_create(
-                pokedex_id=pokedex_id,
-                defaults={
-                    'name': name,
-                    'height': height,
-                    'weight': weight,
-                    'base_experience': base_experience,
-                    'sprite_url': sprite_url,
-                    'hp': hp,
-                    'attack': attack,
-                    'defense': defense,
-                    'special_attack': special_attack,
-                    'special_defense': special_defense,
-                    'speed': speed,
-                    'is_legendary': is_legendary,
-                    'is_mythical': is_mythical,
-                }
+            # Řetězec je hotový až po zápisu evolucí na konci importu
+            resources.extend(bundle['resources'][:2])
+            chain_resources.extend(bundle['resources'][2:])
+
+            if bundle['pokemon'] is not None:
+                records.append(parse_pokemon(bundle['pokemon'], bundle['species']))
+            chain = bundle['evolution_chain']
+            if chain is not None and chain['id'] not in seen_chains:
+                seen_chains.add(chain['id'])
+                evolution_edges.extend(parse_evolution_chain(chain['chain']))
+
+            if len(records) >= batch_size:
+                self.flush(records, resources)
+
+        self.flush(records, resources)
+
+        # Evoluce až nakonec, kdy už jsou v DB všichni Pokémoni z řetězců
+        # Beze změněného řetězce se evoluční index nepřestavuje a verze dat se nezvyšuje
+        with transaction.atomic():
+            if evolution_edges:
+                write_evolutions(evolution_edges)
+            save_checkpoints(chain_resources)
+            if not (list_unchanged and list_checkpoint.completed):
+                save_checkpoints([list_resource])
+
+        if skipped:
+            self.stdout.write(f'Beze změny přeskočeno: {skipped}')
+        for endpoint, stats in sorted(api_client.stats().items()):
+            average = stats['seconds'] / stats['calls'] * 1000 if stats['calls'] else 0
+            self.stdout.write(
+                f'{endpoint}: {stats["calls"]} požadavků, {stats["errors"]} chyb, '
+                f'{stats["bytes"] // 1024} kB, průměrně {average:.0f} ms'
             )
-
-            # Nastavení typů
-            pokemon_obj.types.clear()
-            color_map = {
-                'normal': '#A8A77A',
-                'fire': '#EE8130',
-                'water': '#6390F0',
-                'electric': '#F7D02C',
-                'grass': '#7AC74C',
-                'ice': '#96D9D6',
-                'fighting': '#C22E28',
-                'poison': '#A33EA1',
-                'ground': '#E2BF65',
-                'flying': '#A98FF3',
-                'psychic': '#F95587',
-                'bug': '#A6B91A',
-                'rock': '#B6A136',
-                'ghost': '#735797',
-                'dragon': '#6F35FC',
-                'dark': '#705746',
-                'steel': '#B7B7CE',
-                'fairy': '#D685AD',
-            }
-            for t in poke_data['types']:
-                type_name = t['type']['name']
-                color = color_map.get(type_name, '#000000')
-                type_obj, _ = PokemonType.objects.get_or_create(name=type_name, defaults={'color': color})
-                pokemon_obj.types.add(type_obj)
-
-            # Nastavení schopností (abilities)
-            pokemon_obj.abilities.clear()
-            for ability_info in poke_data['abilities']:
-                ability_name = ability_info['ability']['name']
-                ability_obj, _ = Ability.objects.get_or_create(name=ability_name)
-                pokemon_obj.abilities.add(ability_obj)
-
-            # Import evolučního řetězce
-            if species_response.status_code == 200:
-                evo_chain_url = species_data['evolution_chain']['url']
-                evo_chain_response = requests.get(evo_chain_url)
-                if evo_chain_response.status_code == 200:
-                    evo_chain_data = evo_chain_response.json()
-                    evolutions = self.parse_evolution_chain(evo_chain_data['chain'])
-                    self.save_evolutions(evolutions)
-
-            self.stdout.write(f'Importován Pokémon: {name} (#{pokedex_id})')
-
+        if skipped and skipped == len(results):
+            # Všechny zdroje odpověděly beze změny, snímek Pokédexu platí dál
+            self.stdout.write(self.style.SUCCESS('Žádné změny, import není potřeba.'))
+            return
+        self.write_snapshot()
         self.stdout.write(self.style.SUCCESS('Import dokončen!'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from Main.services import rebuild_battle_stats
+
+
+class Command(BaseCommand):
+    help = 'Přepočítá počty bitev, výher a proher Pokémonů z historie bitev'
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_battle_stats()
+        self.stdout.write(self.style.SUCCESS(f'Statistiky bitev přepočítány ({count} Pokémonů)'))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from Main.snapshot import get_snapshot
+from Main.tournament import DEFAULT_BATTLES, DEFAULT_CHUNK_SIZE, run_tournament
+
+
+class Command(BaseCommand):
+    help = 'Odehraje turnaj každý s každým a uloží matici podílů výher (protivníci, tier list)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--battles', type=int, default=DEFAULT_BATTLES,
+                            help='Počet bitev každé uspořádané dvojice')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Počet procesů (výchozí počet jader, 1 = bez procesů)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Počet řádků matice v jedné dávce práce')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Jen prvních N Pokémonů podle čísla v Pokédexu')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        if kwargs['battles'] < 1 or kwargs['chunk_size'] < 1:
+            raise CommandError('--battles i --chunk-size musí být kladné')
+
+        size = len(get_snapshot())
+        if kwargs['limit'] is not None:
+            size = min(size, kwargs['limit'])
+        if size < 2:
+            raise CommandError('Turnaj potřebuje aspoň 2 Pokémony')
+
+        started = time.perf_counter()
+        matchups = run_tournament(
+            range(size), battles=kwargs['battles'], workers=kwargs['workers'],
+            chunk_size=kwargs['chunk_size'], seed=kwargs['seed'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Turnaj dokončen: {size}×{size} dvojic po {kwargs["battles"]} bitvách za {elapsed:.1f} s '
+            f'(matice {matchups.pk}, {len(matchups.win_rates) // 1024} kB)'
+        ))
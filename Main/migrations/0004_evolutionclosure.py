@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_evolution_index(apps, schema_editor):
+    """Naplní uzávěr evolucí z existujících záznamů Evolution"""
+    Pokemon = apps.get_model('Main', 'Pokemon')
+    Evolution = apps.get_model('Main', 'Evolution')
+    EvolutionClosure = apps.get_model('Main', 'EvolutionClosure')
+
+    parents = {}
+    for from_id, to_id in Evolution.objects.values_list('from_pokemon_id', 'to_pokemon_id'):
+        parents[to_id] = min(parents.get(to_id, from_id), from_id)
+    nodes = set(parents) | set(parents.values())
+
+    rows = []
+    roots = {}
+    for node in nodes:
+        current, depth, seen = node, 0, set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            rows.append(EvolutionClosure(ancestor_id=current, descendant_id=node, depth=depth))
+            roots[node] = current
+            current, depth = parents.get(current), depth + 1
+
+    EvolutionClosure.objects.bulk_create(rows)
+    for node, root in roots.items():
+        Pokemon.objects.filter(pk=node).update(evolution_root_id=root)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0003_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokemon',
+            name='evolution_root',
+            field=models.ForeignKey(blank=True, help_text='Kořen evoluční rodiny (ID rodiny), udržuje import', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Main.pokemon'),
+        ),
+        migrations.CreateModel(
+            name='EvolutionClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='Main.pokemon')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='Main.pokemon')),
+            ],
+            options={
+                'verbose_name': 'Evoluční uzávěr',
+                'verbose_name_plural': 'Evoluční uzávěry',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='evolutionclosure',
+            index=models.Index(fields=['ancestor', 'depth'], name='Main_evolut_ancesto_ce9725_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='evolutionclosure',
+            unique_together={('ancestor', 'descendant')},
+        ),
+        migrations.RunPython(build_evolution_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:02
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Kopie normalize_name z Main/names.py v podobě, jakou měla při vzniku migrace,
+# aby pozdější změny živého kódu neměnily, jaké slugy migrace doplní
+GENDER_SUFFIXES = {'♀': ' f', '♂': ' m'}
+
+SEPARATORS_RE = re.compile(r'[\s_:-]+')
+DROPPED_RE = re.compile(r"[.'’`]")
+
+
+def normalize_name(name):
+    text = str(name).strip().lower()
+    for symbol, suffix in GENDER_SUFFIXES.items():
+        text = text.replace(symbol, suffix)
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+    text = DROPPED_RE.sub('', text)
+    return SEPARATORS_RE.sub('-', text).strip('-')
+
+
+def fill_slugs(apps, schema_editor):
+    """Doplní kanonická jména (slug) existujícím Pokémonům"""
+    Pokemon = apps.get_model('Main', 'Pokemon')
+    pokemon = list(Pokemon.objects.only('id', 'name'))
+    for p in pokemon:
+        p.slug = normalize_name(p.name)
+    Pokemon.objects.bulk_update(pokemon, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0004_evolutionclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokemon',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, default='', max_length=100, help_text='Kanonické jméno pro vyhledávání (normalize_name)'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pokemon',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, help_text='Kanonické jméno pro vyhledávání (normalize_name)', max_length=100, unique=True),
+        ),
+        migrations.CreateModel(
+            name='PokemonAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('pokemon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='Main.pokemon')),
+            ],
+            options={
+                'verbose_name': 'Alias Pokémona',
+                'verbose_name_plural': 'Aliasy Pokémonů',
+            },
+        ),
+    ]
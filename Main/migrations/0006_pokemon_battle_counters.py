@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rebuild_battle_stats(apps, schema_editor):
+    """Spočítá počty bitev, výher a proher z existující historie"""
+    Pokemon = apps.get_model('Main', 'Pokemon')
+    BattleHistory = apps.get_model('Main', 'BattleHistory')
+
+    counters = {}
+    for through, winning_result in ((BattleHistory.user_team.through, 'win'), (BattleHistory.cpu_team.through, 'lose')):
+        rows = through.objects.values('pokemon_id', 'battlehistory__result').annotate(count=Count('id'))
+        for row in rows:
+            stats = counters.setdefault(row['pokemon_id'], {'battles_count': 0, 'wins': 0, 'losses': 0})
+            stats['battles_count'] += row['count']
+            if row['battlehistory__result'] == winning_result:
+                stats['wins'] += row['count']
+            elif row['battlehistory__result'] != 'draw':
+                stats['losses'] += row['count']
+
+    Pokemon.objects.bulk_update(
+        [Pokemon(pk=pk, **stats) for pk, stats in counters.items()],
+        ['battles_count', 'wins', 'losses'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0005_pokemon_slug_pokemonalias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pokemon',
+            name='battles_count',
+            field=models.PositiveIntegerField(default=0, help_text='Počet bitev, ve kterých Pokémon bojoval'),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='wins',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pokemon',
+            name='losses',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['-battles_count', 'pokedex_id'], name='pokemon_popularity_idx'),
+        ),
+        migrations.RunPython(rebuild_battle_stats, migrations.RunPython.noop),
+    ]
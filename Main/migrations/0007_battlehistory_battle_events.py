@@ -0,0 +1,186 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:05
+
+import re
+import struct
+import zlib
+from collections import namedtuple
+
+from django.db import migrations, models
+
+
+# Kopie formátu záznamu z Main/battle_log.py v podobě, jakou měl při vzniku migrace,
+# aby pozdější změny živého kódu neměnily, co migrace zapisuje
+LOG_FORMAT = 1
+HEADER = struct.Struct('<BBB')
+EVENT = struct.Struct('<IBBHH')
+
+USER = 0
+CPU = 1
+
+RESULT_MESSAGES = {
+    'win': "🎉 Tví pokémoni vyhráli!",
+    'lose': "💀 Počítač vyhrál!",
+    'draw': "🤝 Remíza!",
+}
+
+VERSUS_RE = re.compile(r'^🆚 (.+) vs (.+)$')
+ATTACK_RE = re.compile(r'^(⚔️|💥) (.+) útočí za (\d+) poškození! \((?:Oponent|Tvůj) HP: (\d+)\)$')
+
+BattleEvent = namedtuple('BattleEvent', ['turn', 'side', 'attacker', 'damage', 'hp'])
+
+
+def encode_battle(user_team, cpu_team, events):
+    teams = list(user_team) + list(cpu_team)
+    data = b''.join([
+        HEADER.pack(LOG_FORMAT, len(user_team), len(cpu_team)),
+        struct.pack(f'<{len(teams)}H', *teams),
+        *(EVENT.pack(*event) for event in events),
+    ])
+    return zlib.compress(data, 9)
+
+
+def decode_battle(blob):
+    data = zlib.decompress(bytes(blob))
+    log_format, user_size, cpu_size = HEADER.unpack_from(data)
+    if log_format != LOG_FORMAT:
+        raise ValueError(f'Nepodporovaný formát záznamu bitvy: {log_format}')
+
+    teams = struct.unpack_from(f'<{user_size + cpu_size}H', data, HEADER.size)
+    offset = HEADER.size + 2 * len(teams)
+    events = [BattleEvent(*values) for values in EVENT.iter_unpack(data[offset:])]
+    return list(teams[:user_size]), list(teams[user_size:]), events
+
+
+def render_battle_log(user_names, cpu_names, events, result):
+    user_names = [name.capitalize() for name in user_names]
+    cpu_names = [name.capitalize() for name in cpu_names]
+    lines = ["=== PRŮBĚH BITVY ==="]
+
+    user_idx = 0
+    cpu_idx = 0
+    if user_names and cpu_names:
+        lines.append(f"🆚 {user_names[0]} vs {cpu_names[0]}")
+
+    for event in events:
+        if event.side == USER:
+            lines.append(f"⚔️ {user_names[event.attacker]} útočí za {event.damage} poškození! (Oponent HP: {event.hp})")
+        else:
+            lines.append(f"💥 {cpu_names[event.attacker]} útočí za {event.damage} poškození! (Tvůj HP: {event.hp})")
+
+        if event.hp == 0:
+            if event.side == USER:
+                lines.append(f"💀 {cpu_names[cpu_idx]} byl poražen!")
+                cpu_idx += 1
+            else:
+                lines.append(f"💀 {user_names[user_idx]} byl poražen!")
+                user_idx += 1
+            if user_idx < len(user_names) and cpu_idx < len(cpu_names):
+                lines.append(f"🆚 {user_names[user_idx]} vs {cpu_names[cpu_idx]}")
+
+    lines.append("=" * 30)
+    lines.append(RESULT_MESSAGES[result])
+    return lines
+
+
+def parse_battle_log(text):
+    user_names, cpu_names, events = [], [], []
+    turn = 0
+    opener = None
+
+    for line in text.split('\n'):
+        match = VERSUS_RE.match(line)
+        if match:
+            for names, name in ((user_names, match[1]), (cpu_names, match[2])):
+                if name not in names:
+                    names.append(name)
+            opener = None
+            continue
+
+        match = ATTACK_RE.match(line)
+        if match:
+            side = USER if match[1] == '⚔️' else CPU
+            names = user_names if side == USER else cpu_names
+            if match[2] not in names:
+                raise ValueError(f'Útočník mimo souboj: {line}')
+            if opener is None:
+                opener = side
+            if side == opener:
+                turn += 1
+            events.append(BattleEvent(turn, side, names.index(match[2]), int(match[3]), int(match[4])))
+
+    if not user_names or not cpu_names:
+        raise ValueError('Záznam neobsahuje žádný souboj')
+    return user_names, cpu_names, events
+
+
+def pack_battle_logs(apps, schema_editor):
+    """
+    Převede textové průběhy bitev na kompaktní záznam. Převádí se jen bitvy, jejichž
+    záznam se z událostí poskládá zpět na stejný text; ostatní si text ponechají.
+    """
+    BattleHistory = apps.get_model('Main', 'BattleHistory')
+
+    packed = []
+    battles = BattleHistory.objects.filter(battle_events__isnull=True).exclude(battle_log='')
+    for battle in battles.prefetch_related('user_team', 'cpu_team').iterator(chunk_size=500):
+        try:
+            user_names, cpu_names, events = parse_battle_log(battle.battle_log)
+            teams = []
+            for names, members in ((user_names, battle.user_team.all()), (cpu_names, battle.cpu_team.all())):
+                ids = {p.name.capitalize(): p.pokedex_id for p in members}
+                team = [ids[name] for name in names]
+                # Pokémoni, na které v bitvě nedošla řada, v textu nejsou
+                team += [p.pokedex_id for p in sorted(members, key=lambda p: p.pk) if p.pokedex_id not in team]
+                teams.append(team)
+            if render_battle_log(user_names, cpu_names, events, battle.result) != battle.battle_log.split('\n'):
+                continue
+        except (KeyError, ValueError):
+            continue
+
+        battle.battle_events = encode_battle(teams[0], teams[1], events)
+        battle.battle_log = ''
+        packed.append(battle)
+
+    BattleHistory.objects.bulk_update(packed, ['battle_events', 'battle_log'], batch_size=500)
+
+
+def unpack_battle_logs(apps, schema_editor):
+    """Zpětně složí textový průběh z kompaktního záznamu"""
+    Pokemon = apps.get_model('Main', 'Pokemon')
+    BattleHistory = apps.get_model('Main', 'BattleHistory')
+    names = dict(Pokemon.objects.values_list('pokedex_id', 'name'))
+
+    unpacked = []
+    for battle in BattleHistory.objects.filter(battle_events__isnull=False).iterator(chunk_size=500):
+        user_team, cpu_team, events = decode_battle(battle.battle_events)
+        lines = render_battle_log(
+            [names.get(pokedex_id, f'#{pokedex_id}') for pokedex_id in user_team],
+            [names.get(pokedex_id, f'#{pokedex_id}') for pokedex_id in cpu_team],
+            events, battle.result,
+        )
+        battle.battle_log = '\n'.join(lines)
+        battle.battle_events = None
+        unpacked.append(battle)
+
+    BattleHistory.objects.bulk_update(unpacked, ['battle_events', 'battle_log'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0006_pokemon_battle_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battlehistory',
+            name='battle_events',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='battlehistory',
+            name='battle_log',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(pack_battle_logs, unpack_battle_logs),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0007_battlehistory_battle_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='battlehistory',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='battlehistory',
+            name='engine_version',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='battlehistory',
+            name='teams',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0008_battlehistory_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchupMatrix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dex_version', models.CharField(max_length=64)),
+                ('engine_version', models.PositiveSmallIntegerField()),
+                ('battles_per_pair', models.PositiveIntegerField()),
+                ('pokedex_ids', models.BinaryField()),
+                ('win_rates', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Matice soubojů',
+                'verbose_name_plural': 'Matice soubojů',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0009_matchupmatrix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DexVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Verze dat Pokédexu',
+                'verbose_name_plural': 'Verze dat Pokédexu',
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 import requests
+from .names import normalize_name
 
 
 class PokemonType(models.Model):
@@ -18,6 +19,8 @@ class PokemonType(models.Model):
 
 class Pokemon(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True,
+                            help_text="Kanonické jméno pro vyhledávání (normalize_name)")
     pokedex_id = models.PositiveIntegerField(unique=True)
     height = models.PositiveIntegerField(help_text="Výška v decimetrech")
     weight = models.PositiveIntegerField(help_text="Váha v hectogramech")
@@ -25,6 +28,10 @@ class Pokemon(models.Model):
     sprite_url = models.URLField(blank=True, null=True)
     types = models.ManyToManyField(PokemonType, related_name='pokemon')
     abilities = models.ManyToManyField('Ability', related_name='pokemon', blank=True)
+    evolution_root = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Kořen evoluční rodiny (ID rodiny), udržuje import"
+    )
 
     # Základní statistiky
     hp = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(255)])
@@ -39,9 +46,19 @@ class Pokemon(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_legendary = models.BooleanField(default=False)
     is_mythical = models.BooleanField(default=False)
+
+    # Souhrnné statistiky bitev, udržuje save_battle_history (přepočet: rebuild_battle_stats)
+    battles_count = models.PositiveIntegerField(default=0, help_text="Počet bitev, ve kterých Pokémon bojoval")
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"{self.name} (#{self.pokedex_id})"
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = normalize_name(self.name)
+        super().save(*args, **kwargs)
     
     @property
     def total_stats(self):
@@ -66,6 +83,20 @@ class Pokemon(models.Model):
         verbose_name = "Pokémon"
         verbose_name_plural = "Pokémoni"
         ordering = ['pokedex_id']
+        indexes = [models.Index(fields=['-battles_count', 'pokedex_id'], name='pokemon_popularity_idx')]
+
+
+class PokemonAlias(models.Model):
+    """Alternativní jméno Pokémona (jméno species, lokalizované názvy), normalizované"""
+    alias = models.CharField(max_length=100, unique=True)
+    pokemon = models.ForeignKey(Pokemon, on_delete=models.CASCADE, related_name='aliases')
+
+    def __str__(self):
+        return f"{self.alias} -> {self.pokemon_id}"
+
+    class Meta:
+        verbose_name = "Alias Pokémona"
+        verbose_name_plural = "Aliasy Pokémonů"
 
 
 class Ability(models.Model):
@@ -95,6 +126,22 @@ class Evolution(models.Model):
         unique_together = ['from_pokemon', 'to_pokemon']
 
 
+class EvolutionClosure(models.Model):
+    """Uzávěr evolučního stromu: každá dvojice předek -> potomek včetně sebe sama (depth 0)"""
+    ancestor = models.ForeignKey(Pokemon, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Pokemon, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    class Meta:
+        verbose_name = "Evoluční uzávěr"
+        verbose_name_plural = "Evoluční uzávěry"
+        unique_together = ['ancestor', 'descendant']
+        indexes = [models.Index(fields=['ancestor', 'depth'])]
+
+
 class BattleHistory(models.Model):
     BATTLE_RESULT_CHOICES = [
         ('win', 'Výhra'),
@@ -105,7 +152,13 @@ class BattleHistory(models.Model):
     user_team = models.ManyToManyField(Pokemon, related_name='user_battles')
     cpu_team = models.ManyToManyField(Pokemon, related_name='cpu_battles')
     result = models.CharField(max_length=10, choices=BATTLE_RESULT_CHOICES)
-    battle_log = models.TextField()
+    battle_log = models.TextField(blank=True)
+    # Kompaktní záznam průběhu (viz Main/battle_log.py); text se z něj skládá až při zobrazení
+    battle_events = models.BinaryField(null=True, blank=True)
+    # Bitva odehraná ze seedu se neukládá, přehraje se enginem své verze (viz Main/battle.py)
+    seed = models.PositiveBigIntegerField(null=True, blank=True)
+    engine_version = models.PositiveSmallIntegerField(null=True, blank=True)
+    teams = models.BinaryField(null=True, blank=True)  # pořadí nasazení obou týmů
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -115,3 +168,55 @@ class BattleHistory(models.Model):
         verbose_name = "Historie bitvy"
         verbose_name_plural = "Historie bitev"
         ordering = ['-created_at']
+
+
+class ImportCheckpoint(models.Model):
+    """Stav jednoho zdroje z PokeAPI při posledním importu (pro inkrementální import)"""
+    url = models.CharField(max_length=255, unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    child_url = models.CharField(max_length=255, blank=True, help_text="Navazující zdroj (species, evoluční řetězec)")
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+    class Meta:
+        verbose_name = "Kontrolní bod importu"
+        verbose_name_plural = "Kontrolní body importu"
+
+
+class MatchupMatrix(models.Model):
+    """
+    Výsledek turnaje každý s každým (viz Main/tournament.py): podíl výher Pokémona
+    z řádku proti Pokémonovi ze sloupce v setinách procenta, uint16 po řádcích.
+    """
+    dex_version = models.CharField(max_length=64)
+    engine_version = models.PositiveSmallIntegerField()
+    battles_per_pair = models.PositiveIntegerField()
+    pokedex_ids = models.BinaryField()  # uint16, pořadí řádků i sloupců
+    win_rates = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Matice soubojů {self.created_at.strftime('%d.%m.%Y %H:%M')} ({len(self.pokedex_ids) // 2} Pokémonů)"
+
+    class Meta:
+        verbose_name = "Matice soubojů"
+        verbose_name_plural = "Matice soubojů"
+        ordering = ['-created_at']
+
+
+class DexVersion(models.Model):
+    """Verze dat Pokédexu sdílená všemi procesy (viz Main/caching.py); jediný řádek"""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Verze dat {self.version}"
+
+    class Meta:
+        verbose_name = "Verze dat Pokédexu"
+        verbose_name_plural = "Verze dat Pokédexu"
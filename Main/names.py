@@ -0,0 +1,27 @@
+# names.py
+import re
+import unicodedata
+
+
+# Znaky pohlaví v názvech (Nidoran♀) odpovídají příponám jmen v PokeAPI
+GENDER_SUFFIXES = {'♀': ' f', '♂': ' m'}
+
+SEPARATORS_RE = re.compile(r'[\s_:-]+')
+DROPPED_RE = re.compile(r"[.'’`]")
+
+
+def normalize_name(name) -> str:
+    """
+    Kanonický tvar jména Pokémona (slug): malá písmena bez diakritiky,
+    mezery a oddělovače jako '-', bez teček a apostrofů.
+    'Mr. Mime' -> 'mr-mime', 'Nidoran♀' -> 'nidoran-f', 'Farfetch’d' -> 'farfetchd'.
+    """
+    text = str(name).strip().lower()
+    for symbol, suffix in GENDER_SUFFIXES.items():
+        text = text.replace(symbol, suffix)
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+    text = DROPPED_RE.sub('', text)
+    return SEPARATORS_RE.sub('-', text).strip('-')
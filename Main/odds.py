@@ -0,0 +1,106 @@
+# odds.py
+from typing import Dict, List
+
+import numpy as np
+
+from .battle import MAX_TURNS, Combatant, effectiveness
+from .battle_log import CPU, USER
+
+
+# Výchozí a maximální počet simulovaných bitev na jeden dotaz; 10 000 bitev trvá
+# i při remízách na MAX_TURNS (3 na 3 i 6 na 6) kolem 0,3 s (endpoint je veřejný GET)
+DEFAULT_BATTLES = 2000
+MAX_BATTLES = 10000
+
+
+def _pairings(attackers: List[Combatant], defenders: List[Combatant]):
+    """Základní poškození a násobek typů pro každou dvojici [útočník, obránce]"""
+    base = np.subtract.outer([c.attack for c in attackers], [c.defense for c in defenders])
+    multiplier = np.array([[effectiveness(a.types, d.types) for d in defenders] for a in attackers])
+    return base, multiplier
+
+
+def simulate_many(team_a: List[Combatant], team_b: List[Combatant], battles=DEFAULT_BATTLES,
+                  seed=None, max_turns=MAX_TURNS) -> Dict[str, np.ndarray]:
+    """
+    Odehraje `battles` bitev týmů najednou podle pravidel `battle.simulate`.
+    HP, aktivní Pokémoni a počet kol všech bitev jsou pole; každé kolo se počítá
+    jen pro bitvy, které ještě běží. Vrací pole výsledků ('win', 'lose') a kol.
+    """
+    if not team_a or not team_b:
+        raise ValueError('Oba týmy musí mít aspoň jednoho Pokémona')
+
+    rng = np.random.default_rng(seed)
+    sizes = (len(team_a), len(team_b))
+    hp = (
+        np.tile([c.hp for c in team_a], (battles, 1)),
+        np.tile([c.hp for c in team_b], (battles, 1)),
+    )
+    # Indexováno [aktivní z týmu A, aktivní z týmu B] pro obě strany
+    base_ab, multiplier_ab = _pairings(team_a, team_b)
+    base_ba, multiplier_ba = _pairings(team_b, team_a)
+    base = (base_ab, base_ba.T)
+    multiplier = (multiplier_ab, multiplier_ba.T)
+    a_first = np.greater_equal.outer([c.speed for c in team_a], [c.speed for c in team_b])
+
+    active = np.zeros((2, battles), dtype=np.intp)
+    turns = np.zeros(battles, dtype=np.int32)
+    live = np.arange(battles)
+
+    while live.size:
+        turns[live] += 1
+        i = active[USER, live]
+        j = active[CPU, live]
+        first_is_a = a_first[i, j]
+        noise = rng.integers(-5, 6, size=(2, live.size))
+        standing = np.ones(live.size, dtype=bool)
+
+        for attack, attacker_is_a in enumerate((first_is_a, ~first_is_a)):
+            for side, other, mask in ((USER, CPU, attacker_is_a), (CPU, USER, ~attacker_is_a)):
+                hits = np.flatnonzero(standing & mask)
+                if not hits.size:
+                    continue
+                pair = (i[hits], j[hits])
+                damage = base[side][pair] + noise[attack, hits]
+                damage = np.where(damage > 0, (damage * multiplier[side][pair]).astype(np.int64), 0)
+
+                battle = live[hits]
+                defender = active[other, battle]
+                remaining = np.maximum(hp[other][battle, defender] - damage, 0)
+                hp[other][battle, defender] = remaining
+
+                fainted = remaining == 0
+                active[other, battle[fainted]] += 1
+                standing[hits[fainted]] = False
+
+        over = (active[USER, live] >= sizes[USER]) | (active[CPU, live] >= sizes[CPU]) | (turns[live] >= max_turns)
+        live = live[~over]
+
+    return {
+        'win': active[CPU] >= sizes[CPU],
+        'lose': active[USER] >= sizes[USER],
+        'turns': turns,
+    }
+
+
+def win_probabilities(team_a: List[Combatant], team_b: List[Combatant], battles=DEFAULT_BATTLES, seed=None) -> Dict:
+    """Pravděpodobnost výhry, remízy a prohry týmu A a rozdělení délky bitvy v kolech"""
+    outcome = simulate_many(team_a, team_b, battles, seed)
+    win = outcome['win'].mean()
+    lose = outcome['lose'].mean()
+    turns = outcome['turns']
+    lengths, counts = np.unique(turns, return_counts=True)
+
+    return {
+        'battles': battles,
+        'win': round(float(win), 4),
+        'draw': round(float(1 - win - lose), 4),
+        'lose': round(float(lose), 4),
+        'turns': {
+            'mean': round(float(turns.mean()), 2),
+            'median': int(np.median(turns)),
+            'min': int(lengths[0]),
+            'max': int(lengths[-1]),
+            'distribution': {int(length): round(count / battles, 4) for length, count in zip(lengths, counts)},
+        },
+    }
@@ -0,0 +1,101 @@
+# pokeapi.py
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PokeAPIClient:
+    """
+    Sdílený klient PokeAPI: jedna `Session` s poolem spojení (keep-alive,
+    znovupoužití TLS), timeouty, opakování s backoffem na 429/5xx
+    a počítadla volání, chyb, přenesených bajtů a latence podle endpointu.
+    """
+
+    def __init__(self, base_url=None, timeout=None, retries=None, backoff_factor=None, pool_maxsize=None):
+        self.base_url = base_url or getattr(settings, 'POKEAPI_BASE_URL', 'https://pokeapi.co/api/v2/')
+        self.timeout = timeout or getattr(settings, 'POKEAPI_TIMEOUT', (3.05, 10))
+        retries = getattr(settings, 'POKEAPI_RETRIES', 3) if retries is None else retries
+        backoff_factor = getattr(settings, 'POKEAPI_BACKOFF', 0.5) if backoff_factor is None else backoff_factor
+        pool_maxsize = pool_maxsize or getattr(settings, 'POKEAPI_POOL_SIZE', 20)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def url(self, path: str) -> str:
+        """Sestaví absolutní URL z cesty relativní k API (např. 'pokemon/pikachu')"""
+        return urljoin(self.base_url, path)
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        """Název endpointu pro statistiky (…/api/v2/pokemon-species/1/ -> pokemon-species)"""
+        parts = [p for p in urlparse(url).path.split('/') if p]
+        if 'v2' in parts and parts.index('v2') + 1 < len(parts):
+            return parts[parts.index('v2') + 1]
+        return parts[0] if parts else ''
+
+    def _record(self, url, seconds, size, error):
+        with self._lock:
+            stats = self._stats.setdefault(
+                self.endpoint(url), {'calls': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0}
+            )
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['bytes'] += size
+            stats['seconds'] += seconds
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET přes sdílenou session; výjimky requests propadají volajícímu"""
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            self._record(url, time.perf_counter() - started, 0, error=True)
+            raise
+        self._record(url, time.perf_counter() - started, len(response.content), error=response.status_code >= 400)
+        return response
+
+    def get_json(self, url: str, **kwargs) -> Optional[Dict]:
+        """Vrátí JSON odpovědi, nebo None při chybě či jiném stavu než 200"""
+        try:
+            response = self.get(url, **kwargs)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Kopie počítadel podle endpointu"""
+        with self._lock:
+            return {endpoint: dict(values) for endpoint, values in self._stats.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+api_client = PokeAPIClient()
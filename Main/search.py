@@ -0,0 +1,122 @@
+# search.py
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import List
+
+from .names import normalize_name
+from .snapshot import DexSnapshot, get_snapshot
+
+
+# Pořadí relevance výsledků
+EXACT, PREFIX, SUBSTRING, TYPE, FUZZY = range(5)
+
+# Minimální podobnost (Diceův koeficient trigramů) pro shodu s překlepem
+MIN_SIMILARITY = 0.4
+
+
+def trigrams(text: str) -> List[str]:
+    """Trigramy slova doplněného o okraje, takže i začátek a konec mají váhu"""
+    padded = f'  {text} '
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+class SearchIndex:
+    """
+    Trigramový index kanonických jmen (slugů) nad snímkem Pokédexu. Výsledky řadí podle
+    relevance: přesná shoda, prefix, podřetězec, typ, podobnost s překlepem;
+    uvnitř skupiny podle podobnosti a čísla v Pokédexu.
+    """
+
+    def __init__(self, snapshot: DexSnapshot):
+        self.snapshot = snapshot
+        self.names = list(snapshot.slugs)
+        self.sorted_names = [self.names[i] for i in snapshot.slug_order]
+
+        postings = {}
+        self.trigram_counts = array('H')
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, array('I')).append(i)
+        self.postings = postings
+
+    def prefix(self, query: str, limit=None) -> List[int]:
+        """Indexy Pokémonů, jejichž jméno začíná na `query`, abecedně (binární vyhledávání)"""
+        query = normalize_name(query)
+        if not query:
+            return []
+        start = bisect_left(self.sorted_names, query)
+        end = bisect_left(self.sorted_names, query + '\uffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self.snapshot.slug_order[position] for position in range(start, end)]
+
+    def similarities(self, query: str) -> Counter:
+        """Diceova podobnost trigramů dotazu se jmény, která s ním sdílí aspoň jeden trigram"""
+        grams = trigrams(query)
+        common = Counter()
+        for gram in grams:
+            common.update(self.postings.get(gram, ()))
+        return Counter({
+            i: 2 * shared / (len(grams) + self.trigram_counts[i])
+            for i, shared in common.items()
+        })
+
+    def search(self, query: str, limit=20, include_types=False) -> List[int]:
+        """Indexy nalezených Pokémonů seřazené podle relevance"""
+        query = normalize_name(query)
+        if not query:
+            return []
+
+        similarity = self.similarities(query)
+        ranks = {}
+
+        def add(i, rank):
+            if rank < ranks.get(i, FUZZY + 1):
+                ranks[i] = rank
+
+        for i in self.prefix(query):
+            add(i, EXACT if self.names[i] == query else PREFIX)
+
+        # Podřetězec obsahuje všechny trigramy dotazu kromě okrajových
+        if len(query) >= 3:
+            candidates = similarity
+        else:
+            candidates = range(len(self.names))
+        for i in candidates:
+            if query in self.names[i]:
+                add(i, SUBSTRING)
+
+        if include_types:
+            for type_name in self.snapshot.type_names:
+                if query in type_name:
+                    for i in self.snapshot.indices_with_type(type_name):
+                        add(i, TYPE)
+
+        for i, score in similarity.items():
+            if score >= MIN_SIMILARITY:
+                add(i, FUZZY)
+
+        ranked = sorted(ranks, key=lambda i: (ranks[i], -similarity.get(i, 0), i))
+        return ranked[:limit]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Index aktuálního snímku; s novým snímkem (import, změna dat) se přestaví"""
+    global _index
+    snapshot = get_snapshot()
+    index = _index
+    if index is not None and index.snapshot is snapshot:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.snapshot is not snapshot:
+            _index = SearchIndex(snapshot)
+        return _index
@@ -1,54 +1,214 @@
 # services.py
-import requests
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.core.cache import cache
 from django.db import transaction
-from .models import Pokemon, PokemonType, Evolution, BattleHistory
+from django.db.models import Count, F, Q, QuerySet
+from requests import RequestException
+from .models import Pokemon, PokemonType, Evolution, EvolutionClosure, BattleHistory
+from .names import normalize_name
 from typing import List, Dict, Optional
+from .pokeapi import api_client
+from .caching import LRUCache, NOT_FOUND, bump_dex_version
+from .singleflight import fetch_once
+from .snapshot import get_snapshot
+from .search import get_search_index
+
+
+POKEMON_CACHE_TTL = 3600  # 1 hodina
+POKEMON_NOT_FOUND_TTL = 60
+STATIC_RESOURCE_TTL = 24 * 3600  # species a evoluční řetězce se téměř nemění
+
+# Převedené slovníky nejžádanějších Pokémonů v rámci procesu
+pokemon_lru = LRUCache(maxsize=512)
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_many(names: List) -> Dict:
+    """
+    Převede seznam jmen, aliasů nebo čísel z Pokédexu na pk Pokémonů jedním
+    dotazem přes indexované sloupce (slug, alias, pokedex_id). Vrací slovník
+    vstup -> pk, nenalezené vynechá. Přednost má slug před aliasem.
+    """
+    keys = {name: normalize_name(name) for name in names}
+    slugs = {key for key in keys.values() if key and not key.isdigit()}
+    ids = {int(key) for key in keys.values() if key.isdigit()}
+    if not slugs and not ids:
+        return {}
+
+    rows = Pokemon.objects.filter(
+        Q(slug__in=slugs) | Q(pokedex_id__in=ids) | Q(aliases__alias__in=slugs)
+    ).values_list('id', 'slug', 'pokedex_id', 'aliases__alias')
+
+    by_key = {}
+    for pk, slug, pokedex_id, alias in rows:
+        by_key[slug] = pk
+        by_key[str(pokedex_id)] = pk
+        if alias is not None:
+            by_key.setdefault(alias, pk)
+
+    return {name: by_key[key] for name, key in keys.items() if key in by_key}
 
 
 def get_pokemon_from_db(name_or_id) -> Optional[Pokemon]:
-    """Získá Pokémona z databáze podle jména nebo ID"""
+    """Získá Pokémona z databáze podle jména, aliasu nebo ID"""
+    pk = resolve_many([name_or_id]).get(name_or_id)
+    if pk is None:
+        return None
+    return Pokemon.objects.prefetch_related('types').get(pk=pk)
+
+
+def _fetch_api_json(url: str):
+    """Stáhne JSON z PokeAPI. Vrací data, NOT_FOUND pro 404, nebo None při přechodné chybě."""
     try:
-        if str(name_or_id).isdigit():
-            return Pokemon.objects.select_related().prefetch_related('types').get(pokedex_id=int(name_or_id))
-        else:
-            return Pokemon.objects.select_related().prefetch_related('types').get(name__iexact=name_or_id)
-    except Pokemon.DoesNotExist:
+        response = api_client.get(url)
+    except RequestException:
+        return None
+    if response.status_code == 404:
+        return NOT_FOUND
+    if response.status_code != 200:
         return None
+    return response.json()
 
 
-def get_pokemon(name_or_id, use_cache=True) -> Optional[Dict]:
+def _load_pokemon(key: str):
     """
-    Získá Pokémona - nejdřív z DB, pak z API
-    Vrací data v původním formátu pro kompatibilitu
+    Načte Pokémona z DB, případně z API (a uloží ho do DB).
+    Souběžné požadavky na stejnou URL stahují a ukládají jen jednou.
+    Vrací data, NOT_FOUND pro 404, nebo None při přechodné chybě.
     """
-    # Pokus o načtení z databáze
-    pokemon_db = get_pokemon_from_db(name_or_id)
+    pokemon_db = get_pokemon_from_db(key)
     if pokemon_db:
         return convert_db_to_api_format(pokemon_db)
-    
-    # Pokud není v DB, načti z API
-    cache_key = f"pokemon_{str(name_or_id).lower()}"
-    
-    if use_cache:
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return cached_data
-    
-    # Načtení z API
-    url = f'https://pokeapi.co/api/v2/pokemon/{str(name_or_id).lower()}'
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        if use_cache:
-            cache.set(cache_key, data, 3600)  # Cache na 1 hodinu
-        
-        # Volitelně uložit do DB pro budoucí použití
-        save_pokemon_to_db(data)
+
+    url = api_client.url(f'pokemon/{key}')
+
+    def fetch():
+        data = _fetch_api_json(url)
+        if isinstance(data, dict):
+            # Volitelně uložit do DB pro budoucí použití
+            save_pokemon_to_db(data)
         return data
-    
-    return None
+
+    return fetch_once(url, f'api:{url}', fetch, POKEMON_CACHE_TTL, POKEMON_NOT_FOUND_TTL)
+
+
+def get_pokemon(name_or_id, use_cache=True) -> Optional[Dict]:
+    """
+    Získá Pokémona přes vrstvy: snímek Pokédexu -> in-process LRU -> sdílená cache -> DB -> API.
+    Nenalezené Pokémony si pamatuje krátce (negativní cache).
+    Klíče obsahují verzi dat, kterou zápis do DB zneplatní ve všech vrstvách.
+    Vrací data v původním formátu pro kompatibilitu
+    """
+    key = normalize_name(name_or_id)
+    if not use_cache:
+        data = _load_pokemon(key)
+        return None if data in (None, NOT_FOUND) else data
+
+    # Pokémoni z DB jsou ve snímku, to_api vrací vždy nový slovník
+    snapshot = get_snapshot()
+    index = snapshot.index_of(key)
+    if index is not None:
+        return snapshot.to_api(index)
+
+    cache_key = f'pokemon:{snapshot.version}:{key}'
+
+    data = pokemon_lru.get(cache_key)
+    if data is None:
+        data = cache.get(cache_key)
+        if data is None:
+            data = _load_pokemon(key)
+            if data is None:
+                return None
+            timeout = POKEMON_NOT_FOUND_TTL if data == NOT_FOUND else POKEMON_CACHE_TTL
+            cache.set(cache_key, data, timeout)
+        else:
+            timeout = POKEMON_NOT_FOUND_TTL if data == NOT_FOUND else POKEMON_CACHE_TTL
+        pokemon_lru.set(cache_key, data, timeout)
+
+    if data == NOT_FOUND:
+        return None
+    # Volající (aréna) data upravují, cache se nesmí měnit
+    return copy.deepcopy(data)
+
+
+def _fetch_pokemon_api(key: str):
+    """Stáhne Pokémona z API bez zápisu do DB (bezpečné volat z vláken)"""
+    url = api_client.url(f'pokemon/{key}')
+    return fetch_once(url, f'api:{url}', lambda: _fetch_api_json(url), POKEMON_CACHE_TTL, POKEMON_NOT_FOUND_TTL)
+
+
+def get_pokemon_many(names: List, max_workers=8) -> List[Dict]:
+    """
+    Dávková varianta `get_pokemon`. Jména deduplikuje, co jde, vezme ze snímku,
+    z cache a z DB jedním dotazem, zbytek stáhne z API paralelně v omezeném poolu
+    (zápis do DB pak proběhne v tomto vlákně). Vrací výsledky v pořadí
+    vstupu, nenalezené vynechá.
+    """
+    keys = [normalize_name(name) for name in names]
+    unique = list(dict.fromkeys(keys))
+    snapshot = get_snapshot()
+    cache_keys = {key: f'pokemon:{snapshot.version}:{key}' for key in unique}
+
+    found = {}
+    in_snapshot = {}
+    for key in unique:
+        index = snapshot.index_of(key)
+        if index is not None:
+            in_snapshot[key] = index
+            continue
+        data = pokemon_lru.get(cache_keys[key])
+        if data is not None:
+            found[key] = data
+
+    missing = [key for key in unique if key not in found and key not in in_snapshot]
+    if missing:
+        shared = cache.get_many([cache_keys[key] for key in missing])
+        for key in missing:
+            if cache_keys[key] in shared:
+                found[key] = shared[cache_keys[key]]
+
+    missing = [key for key in unique if key not in found and key not in in_snapshot]
+    if missing:
+        resolved = resolve_many(missing)
+        pks = list(dict.fromkeys(resolved.values()))
+        db_pokemon = serialize_pokemon(pks)
+        # Seznam pk zachová pořadí; když mezitím někdo Pokémona smazal, zbytek jde přes API
+        by_pk = dict(zip(pks, db_pokemon)) if len(db_pokemon) == len(pks) else {}
+        from_db = {key: by_pk[pk] for key, pk in resolved.items() if pk in by_pk}
+        loaded = dict(from_db)
+
+        missing = [key for key in missing if key not in from_db]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                fetched = dict(zip(missing, executor.map(_fetch_pokemon_api, missing)))
+            for key, data in fetched.items():
+                if data is None:
+                    continue
+                if isinstance(data, dict):
+                    save_pokemon_to_db(data)
+                loaded[key] = data
+
+        cache.set_many(
+            {cache_keys[key]: data for key, data in loaded.items() if data != NOT_FOUND}, POKEMON_CACHE_TTL
+        )
+        for key, data in loaded.items():
+            if data == NOT_FOUND:
+                cache.set(cache_keys[key], data, POKEMON_NOT_FOUND_TTL)
+        found.update(loaded)
+
+    for key, data in found.items():
+        pokemon_lru.set(cache_keys[key], data, POKEMON_NOT_FOUND_TTL if data == NOT_FOUND else POKEMON_CACHE_TTL)
+
+    result = []
+    for key in keys:
+        if key in in_snapshot:
+            result.append(snapshot.to_api(in_snapshot[key]))
+        elif key in found and found[key] != NOT_FOUND:
+            result.append(copy.deepcopy(found[key]))
+    return result
 
 
 def convert_db_to_api_format(pokemon: Pokemon) -> Dict:
@@ -84,6 +244,70 @@ def convert_db_to_api_format(pokemon: Pokemon) -> Dict:
 
 
 
+SERIALIZER_FIELDS = ('types', 'abilities', 'stats')
+
+STAT_COLUMNS = [
+    ('hp', 'hp'),
+    ('attack', 'attack'),
+    ('defense', 'defense'),
+    ('special-attack', 'special_attack'),
+    ('special-defense', 'special_defense'),
+    ('speed', 'speed'),
+]
+
+
+def serialize_pokemon(pokemon, fields=SERIALIZER_FIELDS) -> List[Dict]:
+    """
+    Hromadná varianta `convert_db_to_api_format` nad projekcemi values().
+    Přijímá queryset (i stránkovaný řez) nebo seznam pk a zachová jeho pořadí.
+    Typy a schopnosti načte vždy jedním dotazem pro celou stránku;
+    `fields` určuje, které z 'types', 'abilities', 'stats' se mají vůbec načíst.
+    """
+    columns = ['id', 'pokedex_id', 'name', 'height', 'weight', 'base_experience', 'sprite_url']
+    if 'stats' in fields:
+        columns += [column for _, column in STAT_COLUMNS]
+
+    if isinstance(pokemon, QuerySet):
+        rows = list(pokemon.values(*columns))
+    else:
+        ids = list(pokemon)
+        by_id = {row['id']: row for row in Pokemon.objects.filter(pk__in=ids).values(*columns)}
+        rows = [by_id[pk] for pk in ids if pk in by_id]
+
+    ids = [row['id'] for row in rows]
+    types = {}
+    abilities = {}
+    if 'types' in fields:
+        links = Pokemon.types.through.objects.filter(pokemon_id__in=ids).order_by('id')
+        for pokemon_id, name in links.values_list('pokemon_id', 'pokemontype__name'):
+            types.setdefault(pokemon_id, []).append({'type': {'name': name}})
+    if 'abilities' in fields:
+        links = Pokemon.abilities.through.objects.filter(pokemon_id__in=ids).order_by('id')
+        for pokemon_id, name in links.values_list('pokemon_id', 'ability__name'):
+            abilities.setdefault(pokemon_id, []).append({'ability': {'name': name}})
+
+    result = []
+    for row in rows:
+        data = {
+            'id': row['pokedex_id'],
+            'name': row['name'],
+            'height': row['height'],
+            'weight': row['weight'],
+            'base_experience': row['base_experience'],
+            'sprites': {
+                'front_default': row['sprite_url']
+            },
+        }
+        if 'types' in fields:
+            data['types'] = types.get(row['id'], [])
+        if 'abilities' in fields:
+            data['abilities'] = abilities.get(row['id'], [])
+        if 'stats' in fields:
+            data['stats'] = [{'stat': {'name': name}, 'base_stat': row[column]} for name, column in STAT_COLUMNS]
+        result.append(data)
+    return result
+
+
 def save_pokemon_to_db(api_data: Dict) -> Pokemon:
     """Uloží Pokémona z API dat do databáze"""
     try:
@@ -111,27 +335,30 @@ def save_pokemon_to_db(api_data: Dict) -> Pokemon:
                 pokemon_type, _ = PokemonType.objects.get_or_create(name=type_name)
                 pokemon.types.add(pokemon_type)
             
+            # Zneplatní všechny vrstvy cache až po commitu
+            if created:
+                transaction.on_commit(bump_dex_version)
             return pokemon
     except Exception as e:
-        print(f"Chyba při ukládání Pokémona: {e}")
+        logger.error('Chyba při ukládání Pokémona: %s', e)
         return None
 
 
 def get_all_pokemon(limit=50, use_db=True) -> List[Dict]:
     """Získá seznam Pokémonů - preferuje DB před API"""
     if use_db:
-        # Nejdřív zkus z databáze
-        db_pokemon = Pokemon.objects.prefetch_related('types').order_by('pokedex_id')[:limit]
-        if db_pokemon.exists():
-            return [convert_db_to_api_format(p) for p in db_pokemon]
+        # Nejdřív zkus ze snímku databáze
+        snapshot = get_snapshot()
+        if len(snapshot):
+            return [snapshot.to_api(i) for i in range(min(limit, len(snapshot)))]
     
     # Fallback na API
-    url = f'https://pokeapi.co/api/v2/pokemon?limit={limit}'
-    response = requests.get(url)
+    url = api_client.url(f'pokemon?limit={limit}')
+    data = api_client.get_json(url)
     
-    if response.status_code == 200:
-        results = response.json().get('results', [])
-        return [get_pokemon(p['name']) for p in results if get_pokemon(p['name'])]
+    if data is not None:
+        results = data.get('results', [])
+        return get_pokemon_many([p['name'] for p in results])
     
     return []
 
@@ -139,39 +366,36 @@ def get_all_pokemon(limit=50, use_db=True) -> List[Dict]:
 def get_pokemon_by_type(type_name: str, use_db=True) -> List[Dict]:
     """Získá Pokémony podle typu"""
     if use_db:
-        try:
-            pokemon_type = PokemonType.objects.get(name__iexact=type_name)
-            db_pokemon = pokemon_type.pokemon.prefetch_related('types').order_by('pokedex_id')[:50]
-            if db_pokemon.exists():
-                return [convert_db_to_api_format(p) for p in db_pokemon]
-        except PokemonType.DoesNotExist:
-            pass
+        snapshot = get_snapshot()
+        indices = snapshot.indices_with_type(type_name)[:50]
+        if indices:
+            return [snapshot.to_api(i) for i in indices]
     
     # Fallback na API
-    url = f'https://pokeapi.co/api/v2/type/{type_name.lower()}'
-    response = requests.get(url)
+    url = api_client.url(f'type/{type_name.lower()}')
+    data = api_client.get_json(url)
     
-    if response.status_code == 200:
-        results = response.json().get('pokemon', [])
-        return [get_pokemon(p['pokemon']['name']) for p in results[:50] if get_pokemon(p['pokemon']['name'])]
+    if data is not None:
+        results = data.get('pokemon', [])
+        return get_pokemon_many([p['pokemon']['name'] for p in results[:50]])
     
     return []
 
 
 def get_pokemon_species(name):
     """Zachová původní funkcionalitu pro kompatibilitu"""
-    url = f'https://pokeapi.co/api/v2/pokemon-species/{name.lower()}'
-    response = requests.get(url)
-    return response.json() if response.status_code == 200 else None
+    url = api_client.url(f'pokemon-species/{name.lower()}')
+    data = fetch_once(url, f'api:{url}', lambda: _fetch_api_json(url), STATIC_RESOURCE_TTL)
+    return None if data == NOT_FOUND else data
 
 
 def get_evolution_chain(url):
     """Zachová původní funkcionalitu pro kompatibilitu"""
-    response = requests.get(url)
-    if response.status_code != 200:
+    data = fetch_once(url, f'api:{url}', lambda: _fetch_api_json(url), STATIC_RESOURCE_TTL)
+    if data is None or data == NOT_FOUND:
         return []
     
-    chain = response.json().get('chain', {})
+    chain = data.get('chain', {})
     
     def extract(chain):
         result = []
@@ -184,72 +408,183 @@ def get_evolution_chain(url):
     return extract(chain)
 
 
+def rebuild_evolution_index():
+    """
+    Přepočítá index evolučních rodin (kořen rodiny a uzávěr předek -> potomek)
+    z tabulky Evolution. Volá se po každém zápisu evolucí při importu.
+    """
+    parents = {}
+    for from_id, to_id in Evolution.objects.values_list('from_pokemon_id', 'to_pokemon_id'):
+        parents[to_id] = min(parents.get(to_id, from_id), from_id)
+    nodes = set(parents) | set(parents.values())
+
+    rows = []
+    roots = {}
+    for node in nodes:
+        # Cesta ke kořeni; `seen` chrání před cyklem v chybných datech
+        current, depth, seen = node, 0, set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            rows.append(EvolutionClosure(ancestor_id=current, descendant_id=node, depth=depth))
+            roots[node] = current
+            current, depth = parents.get(current), depth + 1
+
+    with transaction.atomic():
+        EvolutionClosure.objects.all().delete()
+        EvolutionClosure.objects.bulk_create(rows)
+        Pokemon.objects.exclude(pk__in=nodes).filter(evolution_root__isnull=False).update(evolution_root=None)
+        Pokemon.objects.bulk_update(
+            [Pokemon(pk=node, evolution_root_id=root) for node, root in roots.items()],
+            ['evolution_root'], batch_size=500,
+        )
+
+
+def get_evolution_family(pokemon: Pokemon) -> List[str]:
+    """
+    Vrátí celou evoluční rodinu Pokémona jedním dotazem do uzávěru,
+    seřazenou podle stupně vývoje (včetně všech větví).
+    """
+    if pokemon.evolution_root_id is None:
+        return [pokemon.name]
+
+    return list(
+        EvolutionClosure.objects.filter(ancestor_id=pokemon.evolution_root_id)
+        .order_by('depth', 'descendant__pokedex_id')
+        .values_list('descendant__name', flat=True)
+    )
+
+
 def get_evolution_chain_from_db(pokemon_name: str) -> List[str]:
     """Získá evoluční řetězec z databáze"""
-    try:
-        pokemon = Pokemon.objects.get(name__iexact=pokemon_name)
-        chain = [pokemon.name]
-        
-        # Najdi předchůdce
-        current = pokemon
-        while current.evolves_from.exists():
-            current = current.evolves_from.first().from_pokemon
-            chain.insert(0, current.name)
-        
-        # Najdi následníky
-        current = pokemon
-        while current.evolves_to.exists():
-            current = current.evolves_to.first().to_pokemon
-            chain.append(current.name)
-        
-        return chain
-    except Pokemon.DoesNotExist:
+    pokemon = get_pokemon_from_db(pokemon_name)
+    if pokemon is None:
         return []
+    return get_evolution_family(pokemon)
 
 
-def save_battle_history(user_team: List[str], cpu_team: List[str], result: str, battle_log: List[str]):
-    """Uloží historii bitvy do databáze"""
-    try:
-        battle = BattleHistory.objects.create(
-            result=result,
-            battle_log='\n'.join(battle_log)
+def _battle_counter_deltas(battles: List[BattleHistory], teams: List) -> Dict[int, List[int]]:
+    """Přírůstky (bitvy, výhry, prohry) pro každého Pokémona z dávky bitev"""
+    deltas = {}
+    for battle, (user_ids, cpu_ids) in zip(battles, teams):
+        for pokemon_ids, winning_result in ((user_ids, 'win'), (cpu_ids, 'lose')):
+            for pk in pokemon_ids:
+                delta = deltas.setdefault(pk, [0, 0, 0])
+                delta[0] += 1
+                if battle.result == winning_result:
+                    delta[1] += 1
+                elif battle.result != 'draw':
+                    delta[2] += 1
+    return deltas
+
+
+def save_battles(battles: List[Dict]) -> List[BattleHistory]:
+    """
+    Uloží dávku bitev (slovníky s klíči user_team, cpu_team, result a záznamem průběhu:
+    seed, engine_version a teams pro přehrání, nebo battle_events ve formátu `decode_battle`,
+    nebo textový battle_log) v jedné transakci. Jména obou týmů všech bitev se přeloží jedním dotazem,
+    bitvy i vazby na týmy se zapíšou hromadně a počítadla Pokémonů se navýší
+    jedním UPDATE na každou kombinaci přírůstků. Počet dotazů nezávisí
+    na počtu bitev.
+    """
+    if not battles:
+        return []
+
+    resolved = resolve_many([name for b in battles for name in list(b['user_team']) + list(b['cpu_team'])])
+    teams = [
+        tuple(
+            list(dict.fromkeys(resolved[name] for name in b[side] if name in resolved))
+            for side in ('user_team', 'cpu_team')
         )
-        
-        # Přidej týmy
-        for pokemon_name in user_team:
-            pokemon = get_pokemon_from_db(pokemon_name)
-            if pokemon:
-                battle.user_team.add(pokemon)
-        
-        for pokemon_name in cpu_team:
-            pokemon = get_pokemon_from_db(pokemon_name)
-            if pokemon:
-                battle.cpu_team.add(pokemon)
-        
-        return battle
+        for b in battles
+    ]
+
+    with transaction.atomic():
+        created = BattleHistory.objects.bulk_create([
+            BattleHistory(
+                result=b['result'],
+                battle_log='\n'.join(b.get('battle_log') or ()),
+                battle_events=b.get('battle_events'),
+                seed=b.get('seed'),
+                engine_version=b.get('engine_version'),
+                teams=b.get('teams'),
+            )
+            for b in battles
+        ])
+
+        UserLink = BattleHistory.user_team.through
+        CpuLink = BattleHistory.cpu_team.through
+        UserLink.objects.bulk_create([
+            UserLink(battlehistory_id=battle.pk, pokemon_id=pk)
+            for battle, (user_ids, _) in zip(created, teams) for pk in user_ids
+        ])
+        CpuLink.objects.bulk_create([
+            CpuLink(battlehistory_id=battle.pk, pokemon_id=pk)
+            for battle, (_, cpu_ids) in zip(created, teams) for pk in cpu_ids
+        ])
+
+        by_delta = {}
+        for pk, delta in _battle_counter_deltas(created, teams).items():
+            by_delta.setdefault(tuple(delta), []).append(pk)
+        for (battles_count, wins, losses), pokemon_ids in by_delta.items():
+            Pokemon.objects.filter(pk__in=pokemon_ids).update(
+                battles_count=F('battles_count') + battles_count,
+                wins=F('wins') + wins,
+                losses=F('losses') + losses,
+            )
+
+    return created
+
+
+def save_battle_history(user_team: List[str], cpu_team: List[str], result: str, battle_log: List[str] = (),
+                        battle_events: bytes = None, seed: int = None, engine_version: int = None, teams: bytes = None):
+    """Uloží historii bitvy do databáze a v téže transakci navýší počítadla bitev Pokémonů"""
+    try:
+        return save_battles([{
+            'user_team': user_team,
+            'cpu_team': cpu_team,
+            'result': result,
+            'battle_log': battle_log,
+            'battle_events': battle_events,
+            'seed': seed,
+            'engine_version': engine_version,
+            'teams': teams,
+        }])[0]
     except Exception as e:
-        print(f"Chyba při ukládání historie bitvy: {e}")
+        logger.error('Chyba při ukládání historie bitvy: %s', e)
         return None
 
 
+def rebuild_battle_stats():
+    """Přepočítá počítadla bitev, výher a proher všech Pokémonů z historie bitev"""
+    counters = {}
+    for through, winning_result in ((BattleHistory.user_team.through, 'win'), (BattleHistory.cpu_team.through, 'lose')):
+        rows = through.objects.values('pokemon_id', 'battlehistory__result').annotate(count=Count('id'))
+        for row in rows:
+            stats = counters.setdefault(row['pokemon_id'], {'battles_count': 0, 'wins': 0, 'losses': 0})
+            stats['battles_count'] += row['count']
+            if row['battlehistory__result'] == winning_result:
+                stats['wins'] += row['count']
+            elif row['battlehistory__result'] != 'draw':
+                stats['losses'] += row['count']
+
+    with transaction.atomic():
+        Pokemon.objects.exclude(pk__in=list(counters)).update(battles_count=0, wins=0, losses=0)
+        Pokemon.objects.bulk_update(
+            [Pokemon(pk=pk, **stats) for pk, stats in counters.items()],
+            ['battles_count', 'wins', 'losses'], batch_size=500,
+        )
+    return len(counters)
+
+
 def get_popular_pokemon(limit=10) -> List[Dict]:
-    """Získá nejpopulárnější Pokémony podle počtu bitev"""
-    from django.db.models import Count
+    """Získá nejpopulárnější Pokémony podle počtu bitev (top-k z indexu počítadel)"""
+    popular = Pokemon.objects.filter(battles_count__gt=0).order_by('-battles_count', 'pokedex_id')[:limit]
     
-    popular = Pokemon.objects.annotate(
-        battle_count=Count('user_battles') + Count('cpu_battles')
-    ).order_by('-battle_count')[:limit]
-    
-    return [convert_db_to_api_format(p) for p in popular]
+    return serialize_pokemon(popular)
 
 
 def search_pokemon(query: str, limit=20) -> List[Dict]:
-    """Vyhledá Pokémony podle jména"""
-    from django.db.models import Q
-    
-    # Vyhledání v databázi
-    pokemon_list = Pokemon.objects.filter(
-        Q(name__icontains=query) | Q(types__name__icontains=query)
-    ).distinct().prefetch_related('types')[:limit]
-    
-    return [convert_db_to_api_format(p) for p in pokemon_list]
\ No newline at end of file
+    """Vyhledá Pokémony podle jména nebo typu, seřazené podle relevance"""
+    search_index = get_search_index()
+    matches = search_index.search(query, limit=limit, include_types=True)
+    return [search_index.snapshot.to_api(i) for i in matches]
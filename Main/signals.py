@@ -0,0 +1,24 @@
+# signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .caching import bump_dex_version
+from .models import Pokemon, PokemonType, PokemonAlias, Ability, Evolution
+
+
+@receiver(post_save, sender=Pokemon)
+@receiver(post_save, sender=PokemonType)
+@receiver(post_save, sender=Ability)
+@receiver(post_save, sender=Evolution)
+@receiver(post_save, sender=PokemonAlias)
+@receiver(post_delete, sender=Pokemon)
+@receiver(post_delete, sender=PokemonType)
+@receiver(post_delete, sender=Ability)
+@receiver(post_delete, sender=Evolution)
+@receiver(post_delete, sender=PokemonAlias)
+@receiver(m2m_changed, sender=Pokemon.types.through)
+@receiver(m2m_changed, sender=Pokemon.abilities.through)
+def invalidate_dex_snapshot(sender, **kwargs):
+    """Ruční změny (admin, shell) zneplatní snímek Pokédexu po commitu"""
+    transaction.on_commit(bump_dex_version)
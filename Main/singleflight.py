@@ -0,0 +1,92 @@
+# singleflight.py
+import threading
+import time
+from concurrent.futures import Future
+
+from django.core.cache import cache
+
+from .caching import NOT_FOUND
+
+
+LOCK_TIMEOUT = 10  # jak dlouho může jeden worker držet zámek stahování (s)
+LOCK_WAIT = 5  # jak dlouho ostatní workery čekají na jeho výsledek (s)
+LOCK_POLL = 0.05
+
+
+class SingleFlight:
+    """
+    Slučuje souběžná volání se stejným klíčem v rámci procesu:
+    funkci provede jen první volající, ostatní počkají na jeho výsledek.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+flight = SingleFlight()
+
+
+def _fetch_with_lock(key, cache_key, fetch, timeout, negative_timeout):
+    value = cache.get(cache_key)
+    if value is not None:
+        return value
+
+    # Zámek ve sdílené cache omezí duplicitní stahování napříč workery
+    lock_key = f'lock:{key}'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            value = cache.get(cache_key)
+            if value is not None:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        value = fetch()
+        if value is not None:
+            cache.set(cache_key, value, negative_timeout if value == NOT_FOUND else timeout)
+        return value
+
+    try:
+        value = fetch()
+        if value is not None:
+            cache.set(cache_key, value, negative_timeout if value == NOT_FOUND else timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def fetch_once(key, cache_key, fetch, timeout, negative_timeout=60):
+    """
+    Vrátí hodnotu ze sdílené cache, nebo ji jednou stáhne pomocí `fetch`.
+    `key` je URL zdroje: souběžná volání v procesu čekají na jeden fetch
+    a mezi workery brání duplicitám zámek v cache. `fetch` vrací data,
+    NOT_FOUND (uloží se na `negative_timeout`), nebo None (neukládá se).
+    """
+    value = cache.get(cache_key)
+    if value is not None:
+        return value
+    return flight.do(key, lambda: _fetch_with_lock(key, cache_key, fetch, timeout, negative_timeout))
@@ -0,0 +1,440 @@
+# snapshot.py
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .caching import get_dex_version
+from .models import Pokemon, PokemonType, PokemonAlias, Ability, EvolutionClosure
+from .names import normalize_name
+
+
+STAT_NAMES = ('hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed')
+STAT_COLUMNS = ('hp', 'attack', 'defense', 'special_attack', 'special_defense', 'speed')
+ALL_FIELDS = ('types', 'abilities', 'stats')
+
+LEGENDARY = 1
+MYTHICAL = 2
+
+# Binární formát snímku: hlavička, tabulka sekcí (offset, délka v bajtech)
+# a sekce zarovnané na 8 bajtů. Čísla jsou v nativním pořadí bajtů.
+MAGIC = b'PDEX'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHBx32sII')
+SECTION = struct.Struct('<QQ')
+ALIGNMENT = 8
+BYTEORDER = 0 if sys.byteorder == 'little' else 1
+
+SECTIONS = (
+    ('pks', 'q'),
+    ('pokedex_ids', 'I'),
+    ('heights', 'I'),
+    ('weights', 'I'),
+    ('base_experience', 'I'),
+    ('stats', 'H'),
+    ('flags', 'B'),
+    ('name_ids', 'I'),
+    ('slug_ids', 'I'),
+    ('sprite_ids', 'I'),
+    ('slug_order', 'I'),
+    ('alias_ids', 'I'),
+    ('alias_targets', 'I'),
+    ('type_name_ids', 'I'),
+    ('type_color_ids', 'I'),
+    ('type_offsets', 'I'),
+    ('type_ids', 'H'),
+    ('ability_name_ids', 'I'),
+    ('ability_offsets', 'I'),
+    ('ability_ids', 'H'),
+    ('family_index', 'i'),
+    ('family_offsets', 'I'),
+    ('family_members', 'I'),
+    ('string_offsets', 'I'),
+    ('string_data', 'B'),
+)
+
+
+class StringColumn(Sequence):
+    """Sloupec řetězců nad tabulkou internovaných řetězců, dekóduje až při přístupu"""
+
+    def __init__(self, offsets, data, ids):
+        self._offsets = offsets
+        self._data = data
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        string_id = self._ids[i]
+        return str(self._data[self._offsets[string_id]:self._offsets[string_id + 1]], 'utf-8')
+
+
+class DexSnapshot:
+    """
+    Neměnný snímek celého Pokédexu pro čtecí cesty.
+
+    Pokémoni jsou indexovaní 0..n-1 v pořadí pokedex_id. Číselné sloupce mají
+    pevnou šířku (statistiky jako jedno ploché pole n*6), typy, schopnosti
+    a evoluční rodiny jsou offsetové tabulky (CSR): položky Pokémona i leží
+    v `type_ids[type_offsets[i]:type_offsets[i + 1]]`. Řetězce jsou v jedné
+    tabulce internovaných řetězců. Sloupce jsou memoryview nad bufferem
+    snímku, takže nad souborem namapovaným přes mmap se nic nekopíruje.
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < HEADER.size + SECTION.size * len(SECTIONS):
+            raise ValueError('Neplatný nebo nepodporovaný soubor snímku Pokédexu')
+        magic, format_version, byteorder, version, count, section_count = HEADER.unpack_from(view)
+        if magic != MAGIC or format_version != FORMAT_VERSION or section_count != len(SECTIONS):
+            raise ValueError('Neplatný nebo nepodporovaný soubor snímku Pokédexu')
+        if byteorder != BYTEORDER:
+            raise ValueError('Snímek Pokédexu byl vytvořen s jiným pořadím bajtů')
+        self.version = version.rstrip(b'\0').decode('ascii')
+
+        columns = {}
+        for number, (name, typecode) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(view, HEADER.size + number * SECTION.size)
+            if offset + length > len(view):
+                raise ValueError('Soubor snímku Pokédexu je zkrácený')
+            columns[name] = view[offset:offset + length].cast(typecode)
+
+        self.pks = columns['pks']
+        self.pokedex_ids = columns['pokedex_ids']
+        self.heights = columns['heights']
+        self.weights = columns['weights']
+        self.base_experience = columns['base_experience']
+        self.stats = columns['stats']
+        self.flags = columns['flags']
+        self.slug_order = columns['slug_order']
+        self.alias_targets = columns['alias_targets']
+        self.type_offsets = columns['type_offsets']
+        self.type_ids = columns['type_ids']
+        self.ability_offsets = columns['ability_offsets']
+        self.ability_ids = columns['ability_ids']
+        self.family_index = columns['family_index']
+        self.family_offsets = columns['family_offsets']
+        self.family_members = columns['family_members']
+
+        strings = columns['string_offsets'], columns['string_data']
+        self.names = StringColumn(*strings, columns['name_ids'])
+        self.slugs = StringColumn(*strings, columns['slug_ids'])
+        self.aliases = StringColumn(*strings, columns['alias_ids'])
+        self.sprite_urls = StringColumn(*strings, columns['sprite_ids'])
+        self.type_names = StringColumn(*strings, columns['type_name_ids'])
+        self.type_colors = StringColumn(*strings, columns['type_color_ids'])
+        self.ability_names = StringColumn(*strings, columns['ability_name_ids'])
+
+        if len(self.pokedex_ids) != count:
+            raise ValueError('Soubor snímku Pokédexu je poškozený')
+        self._type_by_name = {name: i for i, name in enumerate(self.type_names)}
+
+    @classmethod
+    def from_db(cls, version) -> 'DexSnapshot':
+        """Sestaví snímek z DB několika dotazy bez ohledu na počet Pokémonů"""
+        return cls(encode_snapshot(version))
+
+    @classmethod
+    def from_file(cls, path) -> 'DexSnapshot':
+        """
+        Namapuje soubor snímku do paměti jen pro čtení. Stránky sdílí všechny
+        procesy, které mapují stejný soubor; nahrazený soubor (os.replace)
+        zůstává platný, dokud ho starý snímek drží.
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def __len__(self):
+        return len(self.pokedex_ids)
+
+    def index_of(self, name_or_id) -> Optional[int]:
+        """Index Pokémona podle jména, aliasu (viz `normalize_name`) nebo pokedex_id"""
+        key = normalize_name(name_or_id)
+        if key.isdigit():
+            i = bisect_left(self.pokedex_ids, int(key))
+            if i < len(self) and self.pokedex_ids[i] == int(key):
+                return i
+            return None
+
+        # Binární vyhledávání v indexech seřazených podle slugu, pak v seřazených aliasech
+        position = bisect_left(self.slug_order, key, key=self.slugs.__getitem__)
+        if position < len(self) and self.slugs[self.slug_order[position]] == key:
+            return self.slug_order[position]
+        position = bisect_left(self.aliases, key)
+        if position < len(self.aliases) and self.aliases[position] == key:
+            return self.alias_targets[position]
+        return None
+
+    def stats_of(self, i) -> tuple:
+        return tuple(self.stats[i * 6:i * 6 + 6])
+
+    def total_stats(self, i) -> int:
+        return sum(self.stats[i * 6:i * 6 + 6])
+
+    def type_ids_of(self, i) -> List[int]:
+        return list(self.type_ids[self.type_offsets[i]:self.type_offsets[i + 1]])
+
+    def type_names_of(self, i) -> List[str]:
+        return [self.type_names[t] for t in self.type_ids_of(i)]
+
+    def ability_names_of(self, i) -> List[str]:
+        ids = self.ability_ids[self.ability_offsets[i]:self.ability_offsets[i + 1]]
+        return [self.ability_names[a] for a in ids]
+
+    def family_of(self, i) -> List[int]:
+        """Celá evoluční rodina Pokémona (jako `get_evolution_family`), jinak jen on sám"""
+        family = self.family_index[i]
+        if family < 0:
+            return [i]
+        return list(self.family_members[self.family_offsets[family]:self.family_offsets[family + 1]])
+
+    def indices_with_type(self, type_name) -> List[int]:
+        type_id = self._type_by_name.get(str(type_name).lower())
+        if type_id is None:
+            return []
+        return [i for i in range(len(self)) if type_id in self.type_ids_of(i)]
+
+    def all_types(self) -> List[Dict]:
+        return [{'name': name, 'color': color} for name, color in zip(self.type_names, self.type_colors)]
+
+    def is_legendary(self, i) -> bool:
+        return bool(self.flags[i] & LEGENDARY)
+
+    def is_mythical(self, i) -> bool:
+        return bool(self.flags[i] & MYTHICAL)
+
+    def to_api(self, i, fields=ALL_FIELDS) -> Dict:
+        """Nový slovník ve formátu `convert_db_to_api_format` (volající ho může měnit)"""
+        data = {
+            'id': self.pokedex_ids[i],
+            'name': self.names[i],
+            'height': self.heights[i],
+            'weight': self.weights[i],
+            'base_experience': self.base_experience[i],
+            'sprites': {
+                'front_default': self.sprite_urls[i] or None
+            },
+        }
+        if 'types' in fields:
+            data['types'] = [{'type': {'name': name}} for name in self.type_names_of(i)]
+        if 'abilities' in fields:
+            data['abilities'] = [{'ability': {'name': name}} for name in self.ability_names_of(i)]
+        if 'stats' in fields:
+            data['stats'] = [
+                {'stat': {'name': name}, 'base_stat': value}
+                for name, value in zip(STAT_NAMES, self.stats_of(i))
+            ]
+        return data
+
+
+def _offsets(groups) -> array:
+    offsets = array('I', [0])
+    for group in groups:
+        offsets.append(offsets[-1] + len(group))
+    return offsets
+
+
+def _collect_columns() -> Dict[str, object]:
+    """Načte Pokédex z DB do sloupců snímku; řetězce zatím jako seznamy"""
+    rows = list(
+        Pokemon.objects.order_by('pokedex_id').values_list(
+            'id', 'pokedex_id', 'name', 'sprite_url', 'height', 'weight', 'base_experience',
+            'is_legendary', 'is_mythical', *STAT_COLUMNS, 'slug',
+        )
+    )
+    index_of_pk = {row[0]: i for i, row in enumerate(rows)}
+
+    aliases = sorted(
+        (alias, index_of_pk[pokemon_id])
+        for alias, pokemon_id in PokemonAlias.objects.values_list('alias', 'pokemon_id')
+        if pokemon_id in index_of_pk
+    )
+
+    types = list(PokemonType.objects.order_by('name').values_list('id', 'name', 'color'))
+    type_index = {pk: i for i, (pk, _, _) in enumerate(types)}
+    abilities = list(Ability.objects.order_by('name').values_list('id', 'name'))
+    ability_index = {pk: i for i, (pk, _) in enumerate(abilities)}
+
+    pokemon_types = [[] for _ in rows]
+    for pokemon_id, type_id in Pokemon.types.through.objects.order_by('id').values_list('pokemon_id', 'pokemontype_id'):
+        if pokemon_id in index_of_pk:
+            pokemon_types[index_of_pk[pokemon_id]].append(type_index[type_id])
+    pokemon_abilities = [[] for _ in rows]
+    for pokemon_id, ability_id in Pokemon.abilities.through.objects.order_by('id').values_list('pokemon_id', 'ability_id'):
+        if pokemon_id in index_of_pk:
+            pokemon_abilities[index_of_pk[pokemon_id]].append(ability_index[ability_id])
+
+    # Evoluční rodiny z uzávěru: řádky kořen -> potomek, seřazené podle hloubky a čísla
+    families = {}
+    closure = EvolutionClosure.objects.filter(
+        ancestor_id__in=Pokemon.objects.filter(evolution_root_id__isnull=False).values('evolution_root_id')
+    ).order_by('depth', 'descendant__pokedex_id').values_list('ancestor_id', 'descendant_id')
+    for root_id, descendant_id in closure:
+        if root_id in index_of_pk and descendant_id in index_of_pk:
+            families.setdefault(root_id, []).append(index_of_pk[descendant_id])
+
+    family_index = array('i', [-1] * len(rows))
+    family_offsets = array('I', [0])
+    family_members = array('I')
+    for number, members in enumerate(families.values()):
+        family_members.extend(members)
+        family_offsets.append(len(family_members))
+        for i in members:
+            family_index[i] = number
+
+    slugs = [row[15] for row in rows]
+    return {
+        'pks': array('q', [row[0] for row in rows]),
+        'pokedex_ids': array('I', [row[1] for row in rows]),
+        'heights': array('I', [row[4] for row in rows]),
+        'weights': array('I', [row[5] for row in rows]),
+        'base_experience': array('I', [row[6] for row in rows]),
+        'stats': array('H', [value for row in rows for value in row[9:15]]),
+        'flags': array('B', [LEGENDARY * row[7] | MYTHICAL * row[8] for row in rows]),
+        'names': [row[2] for row in rows],
+        'slugs': slugs,
+        'sprites': [row[3] or '' for row in rows],
+        'slug_order': array('I', sorted(range(len(rows)), key=slugs.__getitem__)),
+        'aliases': [alias for alias, _ in aliases],
+        'alias_targets': array('I', [i for _, i in aliases]),
+        'type_names': [name for _, name, _ in types],
+        'type_colors': [color for _, _, color in types],
+        'type_offsets': _offsets(pokemon_types),
+        'type_ids': array('H', [t for ids in pokemon_types for t in ids]),
+        'ability_names': [name for _, name in abilities],
+        'ability_offsets': _offsets(pokemon_abilities),
+        'ability_ids': array('H', [a for ids in pokemon_abilities for a in ids]),
+        'family_index': family_index,
+        'family_offsets': family_offsets,
+        'family_members': family_members,
+    }
+
+
+def encode_snapshot(version) -> bytes:
+    """Zakóduje aktuální stav DB do binárního formátu snímku"""
+    columns = _collect_columns()
+
+    # Tabulka internovaných řetězců (typy a barvy se opakují)
+    interned = {}
+    string_offsets = array('I', [0])
+    string_data = bytearray()
+
+    def intern(values):
+        ids = array('I')
+        for value in values:
+            if value not in interned:
+                interned[value] = len(interned)
+                string_data.extend(value.encode('utf-8'))
+                string_offsets.append(len(string_data))
+            ids.append(interned[value])
+        return ids
+
+    columns['name_ids'] = intern(columns.pop('names'))
+    columns['slug_ids'] = intern(columns.pop('slugs'))
+    columns['alias_ids'] = intern(columns.pop('aliases'))
+    columns['sprite_ids'] = intern(columns.pop('sprites'))
+    columns['type_name_ids'] = intern(columns.pop('type_names'))
+    columns['type_color_ids'] = intern(columns.pop('type_colors'))
+    columns['ability_name_ids'] = intern(columns.pop('ability_names'))
+    columns['string_offsets'] = string_offsets
+    columns['string_data'] = array('B', string_data)
+
+    position = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    payload = []
+    for name, typecode in SECTIONS:
+        data = columns[name].tobytes()
+        padding = -position % ALIGNMENT
+        payload.append(b'\0' * padding)
+        position += padding
+        table.append(SECTION.pack(position, len(data)))
+        payload.append(data)
+        position += len(data)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, BYTEORDER, version.encode('ascii'),
+                         len(columns['pokedex_ids']), len(SECTIONS))
+    return b''.join([header, *table, *payload])
+
+
+def write_snapshot_file(path, version=None) -> int:
+    """
+    Zapíše snímek aktuální verze dat do souboru. Zápis jde přes dočasný
+    soubor a os.replace, takže workery nikdy nenamapují rozepsaný soubor.
+    Vrací velikost souboru v bajtech.
+    """
+    data = encode_snapshot(version or get_dex_version())
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.dex-snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(data)
+
+
+def snapshot_path() -> Optional[str]:
+    path = getattr(settings, 'DEX_SNAPSHOT_PATH', None)
+    return str(path) if path else None
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _load_snapshot(version) -> DexSnapshot:
+    path = snapshot_path()
+    if path is None:
+        return DexSnapshot.from_db(version)
+
+    # Verzi nese hlavička souboru: soubor stejné verze (z importu nebo jiného workeru)
+    # stačí namapovat; jiná verze (i vyšší, např. po obnově DB) znamená přestavbu
+    try:
+        snapshot = DexSnapshot.from_file(path)
+        if snapshot.version == version:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+
+    # Jinak ho sestavit z DB a atomicky nahradit (dočasný soubor + os.replace)
+    try:
+        write_snapshot_file(path, version)
+        snapshot = DexSnapshot.from_file(path)
+        if snapshot.version == version:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+    return DexSnapshot.from_db(version)
+
+
+def get_snapshot() -> DexSnapshot:
+    """
+    Sdílený snímek procesu. Při změně verze dat (import, uložení Pokémona)
+    se načte nový a atomicky nahradí starý; rozpracované požadavky
+    dočtou ten, který už drží.
+    """
+    global _snapshot
+    version = get_dex_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _load_snapshot(version)
+        return _snapshot
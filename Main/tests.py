@@ -1,4 +1,7 @@
-from django.test import TestCase
+import hashlib
+import json
+import random
+from django.test import TestCase, TransactionTestCase, override_settings
 from unittest.mock import patch
 from django.urls import reverse
 from .services import (
@@ -10,47 +13,103 @@ from .services import (
 )
 
 
-class PokemonServiceTests(TestCase):
+@override_settings(DEX_SNAPSHOT_PATH=None, DEX_VERSION_TTL=None)
+class DexTestCase(TestCase):
+    """
+    Čistá cache a snímek Pokédexu pro každý test. V TestCase se neprovádějí on_commit
+    callbacky a verze dat v DB se mezi testy vrací zpět, takže se snímek zahazuje ručně.
+    Snímek se v testech drží jen v paměti, pokud test nenastaví vlastní soubor.
+    """
 
-    @patch('Main.services.requests.get')
+    def setUp(self):
+        from django.core.cache import cache
+        from . import snapshot
+        from .services import pokemon_lru
+        cache.clear()
+        pokemon_lru.clear()
+        snapshot._snapshot = None
+
+
+
+@override_settings(DEX_SNAPSHOT_PATH=None, DEX_VERSION_TTL=0)
+class SharedDexVersionTests(TransactionTestCase):
+    """Verze dat je v DB, takže změnu z jiného procesu uvidí i worker s cache jen v procesu"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import snapshot
+        cache.clear()
+        snapshot._snapshot = None
+
+    def test_change_from_other_connection_reaches_snapshot(self):
+        from django.db import connections
+        from django.utils import timezone
+        from .snapshot import get_snapshot
+        make_pokemon('mewtwo', 150)
+        make_pokemon('mew', 151)
+        self.assertEqual(len(get_snapshot()), 2)
+
+        # Jiný proces: smaže Pokémona a zvýší verzi vlastním spojením, naši cache nevidí
+        other = connections.create_connection('default')
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('DELETE FROM "Main_pokemon" WHERE "name" = %s', ['mewtwo'])
+                cursor.execute(
+                    'INSERT INTO "Main_dexversion" ("id", "version", "updated_at") VALUES (1, 1, %s) '
+                    'ON CONFLICT ("id") DO UPDATE SET "version" = "version" + 1',
+                    [timezone.now()],
+                )
+        finally:
+            other.close()
+
+        snapshot = get_snapshot()
+        self.assertEqual(len(snapshot), 1)
+        self.assertIsNone(snapshot.index_of('mewtwo'))
+
+class PokemonServiceTests(DexTestCase):
+
+    @patch('Main.services.api_client.get')
     def test_get_pokemon_success(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {'name': 'pikachu'}
-        result = get_pokemon('pikachu')
+        # Neúplná data z API se vrátí, ale do DB se neuloží
+        with self.assertLogs('Main.services', level='ERROR') as logs:
+            result = get_pokemon('pikachu')
         self.assertEqual(result['name'], 'pikachu')
+        self.assertIn('Chyba při ukládání Pokémona', logs.output[0])
 
-    @patch('Main.services.requests.get')
+    @patch('Main.services.api_client.get')
     def test_get_pokemon_failure(self, mock_get):
         mock_get.return_value.status_code = 404
         result = get_pokemon('missingno')
         self.assertIsNone(result)
 
-    @patch('Main.services.get_pokemon')
-    @patch('Main.services.requests.get')
-    def test_get_all_pokemon(self, mock_get, mock_get_pokemon):
+    @patch('Main.services.get_pokemon_many')
+    @patch('Main.services.api_client.get')
+    def test_get_all_pokemon(self, mock_get, mock_get_pokemon_many):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
             'results': [{'name': 'pikachu'}, {'name': 'bulbasaur'}]
         }
-        mock_get_pokemon.side_effect = lambda name: {'name': name}
+        mock_get_pokemon_many.side_effect = lambda names: [{'name': name} for name in names]
         result = get_all_pokemon(limit=2)
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0]['name'], 'pikachu')
 
-    @patch('Main.services.requests.get')
+    @patch('Main.services.api_client.get')
     def test_get_pokemon_species_success(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {'evolution_chain': {'url': 'some-url'}}
         result = get_pokemon_species('pikachu')
         self.assertIn('evolution_chain', result)
 
-    @patch('Main.services.requests.get')
+    @patch('Main.services.api_client.get')
     def test_get_pokemon_species_failure(self, mock_get):
         mock_get.return_value.status_code = 404
         result = get_pokemon_species('unknown')
         self.assertIsNone(result)
 
-    @patch('Main.services.requests.get')
+    @patch('Main.services.api_client.get')
     def test_get_evolution_chain(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -68,19 +127,19 @@ class PokemonServiceTests(TestCase):
         result = get_evolution_chain('some-url')
         self.assertEqual(result, ['bulbasaur', 'ivysaur', 'venusaur'])
 
-    @patch('Main.services.get_pokemon')
-    @patch('Main.services.requests.get')
-    def test_get_pokemon_by_type(self, mock_get, mock_get_pokemon):
+    @patch('Main.services.get_pokemon_many')
+    @patch('Main.services.api_client.get')
+    def test_get_pokemon_by_type(self, mock_get, mock_get_pokemon_many):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
             'pokemon': [{'pokemon': {'name': 'pikachu'}}, {'pokemon': {'name': 'raichu'}}]
         }
-        mock_get_pokemon.side_effect = lambda name: {'name': name}
+        mock_get_pokemon_many.side_effect = lambda names: [{'name': name} for name in names]
         result = get_pokemon_by_type('electric')
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0]['name'], 'pikachu')
 
-class PokemonViewsTest(TestCase):
+class PokemonViewsTest(DexTestCase):
 
     @patch('Main.views.get_pokemon_by_type')
     @patch('Main.views.get_all_pokemon')
@@ -121,3 +180,1242 @@ class PokemonViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['p1']['name'], 'pikachu')
         self.assertEqual(response.context['p2']['name'], 'bulbasaur')
+
+
+def fake_pokeapi_response(url, **kwargs):
+    """Jednoduchá náhrada PokeAPI pro testy importu"""
+    from unittest.mock import Mock
+    chain = {
+        'species': {'name': 'bulbasaur'},
+        'evolution_details': [],
+        'evolves_to': [{
+            'species': {'name': 'ivysaur'},
+            'evolution_details': [{'min_level': 16, 'trigger': {'name': 'level-up'}}],
+            'evolves_to': [],
+        }],
+    }
+    pokemon = {
+        'bulbasaur': (1, ['grass', 'poison'], ['overgrow']),
+        'ivysaur': (2, ['grass', 'poison'], ['overgrow', 'chlorophyll']),
+    }
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    if 'pokemon?limit=' in url:
+        data = {'results': [
+            {'name': name, 'url': f'https://pokeapi.co/api/v2/pokemon/{pid}/'}
+            for name, (pid, _, _) in pokemon.items()
+        ]}
+    elif '/pokemon/' in url and url.rstrip('/').rsplit('/', 1)[1] in {str(i) for i, _, _ in pokemon.values()} | set(pokemon):
+        key = url.rstrip('/').rsplit('/', 1)[1]
+        name = key if key in pokemon else next(n for n, (i, _, _) in pokemon.items() if str(i) == key)
+        pid, types, abilities = pokemon[name]
+        data = {
+            'id': pid, 'name': name, 'height': 7, 'weight': 69, 'base_experience': 64,
+            'sprites': {'front_default': f'https://img/{pid}.png'},
+            'stats': [{'stat': {'name': s}, 'base_stat': 50 + pid} for s in
+                      ['hp', 'attack', 'defense', 'special-attack', 'special-defense', 'speed']],
+            'types': [{'type': {'name': t}} for t in types],
+            'abilities': [{'ability': {'name': a}} for a in abilities],
+            'species': {'url': f'https://pokeapi.co/api/v2/pokemon-species/{pid}/'},
+        }
+    elif '/pokemon-species/' in url:
+        pid = url.rstrip('/').rsplit('/', 1)[1]
+        names = {'1': ('bulbasaur', 'Bisasam'), '2': ('ivysaur', 'Bisaknosp')}.get(pid, ('missingno', 'MissingNo.'))
+        data = {'name': names[0], 'names': [{'name': names[0].capitalize(), 'language': {'name': 'en'}},
+                                            {'name': names[1], 'language': {'name': 'de'}}],
+                'is_legendary': False, 'is_mythical': False,
+                'evolution_chain': {'url': 'https://pokeapi.co/api/v2/evolution-chain/1/'}}
+    elif '/evolution-chain/' in url:
+        data = {'id': 1, 'chain': chain}
+    else:
+        response.status_code = 404
+        data = {}
+    response.content = json.dumps(data, sort_keys=True).encode()
+    if response.status_code == 200:
+        response.headers = {'ETag': '"%s"' % hashlib.md5(response.content).hexdigest()}
+        if kwargs.get('headers', {}).get('If-None-Match') == response.headers['ETag']:
+            response.status_code = 304
+    response.json.return_value = data
+    return response
+
+
+class ImportPokemonCommandTests(DexTestCase):
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_import_with_workers(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Pokemon, Evolution
+
+        call_command('import_pokemon', '--workers', '4', stdout=StringIO())
+
+        self.assertEqual(list(Pokemon.objects.values_list('name', flat=True)), ['bulbasaur', 'ivysaur'])
+        self.assertEqual(Pokemon.objects.get(name='ivysaur').abilities.count(), 2)
+        self.assertTrue(Evolution.objects.filter(from_pokemon__name='bulbasaur', to_pokemon__name='ivysaur').exists())
+
+    def test_host_limiter_caps_in_flight_requests(self):
+        import threading
+        import time
+        from .importer import HostLimiter, iter_pokemon_bundles
+
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_get(url, **kwargs):
+            with lock:
+                in_flight.append(url)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(url)
+            response = fake_pokeapi_response(url)
+            return response
+
+        entries = [{'name': 'bulbasaur', 'url': 'https://pokeapi.co/api/v2/pokemon/1/'}] * 8
+        with patch('Main.importer.api_client.get', side_effect=slow_get):
+            bundles = list(iter_pokemon_bundles(entries, workers=8, limiter=HostLimiter(max_per_host=2)))
+
+        self.assertEqual(len(bundles), 8)
+        self.assertLessEqual(max(peak), 2)
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_import_uses_bulk_writes(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import Pokemon
+
+        call_command('import_pokemon', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_pokemon', stdout=StringIO())
+
+        self.assertLess(len(queries), 40)
+        self.assertEqual(Pokemon.objects.count(), 2)
+        self.assertEqual(sorted(Pokemon.objects.get(name='bulbasaur').type_names), ['grass', 'poison'])
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_incremental_import_skips_unchanged_data(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import DexVersion
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_pokemon', '--incremental', stdout=StringIO())
+        mock_get.reset_mock()
+        version = DexVersion.objects.values_list('version', flat=True).first()
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            call_command('import_pokemon', '--incremental', stdout=out)
+
+        # Nic se nezapisuje a verze dat (tedy snímky a cache workerů) zůstává
+        writes = [q['sql'] for q in queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertEqual(DexVersion.objects.values_list('version', flat=True).first(), version)
+        # Seznam a pak podmíněně detail, species obou Pokémonů a jednou společný řetězec
+        self.assertEqual(mock_get.call_count, 6)
+        revalidated = [c for c in mock_get.call_args_list if 'If-None-Match' in c.kwargs.get('headers', {})]
+        self.assertEqual(len(revalidated), 5)
+        self.assertIn('Beze změny přeskočeno: 2', out.getvalue())
+        self.assertIn('Žádné změny', out.getvalue())
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_incremental_import_updates_changed_pokemon(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Pokemon
+
+        call_command('import_pokemon', '--incremental', stdout=StringIO())
+
+        def changed(url, **kwargs):
+            response = fake_pokeapi_response(url, **kwargs)
+            if url == 'https://pokeapi.co/api/v2/pokemon/2/' and response.status_code == 304:
+                data = fake_pokeapi_response(url).json.return_value
+                response = fake_pokeapi_response(url)
+                response.json.return_value = dict(data, weight=130)
+                response.content = json.dumps(response.json.return_value, sort_keys=True).encode()
+            return response
+
+        mock_get.side_effect = changed
+        out = StringIO()
+        call_command('import_pokemon', '--incremental', stdout=out)
+
+        self.assertEqual(Pokemon.objects.get(pokedex_id=2).weight, 130)
+        self.assertIn('Beze změny přeskočeno: 1', out.getvalue())
+        self.assertIn('Import dokončen', out.getvalue())
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_incremental_import_resumes_unfinished_entries(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ImportCheckpoint
+
+        call_command('import_pokemon', '--incremental', stdout=StringIO())
+        # Simulace přerušení: seznam ani detail druhého Pokémona nebyly dokončeny
+        ImportCheckpoint.objects.filter(url__in=['https://pokeapi.co/api/v2/pokemon?limit=150',
+                                                 'https://pokeapi.co/api/v2/pokemon/2/']).update(completed=False)
+        mock_get.reset_mock()
+
+        out = StringIO()
+        call_command('import_pokemon', '--incremental', stdout=out)
+
+        requested = [c.args[0] for c in mock_get.call_args_list]
+        self.assertNotIn('https://pokeapi.co/api/v2/pokemon/1/', requested)
+        self.assertIn('https://pokeapi.co/api/v2/pokemon/2/', requested)
+        self.assertIn('ivysaur (#2)', out.getvalue())
+        self.assertFalse(ImportCheckpoint.objects.filter(completed=False).exists())
+
+    def write_dump(self, root):
+        """Zapíše falešná data PokeAPI v rozložení api-data"""
+        import os
+        urls = ['https://pokeapi.co/api/v2/pokemon/1/', 'https://pokeapi.co/api/v2/pokemon/2/',
+                'https://pokeapi.co/api/v2/pokemon-species/1/', 'https://pokeapi.co/api/v2/pokemon-species/2/',
+                'https://pokeapi.co/api/v2/evolution-chain/1/']
+        for url in urls:
+            directory = os.path.join(root, 'data', url.split('pokeapi.co/', 1)[1])
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'index.json'), 'w') as f:
+                json.dump(fake_pokeapi_response(url).json.return_value, f)
+
+    @patch('Main.importer.api_client.get', side_effect=AssertionError('síť se nesmí použít'))
+    def test_import_from_dump_directory(self, mock_get):
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Pokemon, Evolution
+
+        with tempfile.TemporaryDirectory() as root:
+            self.write_dump(root)
+            call_command('import_pokemon', '--from-dump', root, stdout=StringIO())
+
+        self.assertEqual(list(Pokemon.objects.values_list('name', flat=True)), ['bulbasaur', 'ivysaur'])
+        self.assertEqual(Evolution.objects.count(), 1)
+
+    @patch('Main.importer.api_client.get', side_effect=AssertionError('síť se nesmí použít'))
+    def test_import_from_dump_tarball(self, mock_get):
+        import os
+        import tarfile
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Pokemon
+
+        with tempfile.TemporaryDirectory() as root:
+            self.write_dump(os.path.join(root, 'api-data'))
+            archive = os.path.join(root, 'api-data.tar.gz')
+            with tarfile.open(archive, 'w:gz') as tar:
+                tar.add(os.path.join(root, 'api-data'), arcname='api-data')
+            call_command('import_pokemon', '--from-dump', archive, stdout=StringIO())
+
+        self.assertEqual(Pokemon.objects.count(), 2)
+        self.assertEqual(Pokemon.objects.get(name='ivysaur').abilities.count(), 2)
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_evolution_chain_fetched_once_per_family(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Evolution
+
+        call_command('import_pokemon', '--workers', '2', stdout=StringIO())
+
+        chain_calls = [c for c in mock_get.call_args_list if '/evolution-chain/' in c.args[0]]
+        self.assertEqual(len(chain_calls), 1)
+        evolution = Evolution.objects.get()
+        self.assertEqual(evolution.level, 16)
+        self.assertEqual(evolution.condition, 'level-up')
+
+    def test_parse_evolution_chain_keeps_branches(self):
+        from .importer import parse_evolution_chain
+
+        chain = {
+            'species': {'name': 'eevee'},
+            'evolves_to': [
+                {'species': {'name': 'vaporeon'}, 'evolves_to': [],
+                 'evolution_details': [{'item': {'name': 'water-stone'}, 'trigger': {'name': 'use-item'}}]},
+                {'species': {'name': 'jolteon'}, 'evolves_to': [],
+                 'evolution_details': [{'item': {'name': 'thunder-stone'}, 'trigger': {'name': 'use-item'}}]},
+            ],
+        }
+        edges = parse_evolution_chain(chain)
+
+        self.assertEqual([(e['from'], e['to']) for e in edges], [('eevee', 'vaporeon'), ('eevee', 'jolteon')])
+        self.assertEqual(edges[1]['item'], 'thunder-stone')
+
+
+def make_pokemon(name, pokedex_id, **stats):
+    from .models import Pokemon
+    defaults = {'height': 10, 'weight': 100, 'hp': 50, 'attack': 50, 'defense': 50,
+                'special_attack': 50, 'special_defense': 50, 'speed': 50}
+    defaults.update(stats)
+    return Pokemon.objects.create(name=name, pokedex_id=pokedex_id, **defaults)
+
+
+class EvolutionIndexTests(DexTestCase):
+
+    def setUp(self):
+        from .models import Evolution
+        super().setUp()
+        self.eevee = make_pokemon('eevee', 133)
+        self.vaporeon = make_pokemon('vaporeon', 134)
+        self.jolteon = make_pokemon('jolteon', 135)
+        Evolution.objects.create(from_pokemon=self.eevee, to_pokemon=self.vaporeon)
+        Evolution.objects.create(from_pokemon=self.eevee, to_pokemon=self.jolteon)
+
+    def test_family_comes_back_in_one_query(self):
+        from .services import rebuild_evolution_index, get_evolution_family
+        rebuild_evolution_index()
+        self.jolteon.refresh_from_db()
+
+        with self.assertNumQueries(1):
+            family = get_evolution_family(self.jolteon)
+
+        self.assertEqual(family, ['eevee', 'vaporeon', 'jolteon'])
+
+    def test_pokemon_without_evolutions(self):
+        from .services import rebuild_evolution_index, get_evolution_chain_from_db
+        make_pokemon('tauros', 128)
+        rebuild_evolution_index()
+
+        self.assertEqual(get_evolution_chain_from_db('tauros'), ['tauros'])
+
+
+class PokeAPIClientTests(TestCase):
+    """Klient proti lokálnímu stub serveru"""
+
+    @classmethod
+    def setUpClass(cls):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        cls.hits = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+                # /flaky/ selže poprvé s 503, /slow/ neodpoví včas
+                if self.path.startswith('/api/v2/flaky/') and cls.hits[self.path] == 1:
+                    self.send_response(503)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.path.startswith('/api/v2/slow/'):
+                    import time
+                    time.sleep(0.5)
+                body = json.dumps({'path': self.path}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+            def finish(self):
+                # Klient po timeoutu zavře spojení dřív, než mu server odpoví
+                try:
+                    super().finish()
+                except ConnectionError:
+                    pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                pass
+
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def make_client(self, **kwargs):
+        from .pokeapi import PokeAPIClient
+        host, port = self.server.server_address
+        return PokeAPIClient(base_url=f'http://{host}:{port}/api/v2/', backoff_factor=0, **kwargs)
+
+    def test_retries_on_server_error_and_counts(self):
+        client = self.make_client()
+        data = client.get_json(client.url('flaky/1/'))
+
+        self.assertEqual(data, {'path': '/api/v2/flaky/1/'})
+        self.assertEqual(self.hits['/api/v2/flaky/1/'], 2)
+        stats = client.stats()['flaky']
+        self.assertEqual(stats['calls'], 1)
+        self.assertGreater(stats['bytes'], 0)
+
+    def test_read_timeout_returns_none(self):
+        client = self.make_client(timeout=(1, 0.1), retries=0)
+        self.assertIsNone(client.get_json(client.url('slow/1/')))
+        self.assertEqual(client.stats()['slow']['errors'], 1)
+
+
+class PokemonCacheTests(DexTestCase):
+
+    def test_hot_pokemon_served_without_queries(self):
+        from .services import get_pokemon
+        make_pokemon('pikachu', 25)
+        get_pokemon('pikachu')
+
+        with self.assertNumQueries(0):
+            data = get_pokemon('Pikachu')
+        self.assertEqual(data['id'], 25)
+
+        # Úprava vráceného slovníku nesmí změnit cache
+        data['hp'] = 0
+        self.assertNotIn('hp', get_pokemon('pikachu'))
+
+    @patch('Main.services.api_client.get')
+    def test_not_found_is_cached(self, mock_get):
+        from .services import get_pokemon
+        mock_get.return_value.status_code = 404
+
+        self.assertIsNone(get_pokemon('missingno'))
+        self.assertIsNone(get_pokemon('missingno'))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('Main.services.api_client.get')
+    def test_save_invalidates_cache(self, mock_get):
+        from .services import get_pokemon, save_pokemon_to_db
+        mock_get.return_value.status_code = 404
+        self.assertIsNone(get_pokemon('bulbasaur'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_pokemon_to_db(fake_pokeapi_response('https://pokeapi.co/api/v2/pokemon/1/').json.return_value)
+
+        self.assertEqual(get_pokemon('bulbasaur')['id'], 1)
+
+
+class SingleFlightTests(DexTestCase):
+
+    @patch('Main.services.api_client.get')
+    def test_concurrent_misses_share_one_upstream_call(self, mock_get):
+        import threading
+        import time
+        from .services import get_pokemon_species
+
+        def slow_response(url, **kwargs):
+            time.sleep(0.05)
+            response = fake_pokeapi_response('https://pokeapi.co/api/v2/pokemon-species/1/')
+            return response
+        mock_get.side_effect = slow_response
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_pokemon_species('bulbasaur')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r['evolution_chain'] for r in results))
+
+        # Další volání obslouží sdílená cache
+        get_pokemon_species('bulbasaur')
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_other_worker_holding_lock_is_awaited(self):
+        from django.core.cache import cache
+        from .singleflight import fetch_once
+
+        import threading
+
+        # Jiný worker drží zámek a výsledek uloží až za chvíli
+        cache.add('lock:https://example/1', 1, 10)
+        timer = threading.Timer(0.1, cache.set, args=('api:https://example/1', {'from': 'other worker'}, 60))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        fetch = lambda: self.fail('nemá se stahovat')
+
+        self.assertEqual(fetch_once('https://example/1', 'api:https://example/1', fetch, 60), {'from': 'other worker'})
+
+
+class PokemonBatchTests(DexTestCase):
+
+    @patch('Main.services.api_client.get', side_effect=fake_pokeapi_response)
+    def test_get_pokemon_many_keeps_order_and_dedupes(self, mock_get):
+        from .services import get_pokemon_many
+        make_pokemon('pikachu', 25)
+
+        result = get_pokemon_many(['ivysaur', 'Pikachu', 'pikachu', 'bulbasaur', 'missingno'])
+
+        self.assertEqual([p['name'] for p in result], ['ivysaur', 'pikachu', 'pikachu', 'bulbasaur'])
+        fetched = sorted(c.args[0] for c in mock_get.call_args_list)
+        self.assertEqual(fetched, [
+            'https://pokeapi.co/api/v2/pokemon/bulbasaur',
+            'https://pokeapi.co/api/v2/pokemon/ivysaur',
+            'https://pokeapi.co/api/v2/pokemon/missingno',
+        ])
+
+        with self.assertNumQueries(0):
+            get_pokemon_many(['bulbasaur', 'pikachu', 'missingno'])
+
+
+class SerializerTests(DexTestCase):
+
+    def setUp(self):
+        from .models import PokemonType, Ability
+        super().setUp()
+        grass = PokemonType.objects.create(name='grass')
+        overgrow = Ability.objects.create(name='overgrow')
+        for i in range(1, 26):
+            pokemon = make_pokemon(f'pokemon-{i}', i, hp=i)
+            pokemon.types.add(grass)
+            pokemon.abilities.add(overgrow)
+
+    def test_matches_convert_db_to_api_format(self):
+        from .models import Pokemon
+        from .services import serialize_pokemon, convert_db_to_api_format
+        pokemon = Pokemon.objects.get(pokedex_id=3)
+
+        self.assertEqual(serialize_pokemon([pokemon.pk]), [convert_db_to_api_format(pokemon)])
+
+    def test_constant_queries_and_field_selection(self):
+        from .models import Pokemon
+        from .services import serialize_pokemon
+
+        with self.assertNumQueries(3):
+            full = serialize_pokemon(Pokemon.objects.order_by('-hp'))
+        with self.assertNumQueries(1):
+            cards = serialize_pokemon(Pokemon.objects.order_by('-hp')[:20], fields=())
+
+        self.assertEqual(len(full), 25)
+        self.assertEqual(full[0]['name'], 'pokemon-25')
+        self.assertEqual(len(cards), 20)
+        self.assertNotIn('stats', cards[0])
+
+    def test_index_sorted_by_total_stats(self):
+        response = self.client.get(reverse('index') + '?sort=total_stats')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['pokemons'][0]['name'], 'pokemon-25')
+        self.assertEqual(len(response.context['pokemons']), 20)
+
+
+class DexSnapshotTests(DexTestCase):
+
+    def setUp(self):
+        from .models import PokemonType, Ability, Evolution
+        from .services import rebuild_evolution_index
+        super().setUp()
+        grass = PokemonType.objects.create(name='grass', color='#78C850')
+        poison = PokemonType.objects.create(name='poison')
+        overgrow = Ability.objects.create(name='overgrow')
+        bulbasaur = make_pokemon('bulbasaur', 1, hp=45)
+        ivysaur = make_pokemon('ivysaur', 2, hp=60)
+        make_pokemon('pikachu', 25, hp=35)
+        bulbasaur.types.add(grass, poison)
+        bulbasaur.abilities.add(overgrow)
+        ivysaur.types.add(grass)
+        Evolution.objects.create(from_pokemon=bulbasaur, to_pokemon=ivysaur)
+        rebuild_evolution_index()
+
+    def test_matches_database_format(self):
+        from .models import Pokemon
+        from .services import convert_db_to_api_format
+        from .snapshot import get_snapshot
+        snapshot = get_snapshot()
+
+        for pokemon in Pokemon.objects.all():
+            self.assertEqual(snapshot.to_api(snapshot.index_of(pokemon.name)), convert_db_to_api_format(pokemon))
+        self.assertEqual(snapshot.index_of('25'), snapshot.index_of('Pikachu'))
+        self.assertEqual([snapshot.names[i] for i in snapshot.family_of(snapshot.index_of('ivysaur'))],
+                         ['bulbasaur', 'ivysaur'])
+        self.assertEqual(snapshot.indices_with_type('GRASS'), [0, 1])
+
+    def test_read_pages_without_queries(self):
+        self.client.get(reverse('index'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index') + '?type=grass&sort=hp')
+        self.assertEqual([p['name'] for p in response.context['pokemons']], ['ivysaur', 'bulbasaur'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('search') + '?q=saur')
+        self.assertEqual(len(response.context['results']), 2)
+
+        # Jediný dotaz detailu je historie bitev
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('pokemon_detail', kwargs={'name': 'bulbasaur'}))
+        self.assertEqual(response.context['evolution'], ['bulbasaur', 'ivysaur'])
+        self.assertEqual([p['name'] for p in response.context['similar_pokemon']], ['ivysaur'])
+
+    def test_new_version_swaps_snapshot(self):
+        from .snapshot import get_snapshot
+        old = get_snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_pokemon('charmander', 4)
+
+        snapshot = get_snapshot()
+        self.assertIsNot(snapshot, old)
+        self.assertIsNone(old.index_of('charmander'))
+        self.assertIsNotNone(snapshot.index_of('charmander'))
+
+    def test_snapshot_file_roundtrip(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from .snapshot import DexSnapshot, get_snapshot
+        from .caching import get_dex_version
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dex.snapshot')
+            call_command('build_dex_snapshot', output=path, stdout=StringIO())
+
+            mapped = DexSnapshot.from_file(path)
+            built = DexSnapshot.from_db(get_dex_version())
+            self.assertEqual(mapped.version, get_dex_version())
+            self.assertEqual([mapped.to_api(i) for i in range(len(mapped))],
+                             [built.to_api(i) for i in range(len(built))])
+            self.assertEqual(mapped.index_of('IVYSAUR'), 1)
+            self.assertIsNone(mapped.index_of('mew'))
+            self.assertIsNone(mapped.index_of('151'))
+
+            # Worker s aktuální verzí soubor jen namapuje, bez dotazů do DB
+            with self.settings(DEX_SNAPSHOT_PATH=path), self.assertNumQueries(0):
+                self.assertEqual(get_snapshot().names[:], ['bulbasaur', 'ivysaur', 'pikachu'])
+
+    def test_file_version_is_shared_between_processes(self):
+        import os
+        import tempfile
+        from django.core.cache import cache
+        from . import snapshot as snapshot_module
+        from .models import DexVersion
+        from .snapshot import get_snapshot, write_snapshot_file
+
+        def new_process():
+            cache.clear()
+            snapshot_module._snapshot = None
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(DEX_SNAPSHOT_PATH=os.path.join(directory, 'dex')):
+            path = os.path.join(directory, 'dex')
+            DexVersion.objects.update_or_create(pk=1, defaults={'version': 3})
+            write_snapshot_file(path, '3')
+            written = os.stat(path).st_mtime_ns
+
+            # Soubor stejné verze se jen namapuje, jediný dotaz je na verzi
+            new_process()
+            with self.assertNumQueries(1):
+                self.assertEqual(get_snapshot().version, '3')
+            self.assertEqual(os.stat(path).st_mtime_ns, written)
+
+            # Novější verze v DB soubor přestaví
+            DexVersion.objects.filter(pk=1).update(version=4)
+            new_process()
+            self.assertEqual(get_snapshot().version, '4')
+            self.assertEqual(snapshot_module.DexSnapshot.from_file(path).version, '4')
+
+    def test_file_newer_than_db_is_rebuilt(self):
+        import os
+        import tempfile
+        from django.core.cache import cache
+        from . import snapshot as snapshot_module
+        from .models import DexVersion, Pokemon
+        from .snapshot import get_snapshot, write_snapshot_file
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(DEX_SNAPSHOT_PATH=os.path.join(directory, 'dex')):
+            path = os.path.join(directory, 'dex')
+            # Zbytek souboru z doby před obnovou DB: vyšší verze a ještě s pikachu
+            write_snapshot_file(path, '50')
+            Pokemon.objects.filter(name='pikachu').delete()
+            DexVersion.objects.update_or_create(pk=1, defaults={'version': 2})
+            cache.clear()
+            snapshot_module._snapshot = None
+
+            snapshot = get_snapshot()
+
+            self.assertEqual(snapshot.version, '2')
+            self.assertIsNone(snapshot.index_of('pikachu'))
+            self.assertEqual(snapshot_module.DexSnapshot.from_file(path).version, '2')
+
+    def test_invalid_snapshot_file_is_rebuilt(self):
+        import os
+        import tempfile
+        from .snapshot import DexSnapshot, get_snapshot
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dex.snapshot')
+            with open(path, 'wb') as f:
+                f.write(b'garbage')
+
+            with self.settings(DEX_SNAPSHOT_PATH=path):
+                self.assertEqual(len(get_snapshot()), 3)
+            self.assertEqual(len(DexSnapshot.from_file(path)), 3)
+
+
+class SearchIndexTests(DexTestCase):
+
+    def setUp(self):
+        from .models import PokemonType
+        super().setUp()
+        electric = PokemonType.objects.create(name='electric')
+        for name, pokedex_id in [('pichu', 172), ('pikachu', 25), ('raichu', 26), ('pidgey', 16), ('magnemite', 81)]:
+            pokemon = make_pokemon(name, pokedex_id)
+            if name != 'pidgey':
+                pokemon.types.add(electric)
+
+    def test_ranking(self):
+        from .search import get_search_index
+        search_index = get_search_index()
+
+        def names(query, **kwargs):
+            return [search_index.names[i] for i in search_index.search(query, **kwargs)]
+
+        self.assertEqual(names('pikachu')[0], 'pikachu')
+        self.assertEqual(names('pi'), ['pichu', 'pidgey', 'pikachu'])
+        self.assertEqual(names('chu'), ['pichu', 'raichu', 'pikachu'])
+        # Překlep
+        self.assertEqual(names('pikacu')[0], 'pikachu')
+        self.assertEqual(names('xyz'), [])
+        # Typ až za shodou ve jméně
+        self.assertEqual(names('elec', include_types=True), ['pikachu', 'raichu', 'magnemite', 'pichu'])
+
+    def test_search_view_and_service(self):
+        from .services import search_pokemon
+
+        response = self.client.get(reverse('search') + '?q=Pikacu')
+        self.assertEqual(response.context['results'][0]['name'], 'pikachu')
+        self.assertEqual(search_pokemon('raichu')[0]['name'], 'raichu')
+        self.assertIn('stats', search_pokemon('raichu')[0])
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('autocomplete') + '?q=PI&limit=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=300', response['Cache-Control'])
+        self.assertEqual(response.json(), {'results': [
+            {'name': 'pichu', 'id': 172, 'sprite': None},
+            {'name': 'pidgey', 'id': 16, 'sprite': None},
+        ]})
+        self.assertEqual(self.client.get(reverse('autocomplete') + '?q=').json(), {'results': []})
+        self.assertEqual(len(self.client.get(reverse('autocomplete') + '?q=p&limit=x').json()['results']), 3)
+
+
+class NameResolutionTests(DexTestCase):
+
+    def setUp(self):
+        from .models import PokemonAlias
+        super().setUp()
+        self.mr_mime = make_pokemon('mr-mime', 122)
+        self.nidoran = make_pokemon('nidoran-f', 29)
+        PokemonAlias.objects.create(alias='pantimos', pokemon=self.mr_mime)
+
+    def test_normalize_name(self):
+        from .names import normalize_name
+
+        for name in ['Mr. Mime', 'mr mime', 'MR_MIME', ' mr-mime ']:
+            self.assertEqual(normalize_name(name), 'mr-mime')
+        self.assertEqual(normalize_name('Nidoran♀'), 'nidoran-f')
+        self.assertEqual(normalize_name("Farfetch'd"), 'farfetchd')
+        self.assertEqual(normalize_name('Flabébé'), 'flabebe')
+        self.assertEqual(self.mr_mime.slug, 'mr-mime')
+
+    def test_resolve_many_in_one_query(self):
+        from .services import resolve_many
+
+        with self.assertNumQueries(1):
+            resolved = resolve_many(['Mr. Mime', 'Nidoran♀', '122', 'Pantimos', 'missingno'])
+
+        self.assertEqual(resolved, {
+            'Mr. Mime': self.mr_mime.pk,
+            'Nidoran♀': self.nidoran.pk,
+            '122': self.mr_mime.pk,
+            'Pantimos': self.mr_mime.pk,
+        })
+
+    def test_snapshot_and_views_resolve_aliases(self):
+        from .services import get_pokemon_from_db, get_pokemon
+        from .snapshot import get_snapshot
+
+        self.assertEqual(get_pokemon_from_db('Mr. Mime'), self.mr_mime)
+        self.assertEqual(get_snapshot().index_of('pantimos'), get_snapshot().index_of('mr mime'))
+        self.assertEqual(get_pokemon('Nidoran♀')['id'], 29)
+
+        response = self.client.get(reverse('compare') + '?p1=Mr.+Mime&p2=nidoran%E2%99%80')
+        self.assertEqual(response.context['p1']['name'], 'mr-mime')
+        self.assertEqual(response.context['p2']['name'], 'nidoran-f')
+
+    @patch('Main.importer.api_client.get', side_effect=fake_pokeapi_response)
+    def test_import_stores_species_aliases(self, mock_get):
+        from io import StringIO
+        from django.core.management import call_command
+        from .services import resolve_many
+        from .models import Pokemon
+
+        call_command('import_pokemon', stdout=StringIO())
+
+        self.assertEqual(resolve_many(['Bisaknosp']), {'Bisaknosp': Pokemon.objects.get(name='ivysaur').pk})
+
+
+class BattleStatsTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for pokedex_id, name in enumerate(['bulbasaur', 'charmander', 'squirtle', 'pikachu', 'eevee', 'mew'], 1):
+            make_pokemon(name, pokedex_id)
+
+    def save_battles(self):
+        from .services import save_battle_history
+        save_battle_history(['bulbasaur', 'charmander', 'squirtle'], ['pikachu', 'eevee', 'mew'], 'win', [])
+        save_battle_history(['pikachu', 'charmander', 'bulbasaur'], ['squirtle', 'eevee', 'mew'], 'lose', [])
+        save_battle_history(['pikachu', 'eevee', 'mew'], ['bulbasaur', 'charmander', 'squirtle'], 'draw', [])
+
+    def counters(self):
+        from .models import Pokemon
+        return {name: (battles, wins, losses) for name, battles, wins, losses
+                in Pokemon.objects.values_list('name', 'battles_count', 'wins', 'losses')}
+
+    def test_counters_updated_with_battle(self):
+        self.save_battles()
+
+        self.assertEqual(self.counters()['charmander'], (3, 1, 1))
+        self.assertEqual(self.counters()['pikachu'], (3, 0, 2))
+        self.assertEqual(self.counters()['squirtle'], (3, 2, 0))
+
+    def test_rebuild_matches_incremental_counters(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Pokemon
+        self.save_battles()
+        expected = self.counters()
+
+        Pokemon.objects.update(battles_count=7, wins=7, losses=7)
+        call_command('rebuild_battle_stats', stdout=StringIO())
+
+        self.assertEqual(self.counters(), expected)
+
+    def test_popular_pokemon_is_top_k_read(self):
+        from .services import get_popular_pokemon, save_battle_history
+        self.save_battles()
+        save_battle_history(['mew', 'eevee', 'pikachu'], ['bulbasaur', 'charmander', 'squirtle'], 'win', [])
+        save_battle_history(['mew'], ['bulbasaur'], 'win', [])
+
+        with self.assertNumQueries(3):
+            popular = get_popular_pokemon(2)
+        self.assertEqual([p['name'] for p in popular], ['bulbasaur', 'mew'])
+
+    def test_battle_writes_are_batched(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import BattleHistory
+        from .services import save_battles
+
+        battle = {'user_team': ['bulbasaur', 'charmander', 'squirtle'], 'cpu_team': ['pikachu', 'eevee', 'mew'],
+                  'result': 'win', 'battle_log': ['a', 'b']}
+        with CaptureQueriesContext(connection) as single:
+            save_battles([battle])
+        with CaptureQueriesContext(connection) as many:
+            saved = save_battles([battle] * 20)
+
+        self.assertEqual(len(single), len(many))
+        self.assertLessEqual(len(single), 8)
+        self.assertEqual(len(saved), 20)
+        self.assertEqual(saved[-1].cpu_team.count(), 3)
+        self.assertEqual(BattleHistory.objects.filter(user_team__name='squirtle').count(), 21)
+        self.assertEqual(self.counters()['mew'], (21, 0, 21))
+
+
+class BattleLogTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for pokedex_id, name in enumerate(['bulbasaur', 'charmander', 'squirtle', 'pikachu', 'eevee', 'mew'], 1):
+            make_pokemon(name, pokedex_id, speed=10 * pokedex_id)
+
+    def fight(self):
+        from .models import BattleHistory
+        response = self.client.post(reverse('arena'), {'selected': ['bulbasaur', 'charmander', 'squirtle']})
+        return response, BattleHistory.objects.get()
+
+    def test_arena_stores_only_seed_and_teams(self):
+        from .battle import ENGINE_VERSION
+        response, battle = self.fight()
+
+        self.assertEqual(battle.battle_log, '')
+        self.assertIsNone(battle.battle_events)
+        self.assertEqual(battle.engine_version, ENGINE_VERSION)
+        self.assertLessEqual(len(battle.teams), 14)
+
+    def test_same_seed_replays_same_battle(self):
+        from .battle import run_battle
+        from .services import get_pokemon
+        teams = [[get_pokemon(name) for name in names]
+                 for names in (('bulbasaur', 'charmander', 'squirtle'), ('pikachu', 'eevee', 'mew'))]
+
+        self.assertEqual(run_battle(*teams, random.Random(42)), run_battle(*teams, random.Random(42)))
+
+    def test_replay_view(self):
+        response, battle = self.fight()
+
+        replay = self.client.get(reverse('battle_replay', args=[battle.id])).json()
+
+        self.assertEqual(replay['seed'], battle.seed)
+        self.assertEqual(replay['replayed_result'], battle.result)
+        self.assertEqual(replay['battle_log'], response.context['battle_log'])
+
+    @patch('Main.services.api_client.get', side_effect=AssertionError('síť se nesmí použít'))
+    def test_replay_with_deleted_pokemon(self, mock_get):
+        from .battle import REPLAY_UNAVAILABLE
+        from .models import Pokemon
+        _, battle = self.fight()
+        with self.captureOnCommitCallbacks(execute=True):
+            Pokemon.objects.filter(name='bulbasaur').delete()
+
+        response = self.client.get(reverse('battle_replay', args=[battle.id]))
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['error'], REPLAY_UNAVAILABLE)
+
+        detail = self.client.get(reverse('battle_detail', args=[battle.id]))
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.context['battle_log'], [REPLAY_UNAVAILABLE])
+        self.assertFalse(Pokemon.objects.filter(name='bulbasaur').exists())
+
+    def test_stalemate_ends_in_draw_at_turn_cap(self):
+        from .battle import MAX_TURNS, run_battle
+        from .services import get_pokemon
+        make_pokemon('shuckle', 213, attack=10, defense=230)
+        make_pokemon('steelix', 208, attack=10, defense=200)
+
+        outcome = run_battle([get_pokemon('shuckle')], [get_pokemon('steelix')], random.Random(1))
+
+        self.assertEqual(outcome.result, 'draw')
+        self.assertEqual(outcome.events[-1].turn, MAX_TURNS)
+
+    def test_detail_renders_same_log_as_arena(self):
+        response, battle = self.fight()
+
+        detail = self.client.get(reverse('battle_detail', args=[battle.id]))
+
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.context['battle_log'], response.context['battle_log'])
+        self.assertEqual(detail.context['battle_log'][-1], response.context['winner'])
+
+    def test_migration_packs_text_logs(self):
+        from importlib import import_module
+        from django.apps import apps
+        from .battle import battle_log_lines
+        migration = import_module('Main.migrations.0007_battlehistory_battle_events')
+        response, battle = self.fight()
+        lines = response.context['battle_log']
+        battle.seed = None
+        battle.battle_log = '\n'.join(lines)
+        battle.save()
+
+        migration.pack_battle_logs(apps, None)
+
+        battle.refresh_from_db()
+        self.assertEqual(battle.battle_log, '')
+        self.assertEqual(battle_log_lines(battle), lines)
+
+        migration.unpack_battle_logs(apps, None)
+
+        battle.refresh_from_db()
+        self.assertIsNone(battle.battle_events)
+        self.assertEqual(battle.battle_log, '\n'.join(lines))
+
+    def test_engines_agree_without_types(self):
+        from .battle import Combatant, run_battle, simulate
+        from .services import get_pokemon
+        teams = [[get_pokemon(name) for name in names]
+                 for names in (('bulbasaur', 'charmander', 'squirtle'), ('pikachu', 'eevee', 'mew'))]
+
+        legacy = run_battle(*teams, random.Random(3))
+        compact = simulate(*([Combatant.from_api(p) for p in team] for team in teams), random.Random(3))
+
+        self.assertEqual(compact, legacy)
+
+    def test_full_type_matrix(self):
+        from .battle import TYPE_INDEX, effectiveness
+        types = lambda *names: tuple(TYPE_INDEX[name] for name in names)
+
+        self.assertEqual(effectiveness(types('electric'), types('ground')), 0.0)
+        self.assertEqual(effectiveness(types('water'), types('fire', 'rock')), 4.0)
+        self.assertEqual(effectiveness(types('dragon'), types('fairy')), 0.0)
+        self.assertEqual(effectiveness(types('fighting'), types('normal')), 2.0)
+
+    def test_legacy_battle_replays_with_engine_v1(self):
+        from .battle import run_battle, battle_log_lines
+        from .battle_log import encode_teams, render_battle_log
+        from .models import BattleHistory
+        from .services import get_pokemon
+        user_team = [get_pokemon(name) for name in ('bulbasaur', 'charmander', 'squirtle')]
+        cpu_team = [get_pokemon(name) for name in ('pikachu', 'eevee', 'mew')]
+        outcome = run_battle(user_team, cpu_team, random.Random(11))
+        battle = BattleHistory.objects.create(result=outcome.result, seed=11, engine_version=1,
+                                              teams=encode_teams([1, 2, 3], [4, 5, 6]))
+
+        self.assertEqual(battle_log_lines(battle), render_battle_log(
+            ['bulbasaur', 'charmander', 'squirtle'], ['pikachu', 'eevee', 'mew'], outcome.events, outcome.result))
+
+
+
+class BattleOddsTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        make_pokemon('rattata', 19, attack=56, defense=35, hp=30, speed=72)
+        make_pokemon('pidgey', 16, attack=45, defense=40, hp=40, speed=56)
+        make_pokemon('caterpie', 10, attack=30, defense=35, hp=45, speed=45)
+        make_pokemon('weedle', 13, attack=35, defense=30, hp=40, speed=50)
+
+    def combatants(self, *names):
+        from .battle import Combatant
+        from .snapshot import get_snapshot
+        snapshot = get_snapshot()
+        return [Combatant.from_snapshot(snapshot, snapshot.index_of(name)) for name in names]
+
+    def test_matches_single_battle_engine(self):
+        from .battle import simulate
+        from .odds import win_probabilities
+        team, vs = self.combatants('rattata', 'caterpie'), self.combatants('pidgey', 'weedle')
+
+        odds = win_probabilities(team, vs, battles=4000, seed=1)
+        rng = random.Random(1)
+        wins = sum(simulate(team, vs, rng, record=False).result == 'win' for _ in range(4000))
+
+        self.assertAlmostEqual(odds['win'], wins / 4000, delta=0.04)
+        self.assertAlmostEqual(odds['win'] + odds['draw'] + odds['lose'], 1.0, places=3)
+        self.assertAlmostEqual(sum(odds['turns']['distribution'].values()), 1.0, places=2)
+
+    def test_odds_endpoint(self):
+        response = self.client.get(reverse('battle_odds'), {'team': 'rattata,pidgey', 'vs': 'caterpie,#13', 'battles': 500})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['unknown'], ['#13'])
+
+        data = self.client.get(reverse('battle_odds'), {'team': 'rattata,pidgey', 'vs': 'caterpie,13', 'battles': 500}).json()
+
+        self.assertEqual(data['vs'], ['caterpie', 'weedle'])
+        self.assertEqual(data['battles'], 500)
+        self.assertGreater(data['win'], data['lose'])
+
+    def test_odds_endpoint_caps_battles(self):
+        from .odds import MAX_BATTLES
+        data = self.client.get(reverse('battle_odds'), {'team': 'rattata', 'vs': 'caterpie', 'battles': 10 ** 6}).json()
+
+        self.assertEqual(data['battles'], MAX_BATTLES)
+
+    def test_odds_endpoint_requires_both_teams(self):
+        response = self.client.get(reverse('battle_odds'), {'team': 'rattata'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TournamentTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        make_pokemon('caterpie', 10, attack=30, defense=35, hp=45, speed=45)
+        make_pokemon('weedle', 13, attack=35, defense=30, hp=40, speed=50)
+        make_pokemon('pidgey', 16, attack=45, defense=40, hp=40, speed=56)
+        make_pokemon('rattata', 19, attack=56, defense=35, hp=30, speed=72)
+        make_pokemon('machop', 66, attack=80, defense=50, hp=70, speed=35)
+
+    def test_matrix_does_not_depend_on_workers(self):
+        from .tournament import MatchupTable, run_tournament
+
+        serial = MatchupTable(run_tournament(battles=20, workers=1, chunk_size=2, seed=3))
+        parallel = MatchupTable(run_tournament(battles=20, workers=2, chunk_size=1, seed=3))
+
+        self.assertEqual(len(serial), 5)
+        self.assertTrue((serial.win_rates == parallel.win_rates).all())
+
+    def test_counters_and_tier_list_are_lookups(self):
+        from .tournament import get_matchup_table, run_tournament
+        run_tournament(battles=20, workers=1)
+
+        with self.assertNumQueries(2):
+            table = get_matchup_table()
+            counters = table.counters(10, limit=4)
+        tiers = table.tier_list()
+
+        self.assertIn((66, 1.0), counters)
+        self.assertEqual([rate for _, rate in counters], sorted((rate for _, rate in counters), reverse=True))
+        self.assertNotIn(10, [pokedex_id for pokedex_id, _ in counters])
+        self.assertEqual(tiers['S'], [(66, 1.0)])
+        self.assertEqual(sum(len(pokemon) for pokemon in tiers.values()), 5)
+        self.assertEqual(table.win_rate(66, 10), 1.0)
+        self.assertIsNone(table.win_rate(66, 151))
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import MatchupMatrix
+        out = StringIO()
+
+        call_command('run_tournament', '--battles', '5', '--workers', '1', '--limit', '3', stdout=out)
+
+        self.assertEqual(len(MatchupMatrix.objects.get().pokedex_ids), 6)
+        self.assertIn('3×3', out.getvalue())
+
+
+class TeamRecommendTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        make_pokemon('caterpie', 10, attack=30, defense=35, hp=45, speed=45)
+        make_pokemon('weedle', 13, attack=35, defense=30, hp=40, speed=50)
+        make_pokemon('pidgey', 16, attack=45, defense=40, hp=40, speed=56)
+        make_pokemon('rattata', 19, attack=56, defense=35, hp=30, speed=72)
+        make_pokemon('spearow', 21, attack=60, defense=30, hp=40, speed=70)
+        make_pokemon('machop', 66, attack=80, defense=50, hp=70, speed=35)
+        make_pokemon('geodude', 74, attack=80, defense=100, hp=40, speed=20)
+
+    def table(self, pokedex_ids, win_rates):
+        from .models import MatchupMatrix
+        from .tournament import MatchupTable, WIN_RATE_SCALE
+        import numpy as np
+        return MatchupTable(MatchupMatrix(
+            dex_version='test', engine_version=2, battles_per_pair=1,
+            pokedex_ids=np.array(pokedex_ids, dtype='<u2').tobytes(),
+            win_rates=(np.array(win_rates) * WIN_RATE_SCALE).astype('<u2').tobytes(),
+        ))
+
+    def test_recommendation_matches_brute_force(self):
+        from itertools import combinations
+        from .tournament import recommend_team
+        import numpy as np
+        rates = np.random.default_rng(4).random((14, 14)).round(4)
+        table = self.table(range(1, 15), rates)
+        opponents = [2, 7, 11]
+
+        def coverage(team):
+            return rates[[p - 1 for p in team]][:, [p - 1 for p in opponents]].max(axis=0).mean()
+
+        candidates = [p for p in range(1, 15) if p not in opponents]
+        best = max(coverage(team) for team in combinations(candidates, 3))
+        team, score = recommend_team(table, opponents)
+
+        self.assertAlmostEqual(score, best, places=4)
+        self.assertAlmostEqual(coverage(team), best)
+        self.assertFalse(set(team) & set(opponents))
+
+    def test_recommendation_on_dense_matrix(self):
+        from .tournament import recommend_team
+        import numpy as np
+        rng = np.random.default_rng(7)
+        rates = rng.random((1000, 1000)) * 0.5
+        opponents = [12, 140, 333, 512, 777, 901]
+        # Každý ze tří Pokémonů spolehlivě poráží dva soupeře, nikdo jiný nepřekročí 50 %
+        planted = [5, 450, 999]
+        for k, pokedex_id in enumerate(planted):
+            for opponent in opponents[2 * k:2 * k + 2]:
+                rates[pokedex_id - 1, opponent - 1] = 1.0
+        table = self.table(range(1, 1001), rates)
+
+        team, score = recommend_team(table, opponents)
+
+        self.assertEqual(sorted(team), planted)
+        self.assertEqual(score, 1.0)
+
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+
+        call_command('benchmark_recommend', '--size', '50', '--repeat', '2', stdout=out)
+
+        self.assertIn('50×50', out.getvalue())
+
+    def test_recommend_endpoint(self):
+        from .tournament import run_tournament
+        run_tournament(battles=10, workers=1)
+
+        data = self.client.get(reverse('team_recommend'), {'vs': 'caterpie,weedle,pidgey'}).json()
+
+        self.assertEqual(len(data['team']), 3)
+        self.assertIn('machop', data['team'])
+        self.assertFalse(set(data['team']) & {'caterpie', 'weedle', 'pidgey'})
+        self.assertGreater(data['win'], 0.9)
+
+        random_vs = self.client.get(reverse('team_recommend')).json()
+        self.assertEqual(len(random_vs['vs']), 3)
+
+    def test_recommend_skips_pokemon_removed_after_tournament(self):
+        from .models import Pokemon
+        from .tournament import run_tournament
+        run_tournament(battles=10, workers=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Pokemon.objects.filter(name='machop').delete()
+
+        response = self.client.get(reverse('team_recommend'), {'vs': 'caterpie,weedle,pidgey'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['team']), 3)
+        self.assertNotIn('machop', response.json()['team'])
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('team_recommend')).status_code, 200)
+
+    def test_recommend_without_matrix(self):
+        response = self.client.get(reverse('team_recommend'), {'vs': 'caterpie'})
+
+        self.assertEqual(response.status_code, 503)
+
+
+class BattleBatchTests(DexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for pokedex_id, name in enumerate(['bulbasaur', 'charmander', 'squirtle', 'pikachu', 'eevee', 'mew'], 1):
+            make_pokemon(name, pokedex_id, attack=40 + 5 * pokedex_id, speed=10 * pokedex_id)
+
+    def post(self, payload, **extra):
+        return self.client.post(reverse('battle_batch'), json.dumps(payload), content_type='application/json', **extra)
+
+    def test_batch_is_persisted_and_replayable(self):
+        from .models import BattleHistory
+        specs = [{'team': ['bulbasaur', 'charmander'], 'vs': ['pikachu', 'mew'], 'seed': seed} for seed in range(30)]
+
+        results = self.post({'battles': specs}).json()['results']
+
+        self.assertEqual(len(results), 30)
+        self.assertEqual(BattleHistory.objects.count(), 30)
+        battle = BattleHistory.objects.get(pk=results[7]['id'])
+        self.assertEqual(battle.seed, 7)
+        replay = self.client.get(reverse('battle_replay', args=[battle.id])).json()
+        self.assertEqual(replay['replayed_result'], results[7]['result'])
+
+    def test_query_count_does_not_grow_with_batch(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        spec = {'team': ['bulbasaur'], 'vs': ['eevee', 6]}
+        self.post([spec])  # snímek Pokédexu
+
+        with CaptureQueriesContext(connection) as single:
+            self.post([spec])
+        with CaptureQueriesContext(connection) as many:
+            self.post([spec] * 100)
+
+        self.assertEqual(len(single), len(many))
+
+    def test_ndjson_stream(self):
+        response = self.post([{'team': ['squirtle'], 'seed': 5}] * 3, HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        results = [json.loads(line) for line in lines]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(results[0]['vs']), 3)
+        self.assertNotIn('squirtle', results[0]['vs'])
+        self.assertEqual(results[0]['result'], results[2]['result'])
+
+    def test_invalid_spec_reports_position(self):
+        from .models import BattleHistory
+
+        response = self.post([{'team': ['mew'], 'vs': ['eevee']}, {'team': ['missingno'], 'vs': ['eevee']}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['battle'], 1)
+        self.assertFalse(BattleHistory.objects.exists())
+        self.assertEqual(self.client.get(reverse('battle_batch')).status_code, 405)
@@ -0,0 +1,227 @@
+# tournament.py
+import multiprocessing
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from django.db import connections
+
+from .battle import ENGINE_VERSION, Combatant, simulate
+from .models import MatchupMatrix
+from .snapshot import get_snapshot
+
+
+# Podíl výher se ukládá v setinách procenta (uint16)
+WIN_RATE_SCALE = 10000
+
+DEFAULT_BATTLES = 100
+DEFAULT_CHUNK_SIZE = 8
+
+TIERS = ('S', 'A', 'B', 'C', 'D')
+
+# Pokémoni turnaje v procesu workeru (viz `_init_worker`)
+_roster = None
+
+
+def _init_worker(roster):
+    global _roster
+    _roster = [Combatant(*row) for row in roster]
+
+
+def _play_rows(rows, battles, seed) -> List[Tuple[int, np.ndarray]]:
+    """
+    Odehraje řádky matice: každého Pokémona z `rows` proti všem ostatním `battles`krát.
+    Každý řádek má vlastní generátor odvozený ze seedu, takže výsledek nezávisí
+    na rozdělení práce mezi procesy.
+    """
+    results = []
+    for row in rows:
+        attacker = [_roster[row]]
+        rng = random.Random(f'{seed}:{row}')
+        win_rates = np.zeros(len(_roster), dtype='<u2')
+        for column, defender in enumerate(_roster):
+            defenders = [defender]
+            wins = sum(simulate(attacker, defenders, rng, record=False).result == 'win' for _ in range(battles))
+            win_rates[column] = round(wins * WIN_RATE_SCALE / battles)
+        results.append((row, win_rates))
+    return results
+
+
+def run_tournament(indices=None, battles=DEFAULT_BATTLES, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   seed=0) -> MatchupMatrix:
+    """
+    Turnaj každý s každým nad Pokémony snímku (indexy `indices`, výchozí celý Pokédex).
+    Práce se dělí po `chunk_size` řádcích mezi `workers` procesů (1 = bez procesů);
+    matice podílů výher se uloží jako `MatchupMatrix`.
+    """
+    snapshot = get_snapshot()
+    if indices is None:
+        indices = range(len(snapshot))
+    roster = [
+        (snapshot.pokedex_ids[i], snapshot.names[i], snapshot.stats_of(i), snapshot.type_names_of(i))
+        for i in indices
+    ]
+    rows = range(len(roster))
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    matrix = np.zeros((len(roster), len(roster)), dtype='<u2')
+
+    if workers == 1:
+        _init_worker(roster)
+        results = map(_play_rows, chunks, repeat(battles), repeat(seed))
+        for chunk in results:
+            for row, win_rates in chunk:
+                matrix[row] = win_rates
+    else:
+        # Workery nepotřebují DB ani Django; fork jim předá načtený kód bez nového setupu
+        connections.close_all()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(roster,)) as pool:
+            for chunk in pool.map(_play_rows, chunks, repeat(battles), repeat(seed)):
+                for row, win_rates in chunk:
+                    matrix[row] = win_rates
+
+    return MatchupMatrix.objects.create(
+        dex_version=snapshot.version,
+        engine_version=ENGINE_VERSION,
+        battles_per_pair=battles,
+        pokedex_ids=np.array([row[0] for row in roster], dtype='<u2').tobytes(),
+        win_rates=matrix.tobytes(),
+    )
+
+
+class MatchupTable:
+    """Matice soubojů připravená na dotazy: protivníci, kteří na Pokémona platí, a tier list"""
+
+    def __init__(self, matchups: MatchupMatrix):
+        self.matchups = matchups
+        self.pokedex_ids = np.frombuffer(bytes(matchups.pokedex_ids), dtype='<u2')
+        size = len(self.pokedex_ids)
+        self.win_rates = np.frombuffer(bytes(matchups.win_rates), dtype='<u2').reshape(size, size) / WIN_RATE_SCALE
+        self.positions = {int(pokedex_id): k for k, pokedex_id in enumerate(self.pokedex_ids)}
+
+    def __len__(self):
+        return len(self.pokedex_ids)
+
+    def win_rate(self, pokedex_id, opponent_id) -> Optional[float]:
+        """Podíl výher `pokedex_id` proti `opponent_id`, None pro Pokémona mimo turnaj"""
+        if pokedex_id not in self.positions or opponent_id not in self.positions:
+            return None
+        return float(self.win_rates[self.positions[pokedex_id], self.positions[opponent_id]])
+
+    def counters(self, pokedex_id, limit=10) -> List[Tuple[int, float]]:
+        """Pokémoni s nejvyšším podílem výher proti `pokedex_id` (pokedex_id, podíl výher)"""
+        if pokedex_id not in self.positions:
+            return []
+        column = self.win_rates[:, self.positions[pokedex_id]]
+        order = [k for k in np.argsort(-column, kind='stable') if self.pokedex_ids[k] != pokedex_id]
+        return [(int(self.pokedex_ids[k]), float(column[k])) for k in order[:limit]]
+
+    def scores(self) -> np.ndarray:
+        """Průměrný podíl výher každého Pokémona proti ostatním"""
+        if len(self) < 2:
+            return np.zeros(len(self))
+        return (self.win_rates.sum(axis=1) - self.win_rates.diagonal()) / (len(self) - 1)
+
+    def tier_list(self) -> Dict[str, List[Tuple[int, float]]]:
+        """Pokémoni seřazení podle průměrného podílu výher a rozdělení do stejně velkých tierů"""
+        scores = self.scores()
+        order = np.argsort(-scores, kind='stable')
+        tiers = {}
+        for tier, positions in zip(TIERS, np.array_split(order, len(TIERS))):
+            tiers[tier] = [(int(self.pokedex_ids[k]), round(float(scores[k]), 4)) for k in positions]
+        return tiers
+
+
+# Váha průměrného podílu výher členů týmu; rozhoduje jen mezi týmy se stejným pokrytím
+TIEBREAK = 0.01
+
+
+def _partitions(width: int, size: int):
+    """Rozdělení soupeřů 0..width-1 do `size` skupin (bitové masky, prázdné skupiny jsou 0)"""
+    def extend(opponent, blocks):
+        if opponent == width:
+            yield blocks + (0,) * (size - len(blocks))
+            return
+        bit = 1 << opponent
+        for b in range(len(blocks)):
+            yield from extend(opponent + 1, blocks[:b] + (blocks[b] | bit,) + blocks[b + 1:])
+        if len(blocks) < size:
+            yield from extend(opponent + 1, blocks + (bit,))
+
+    return extend(0, ())
+
+
+def recommend_team(table: MatchupTable, opponents: List[int], size=3,
+                   pool: Optional[Set[int]] = None) -> Tuple[List[int], float]:
+    """
+    Tým `size` Pokémonů z matice s nejlepším pokrytím soupeřů: pro každého soupeře
+    se počítá podíl výher nejlepšího člena týmu proti němu, skóre je průměr přes soupeře.
+    S `pool` vybírá jen z těchto pokedex_id (např. Pokémonů, kteří jsou ještě v Pokédexu).
+
+    Skóre týmu je součet příspěvků členů: každý člen pokryje skupinu soupeřů, proti
+    kterým je v týmu nejlepší, a přidá svůj průměr vážený `TIEBREAK`. Nejlepší tým je
+    tedy nejlepší rozdělení soupeřů do `size` skupin, kde každou pokryje jiný kandidát.
+    Pro každou z 2^m podmnožin soupeřů stačí znát `size` nejlepších kandidátů, takže
+    hledání je přesné a s velikostí matice roste jen lineárně (exponenciálně s počtem
+    soupeřů, kterých je nejvýš velikost týmu).
+    """
+    columns = [table.positions[pokedex_id] for pokedex_id in opponents]
+    candidates = [
+        k for k in range(len(table))
+        if int(table.pokedex_ids[k]) not in opponents and (pool is None or int(table.pokedex_ids[k]) in pool)
+    ]
+    if len(candidates) < size or not columns:
+        return [], 0.0
+
+    rates = table.win_rates[candidates][:, columns]
+    width = len(columns)
+    # Příspěvek kandidáta, který pokrývá podmnožinu soupeřů danou maskou [kandidát, maska]
+    masks = (np.arange(1 << width)[:, None] >> np.arange(width)) & 1
+    values = rates @ masks.T / width + TIEBREAK * rates.mean(axis=1)[:, None] / size
+    leaders = np.argsort(-values, axis=0, kind='stable')[:size].T.tolist()
+    top = values.max(axis=0).tolist()
+    values = values.tolist()
+
+    best_score = -1.0
+    best_team = []
+
+    def assign(blocks, team, score):
+        nonlocal best_score, best_team
+        if not blocks:
+            if score > best_score:
+                best_score, best_team = score, team
+            return
+        # Horní mez: zbylé skupiny pokryjí jejich nejlepší kandidáti bez ohledu na kolize
+        if score + sum(top[mask] for mask in blocks) <= best_score:
+            return
+        mask = blocks[0]
+        for k in leaders[mask]:
+            if k not in team:
+                assign(blocks[1:], team + [k], score + values[k][mask])
+
+    for blocks in _partitions(width, size):
+        assign(blocks, [], 0.0)
+
+    coverage = rates[best_team].max(axis=0).mean()
+    return [int(table.pokedex_ids[candidates[k]]) for k in best_team], round(float(coverage), 4)
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_matchup_table() -> Optional[MatchupTable]:
+    """Poslední matice soubojů aktuálního enginu; načte se jednou, dokud nevznikne novější"""
+    global _table
+    latest = MatchupMatrix.objects.filter(engine_version=ENGINE_VERSION).values_list('pk', 'created_at').first()
+    if latest is None:
+        return None
+
+    with _table_lock:
+        if _table is None or (_table.matchups.pk, _table.matchups.created_at) != latest:
+            _table = MatchupTable(MatchupMatrix.objects.get(pk=latest[0]))
+        return _table
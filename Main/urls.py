@@ -8,4 +8,10 @@ urlpatterns = [
     path('search/', views.search, name='search'),
     path('arena/', views.arena, name='arena'),
     path('battles/', views.battle_history, name='battle_history_list'),
+    path('battles/<int:battle_id>/', views.battle_detail, name='battle_detail'),
+    path('battles/<int:battle_id>/replay/', views.battle_replay, name='battle_replay'),
+    path('api/autocomplete', views.autocomplete, name='autocomplete'),
+    path('api/battle/odds', views.battle_odds, name='battle_odds'),
+    path('api/team/recommend', views.team_recommend, name='team_recommend'),
+    path('api/battles', views.battle_batch, name='battle_batch'),
 ]
\ No newline at end of file
@@ -1,12 +1,15 @@
 # views.py
+import json
 import random
 from django.shortcuts import render, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.contrib import messages
-from .models import Pokemon, PokemonType, BattleHistory
+from .models import BattleHistory
 from .services import (
     get_pokemon,
     get_all_pokemon,
@@ -14,11 +17,24 @@ from .services import (
     get_evolution_chain,
     get_pokemon_by_type,
     save_battle_history,
+    save_battles,
     get_popular_pokemon,
-    search_pokemon,
-    get_pokemon_from_db,
-    convert_db_to_api_format
+    search_pokemon
 )
+from .snapshot import get_snapshot
+from .search import get_search_index
+from .battle import (
+    ENGINE_VERSION,
+    REPLAY_UNAVAILABLE,
+    Combatant,
+    battle_log_lines,
+    new_seed,
+    replay_battle,
+    simulate,
+)
+from .battle_log import RESULT_MESSAGES, encode_teams, render_battle_log
+from .odds import DEFAULT_BATTLES, MAX_BATTLES, win_probabilities
+from .tournament import get_matchup_table, recommend_team
 
 
 def index(request):
@@ -27,40 +43,36 @@ def index(request):
     sort_by = request.GET.get('sort', 'pokedex_id')
     page = request.GET.get('page', 1)
     
-    # Použij ORM pro efektivní dotazy
-    pokemon_queryset = Pokemon.objects.prefetch_related('types').all()
+    # Celý Pokédex je ve sdíleném snímku, stránka se obejde bez SQL dotazů
+    snapshot = get_snapshot()
     
     # Filtrování podle typu
     if type_filter:
-        pokemon_queryset = pokemon_queryset.filter(types__name__iexact=type_filter)
+        indices = snapshot.indices_with_type(type_filter)
+    else:
+        indices = list(range(len(snapshot)))
     
-    # Řazení
+    # Řazení (snímek je seřazený podle čísla, sorted je stabilní)
     sort_options = {
-        'pokedex_id': 'pokedex_id',
-        'name': 'name',
-        'hp': '-hp',
-        'attack': '-attack',
-        'total_stats': '-hp',  # Placeholder - použijeme vlastní řazení
+        'pokedex_id': None,
+        'name': lambda i: snapshot.names[i],
+        'hp': lambda i: -snapshot.stats_of(i)[0],
+        'attack': lambda i: -snapshot.stats_of(i)[1],
+        'total_stats': lambda i: -snapshot.total_stats(i),
     }
     
-    if sort_by in sort_options:
-        if sort_by == 'total_stats':
-            # Řazení podle celkových statistik
-            pokemon_queryset = pokemon_queryset.extra(
-                select={'total': 'hp + attack + defense + special_attack + special_defense + speed'}
-            ).order_by('-total')
-        else:
-            pokemon_queryset = pokemon_queryset.order_by(sort_options[sort_by])
+    if sort_options.get(sort_by):
+        indices.sort(key=sort_options[sort_by])
     
     # Paginace
-    paginator = Paginator(pokemon_queryset, 20)
+    paginator = Paginator(indices, 20)
     pokemon_page = paginator.get_page(page)
     
-    # Konverze na API formát pro kompatibilitu s templates
-    pokemons = [convert_db_to_api_format(p) for p in pokemon_page]
+    # Konverze na API formát pro kompatibilitu s templates (karta zobrazuje jen jméno a obrázek)
+    pokemons = [snapshot.to_api(i, fields=()) for i in pokemon_page.object_list]
     
     # Získání všech typů pro filter
-    all_types = PokemonType.objects.all().order_by('name')
+    all_types = snapshot.all_types()
     
     context = {
         'pokemons': pokemons,
@@ -82,34 +94,24 @@ def index(request):
 
 def pokemon_detail(request, name):
     """Detail Pokémona s optimalizovanými dotazy"""
-    # Zkus najít v DB nejdřív
-    pokemon_db = get_pokemon_from_db(name)
+    # Zkus najít ve snímku Pokédexu nejdřív
+    snapshot = get_snapshot()
+    index = snapshot.index_of(name)
     
-    if pokemon_db:
-        pokemon = convert_db_to_api_format(pokemon_db)
-        
-        # Evoluce z DB
-        evolution_chain = []
-        current = pokemon_db
+    if index is not None:
+        pokemon = snapshot.to_api(index)
         
-        # Najdi celý evoluční řetězec
-        while current.evolves_from.exists():
-            current = current.evolves_from.first().from_pokemon
+        # Evoluce ze snímku - celá rodina včetně větví
+        evolution_chain = [snapshot.names[i] for i in snapshot.family_of(index)]
         
-        # Projdi řetězec vpřed
-        evolution_chain.append(current.name)
-        while current.evolves_to.exists():
-            current = current.evolves_to.first().to_pokemon
-            evolution_chain.append(current.name)
+        # Statistiky podobných Pokémonů (sdílí alespoň jeden typ)
+        pokemon_types = set(snapshot.type_ids_of(index))
+        similar_pokemon = [
+            i for i in range(len(snapshot))
+            if i != index and pokemon_types.intersection(snapshot.type_ids_of(i))
+        ][:5]
         
-        # Statistiky podobných Pokémonů
-        similar_pokemon = Pokemon.objects.filter(
-            types__in=pokemon_db.types.all()
-        ).exclude(
-            id=pokemon_db.id
-        ).distinct()[:5]
-        
-        similar_pokemon_api = [convert_db_to_api_format(p) for p in similar_pokemon]
+        similar_pokemon_api = [snapshot.to_api(i, fields=('types',)) for i in similar_pokemon]
         
     else:
         # Fallback na API
@@ -123,9 +125,10 @@ def pokemon_detail(request, name):
     
     # Historie bitev s tímto Pokémonem
     battle_history = []
-    if pokemon_db:
+    if index is not None:
+        pokemon_pk = snapshot.pks[index]
         recent_battles = BattleHistory.objects.filter(
-            Q(user_team=pokemon_db) | Q(cpu_team=pokemon_db)
+            Q(user_team=pokemon_pk) | Q(cpu_team=pokemon_pk)
         ).order_by('-created_at')[:5]
         
         battle_history = [
@@ -190,11 +193,12 @@ def compare_pokemons(request):
     
     # Doporučené porovnání
     recommended_pairs = []
-    if Pokemon.objects.exists():
-        random_pokemon = Pokemon.objects.order_by('?')[:4]
+    names = get_snapshot().names
+    if len(names) >= 2:
+        random_pokemon = random.sample(names, min(4, len(names)))
         recommended_pairs = [
-            (random_pokemon[0].name, random_pokemon[1].name),
-            (random_pokemon[2].name, random_pokemon[3].name) if len(random_pokemon) > 3 else None
+            (random_pokemon[0], random_pokemon[1]),
+            (random_pokemon[2], random_pokemon[3]) if len(random_pokemon) > 3 else None
         ]
         recommended_pairs = [pair for pair in recommended_pairs if pair]
     
@@ -214,8 +218,9 @@ def search(request):
     results = []
 
     if query:
-        # Vyhledávání, kde jméno obsahuje query (case-insensitive)
-        results = Pokemon.objects.filter(name__icontains=query).order_by('pokedex_id')[:20]
+        # Vyhledávání v trigramovém indexu jmen, seřazené podle relevance (snese i překlep)
+        search_index = get_search_index()
+        results = [search_index.snapshot.to_api(i, fields=()) for i in search_index.search(query, limit=20)]
 
     context = {
         'results': results,
@@ -224,50 +229,225 @@ def search(request):
     return render(request, 'search.html', context)
 
 
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MAX_LIMIT = 20
+ODDS_MAX_TEAM = 6
+RECOMMEND_TEAM_SIZE = 3
+RECOMMEND_BATTLES = 2000
+BATCH_MAX_BATTLES = 1000
+MAX_SEED = 2 ** 63 - 1
 
-def calculate_attack(attacker, defender):
-    """Výpočet útoku s type effectiveness"""
-    attack = next(stat['base_stat'] for stat in attacker['stats'] if stat['stat']['name'] == 'attack')
-    defense = next(stat['base_stat'] for stat in defender['stats'] if stat['stat']['name'] == 'defense')
-    
-    # Základní damage
-    damage = max(0, attack - defense + random.randint(-5, 5))
-    
-    # Type effectiveness (zjednodušené)
-    attacker_types = [t['type']['name'] for t in attacker.get('types', [])]
-    defender_types = [t['type']['name'] for t in defender.get('types', [])]
-    
-    # Jednoduchá type effectiveness
-    effectiveness = 1.0
-    type_chart = {
-        'fire': {'grass': 2.0, 'water': 0.5, 'fire': 0.5},
-        'water': {'fire': 2.0, 'grass': 0.5, 'water': 0.5},
-        'grass': {'water': 2.0, 'fire': 0.5, 'grass': 0.5},
-        'electric': {'water': 2.0, 'grass': 0.5, 'electric': 0.5},
-    }
-    
-    for att_type in attacker_types:
-        for def_type in defender_types:
-            if att_type in type_chart and def_type in type_chart[att_type]:
-                effectiveness *= type_chart[att_type][def_type]
-    
-    return int(damage * effectiveness)
+
+@cache_control(public=True, max_age=300)
+def autocomplete(request):
+    """Našeptávač jmen pro formuláře - prefix v seřazeném poli jmen (binární vyhledávání)"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+
+    search_index = get_search_index()
+    snapshot = search_index.snapshot
+    results = [
+        {
+            'name': snapshot.names[i],
+            'id': snapshot.pokedex_ids[i],
+            'sprite': snapshot.sprite_urls[i] or None,
+        }
+        for i in search_index.prefix(query, limit=limit)
+    ]
+    return JsonResponse({'results': results})
+
+
+def _team_from_query(snapshot, value):
+    """Indexy Pokémonů týmu ze seznamu jmen nebo čísel oddělených čárkou a seznam neznámých jmen"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    indices = [snapshot.index_of(name) for name in names]
+    return [i for i in indices if i is not None], [name for name, i in zip(names, indices) if i is None]
+
+
+def battle_odds(request):
+    """Pravděpodobnost výhry týmu `team` proti `vs` z hromadné simulace bitev"""
+    snapshot = get_snapshot()
+    team, unknown_team = _team_from_query(snapshot, request.GET.get('team', ''))
+    vs, unknown_vs = _team_from_query(snapshot, request.GET.get('vs', ''))
+
+    if unknown_team or unknown_vs:
+        return JsonResponse({'error': 'Neznámí Pokémoni.', 'unknown': unknown_team + unknown_vs}, status=404)
+    if not 1 <= len(team) <= ODDS_MAX_TEAM or not 1 <= len(vs) <= ODDS_MAX_TEAM:
+        return JsonResponse({'error': f'Každý tým musí mít 1 až {ODDS_MAX_TEAM} Pokémonů.'}, status=400)
+    try:
+        battles = min(max(int(request.GET.get('battles', DEFAULT_BATTLES)), 1), MAX_BATTLES)
+    except ValueError:
+        battles = DEFAULT_BATTLES
+
+    odds = win_probabilities(
+        [Combatant.from_snapshot(snapshot, i) for i in team],
+        [Combatant.from_snapshot(snapshot, i) for i in vs],
+        battles,
+    )
+    return JsonResponse({
+        'team': [snapshot.names[i] for i in team],
+        'vs': [snapshot.names[i] for i in vs],
+        **odds,
+    })
+
+
+def team_recommend(request):
+    """Doporučený tým proti `vs` (bez `vs` proti náhodnému týmu) podle matice soubojů"""
+    table = get_matchup_table()
+    if table is None:
+        return JsonResponse({'error': 'Matice soubojů zatím není spočítaná (manage.py run_tournament).'}, status=503)
+
+    snapshot = get_snapshot()
+    # Matice může být starší než Pokédex; doporučují se jen Pokémoni, kteří v něm ještě jsou
+    pool = {pokedex_id for pokedex_id in table.positions if snapshot.index_of(pokedex_id) is not None}
+    vs, unknown = _team_from_query(snapshot, request.GET.get('vs', ''))
+    if unknown:
+        return JsonResponse({'error': 'Neznámí Pokémoni.', 'unknown': unknown}, status=404)
+    if not vs:
+        pokedex_ids = random.sample(sorted(pool), min(RECOMMEND_TEAM_SIZE, len(pool)))
+        vs = [snapshot.index_of(pokedex_id) for pokedex_id in pokedex_ids]
+    if len(vs) > ODDS_MAX_TEAM:
+        return JsonResponse({'error': f'Soupeř může mít nejvýš {ODDS_MAX_TEAM} Pokémonů.'}, status=400)
+
+    opponents = [snapshot.pokedex_ids[i] for i in vs]
+    outside = [snapshot.names[i] for i, pokedex_id in zip(vs, opponents) if pokedex_id not in table.positions]
+    if outside:
+        return JsonResponse({'error': 'Pokémoni mimo matici soubojů.', 'unknown': outside}, status=404)
+
+    team, coverage = recommend_team(table, opponents, RECOMMEND_TEAM_SIZE, pool)
+    if not team:
+        return JsonResponse({'error': 'V matici soubojů není dost Pokémonů na tým.'}, status=400)
+    team = [snapshot.index_of(pokedex_id) for pokedex_id in team]
+
+    odds = win_probabilities(
+        [Combatant.from_snapshot(snapshot, i) for i in team],
+        [Combatant.from_snapshot(snapshot, i) for i in vs],
+        RECOMMEND_BATTLES,
+    )
+    return JsonResponse({
+        'team': [snapshot.names[i] for i in team],
+        'vs': [snapshot.names[i] for i in vs],
+        'coverage': coverage,
+        'win': odds['win'],
+        'draw': odds['draw'],
+        'lose': odds['lose'],
+    })
+
+
+def _battle_from_spec(snapshot, spec):
+    """Seed, tým a soupeř (indexy snímku) jedné bitvy z JSON zadání; bez `vs` náhodný soupeř"""
+    if not isinstance(spec, dict):
+        raise ValueError('Bitva musí být objekt s klíči team, vs a seed.')
+
+    seed = spec.get('seed')
+    if seed is None:
+        seed = new_seed()
+    elif not isinstance(seed, int) or isinstance(seed, bool) or not 0 <= seed <= MAX_SEED:
+        raise ValueError(f'Seed musí být celé číslo 0 až {MAX_SEED}.')
+
+    teams = []
+    for key in ('team', 'vs'):
+        names = spec.get(key)
+        if names is None and key == 'vs':
+            available = [i for i in range(len(snapshot)) if i not in teams[0]]
+            teams.append(random.Random(seed).sample(available, min(3, len(available))))
+            continue
+        if not isinstance(names, list) or not 1 <= len(names) <= ODDS_MAX_TEAM:
+            raise ValueError(f'{key} musí být seznam 1 až {ODDS_MAX_TEAM} Pokémonů.')
+        indices = [snapshot.index_of(name) for name in names]
+        unknown = [name for name, i in zip(names, indices) if i is None]
+        if unknown:
+            raise ValueError(f'Neznámí Pokémoni: {", ".join(map(str, unknown))}')
+        teams.append(indices)
+
+    if not teams[1]:
+        raise ValueError('Soupeř nemá žádné Pokémony.')
+    return seed, teams[0], teams[1]
+
+
+@csrf_exempt
+@require_POST
+def battle_batch(request):
+    """
+    Hromadné bitvy pro boty: JSON {"battles": [{"team": [...], "vs": [...], "seed": 1}, ...]}.
+    Bitvy se odehrají enginem arény a uloží jednou dávkou (seed a týmy, průběh jde přehrát);
+    s ?format=ndjson nebo Accept: application/x-ndjson se výsledky streamují po řádcích.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Neplatný JSON.'}, status=400)
+
+    specs = payload.get('battles') if isinstance(payload, dict) else payload
+    if not isinstance(specs, list) or not 1 <= len(specs) <= BATCH_MAX_BATTLES:
+        return JsonResponse({'error': f'Očekávám seznam 1 až {BATCH_MAX_BATTLES} bitev.'}, status=400)
+
+    snapshot = get_snapshot()
+    battles = []
+    for position, spec in enumerate(specs):
+        try:
+            battles.append(_battle_from_spec(snapshot, spec))
+        except ValueError as e:
+            return JsonResponse({'error': str(e), 'battle': position}, status=400)
+
+    combatants = {}
+
+    def combatant(i):
+        if i not in combatants:
+            combatants[i] = Combatant.from_snapshot(snapshot, i)
+        return combatants[i]
+
+    outcomes = [
+        simulate([combatant(i) for i in team], [combatant(i) for i in vs], random.Random(seed), record=False)
+        for seed, team, vs in battles
+    ]
+    saved = save_battles([
+        {
+            'user_team': [snapshot.names[i] for i in team],
+            'cpu_team': [snapshot.names[i] for i in vs],
+            'result': outcome.result,
+            'seed': seed,
+            'engine_version': ENGINE_VERSION,
+            'teams': encode_teams([snapshot.pokedex_ids[i] for i in team], [snapshot.pokedex_ids[i] for i in vs]),
+        }
+        for (seed, team, vs), outcome in zip(battles, outcomes)
+    ])
+
+    results = (
+        {
+            'id': battle.pk,
+            'seed': seed,
+            'result': outcome.result,
+            'team': [snapshot.names[i] for i in team],
+            'vs': [snapshot.names[i] for i in vs],
+            'hp': [outcome.user_hp, outcome.cpu_hp],
+        }
+        for battle, (seed, team, vs), outcome in zip(saved, battles, outcomes)
+    )
+
+    if request.GET.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        lines = (json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    return JsonResponse({'results': list(results)}, json_dumps_params={'ensure_ascii': False})
 
 
 @csrf_exempt
 def arena(request):
     """Vylepšená aréna s výběrem Pokémonů a stránkováním"""
     
-    # Načti všechny Pokémony z DB
-    all_pokemon_db = Pokemon.objects.prefetch_related('types').order_by('pokedex_id')
-    paginator = Paginator(all_pokemon_db, 30)  # 30 Pokémonů na stránku
+    # Všichni Pokémoni ze snímku Pokédexu
+    snapshot = get_snapshot()
+    paginator = Paginator(range(len(snapshot)), 30)  # 30 Pokémonů na stránku
 
     # Získání čísla stránky z GET parametru
     page_number = request.GET.get('page') or 1
     page_obj = paginator.get_page(page_number)
 
     # Převedení na API formát pro použití v šabloně
-    all_pokemon = [convert_db_to_api_format(p) for p in page_obj]
+    all_pokemon = [snapshot.to_api(i, fields=('stats',)) for i in page_obj.object_list]
 
     # Inicializace proměnných
     battle_log = []
@@ -282,82 +462,34 @@ def arena(request):
         if len(selected) != 3:
             messages.error(request, "Musíš vybrat přesně 3 Pokémony!")
         else:
+            # Výběr soupeře i celá bitva jdou ze seedu, uloží se jen seed a týmy
+            seed = new_seed()
             user_team = [get_pokemon(name) for name in selected]
             available_names = [p['name'] for p in all_pokemon if p['name'] not in selected]
-            cpu_names = random.sample(available_names, 3)
+            cpu_names = random.Random(seed).sample(available_names, 3)
             cpu_team = [get_pokemon(name) for name in cpu_names]
             
-            # Inicializace HP
-            for p in user_team + cpu_team:
-                base_hp = next(stat['base_stat'] for stat in p['stats'] if stat['stat']['name'] == 'hp')
-                p['hp'] = base_hp
-                p['max_hp'] = base_hp
-            
-            battle_log.append("=== PRŮBĚH BITVY ===")
-            
-            # Bitva
-            user_idx = 0
-            cpu_idx = 0
+            combatants = [Combatant.from_api(p) for p in user_team + cpu_team]
+            outcome = simulate(combatants[:3], combatants[3:], random.Random(seed))
+            result = outcome.result
+            winner = RESULT_MESSAGES[result]
             
-            while user_idx < len(user_team) and cpu_idx < len(cpu_team):
-                current_user = user_team[user_idx]
-                current_cpu = cpu_team[cpu_idx]
-                
-                battle_log.append(f"🆚 {current_user['name'].capitalize()} vs {current_cpu['name'].capitalize()}")
-                
-                while current_user['hp'] > 0 and current_cpu['hp'] > 0:
-                    user_speed = next(stat['base_stat'] for stat in current_user['stats'] if stat['stat']['name'] == 'speed')
-                    cpu_speed = next(stat['base_stat'] for stat in current_cpu['stats'] if stat['stat']['name'] == 'speed')
-                    
-                    if user_speed >= cpu_speed:
-                        damage = calculate_attack(current_user, current_cpu)
-                        current_cpu['hp'] -= damage
-                        current_cpu['hp'] = max(0, current_cpu['hp'])
-                        battle_log.append(f"⚔️ {current_user['name'].capitalize()} útočí za {damage} poškození! (Oponent HP: {current_cpu['hp']})")
-                        
-                        if current_cpu['hp'] > 0:
-                            damage = calculate_attack(current_cpu, current_user)
-                            current_user['hp'] -= damage
-                            current_user['hp'] = max(0, current_user['hp'])
-                            battle_log.append(f"💥 {current_cpu['name'].capitalize()} útočí za {damage} poškození! (Tvůj HP: {current_user['hp']})")
-                    else:
-                        damage = calculate_attack(current_cpu, current_user)
-                        current_user['hp'] -= damage
-                        current_user['hp'] = max(0, current_user['hp'])
-                        battle_log.append(f"💥 {current_cpu['name'].capitalize()} útočí za {damage} poškození! (Tvůj HP: {current_user['hp']})")
-                        
-                        if current_user['hp'] > 0:
-                            damage = calculate_attack(current_user, current_cpu)
-                            current_cpu['hp'] -= damage
-                            current_cpu['hp'] = max(0, current_cpu['hp'])
-                            battle_log.append(f"⚔️ {current_user['name'].capitalize()} útočí za {damage} poškození! (Oponent HP: {current_cpu['hp']})")
-                
-                if current_user['hp'] <= 0:
-                    battle_log.append(f"💀 {current_user['name'].capitalize()} byl poražen!")
-                    user_idx += 1
-                if current_cpu['hp'] <= 0:
-                    battle_log.append(f"💀 {current_cpu['name'].capitalize()} byl poražen!")
-                    cpu_idx += 1
+            # HP po bitvě pro zobrazení týmů
+            for p, combatant, hp in zip(user_team + cpu_team, combatants, outcome.user_hp + outcome.cpu_hp):
+                p['max_hp'] = combatant.hp
+                p['hp'] = hp
             
-            # Výsledek
-            if user_idx >= len(user_team):
-                winner = "💀 Počítač vyhrál!"
-                result = "lose"
-            elif cpu_idx >= len(cpu_team):
-                winner = "🎉 Tví pokémoni vyhráli!"
-                result = "win"
-            else:
-                winner = "🤝 Remíza!"
-                result = "draw"
-            
-            battle_log.append("=" * 30)
-            battle_log.append(winner)
+            battle_log = render_battle_log(
+                [p['name'] for p in user_team], [p['name'] for p in cpu_team], outcome.events, result
+            )
             
             battle = save_battle_history(
                 user_team=[p['name'] for p in user_team],
                 cpu_team=[p['name'] for p in cpu_team],
                 result=result,
-                battle_log=battle_log
+                seed=seed,
+                engine_version=ENGINE_VERSION,
+                teams=encode_teams([p['id'] for p in user_team], [p['id'] for p in cpu_team]),
             )
             
             if battle:
@@ -391,9 +523,10 @@ def arena(request):
 
 def battle_history(request):
     """Zobrazení historie bitev"""
+    # Průběh se v seznamu nezobrazuje, načte se až v detailu bitvy
     battles = BattleHistory.objects.prefetch_related(
         'user_team', 'cpu_team'
-    ).order_by('-created_at')
+    ).defer('battle_log', 'battle_events').order_by('-created_at')
     
     # Paginace
     paginator = Paginator(battles, 10)
@@ -429,7 +562,26 @@ def battle_detail(request, battle_id):
         'battle': battle,
         'user_team': battle.user_team.all(),
         'cpu_team': battle.cpu_team.all(),
-        'battle_log': battle.battle_log.split('\n')
+        'battle_log': battle_log_lines(battle)
     }
     
-    return render(request, 'battle_detail.html', context)
\ No newline at end of file
+    return render(request, 'battle_detail.html', context)
+
+
+def battle_replay(request, battle_id):
+    """Znovu odehraje uloženou bitvu ze seedu (pro ladění enginu)"""
+    battle = get_object_or_404(BattleHistory, id=battle_id)
+    if battle.seed is None:
+        return JsonResponse({'error': 'Bitva nemá seed, nelze ji přehrát.'}, status=404)
+
+    replayed = replay_battle(battle)
+    if replayed is None:
+        return JsonResponse({'error': REPLAY_UNAVAILABLE}, status=410, json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({
+        'id': battle.id,
+        'seed': battle.seed,
+        'engine_version': battle.engine_version,
+        'result': battle.result,
+        'replayed_result': replayed.result,
+        'battle_log': battle_log_lines(battle),
+    }, json_dumps_params={'ensure_ascii': False})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -122,6 +123,40 @@ STATICFILES_DIRS = [
 ]
 
 
+# Cache
+# Sdílená cache pro všechny workery (Redis, vyžaduje balíček redis); bez ní LocMem v rámci procesu
+
+if os.environ.get('POKEDEX_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['POKEDEX_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'pokedex',
+        }
+    }
+
+# Jak dlouho (s) si worker pamatuje verzi dat z DB; změnu z jiného procesu uvidí nejpozději po této době
+DEX_VERSION_TTL = 2
+
+
+# PokeAPI client
+POKEAPI_BASE_URL = 'https://pokeapi.co/api/v2/'
+POKEAPI_TIMEOUT = (3.05, 10)  # (connect, read) v sekundách
+POKEAPI_RETRIES = 3
+POKEAPI_BACKOFF = 0.5
+POKEAPI_POOL_SIZE = 20
+
+
+# Binární snímek Pokédexu sdílený workery přes mmap (None = jen v paměti procesu)
+DEX_SNAPSHOT_PATH = BASE_DIR / 'dex.snapshot'
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,54 @@
+// Našeptávač jmen Pokémonů pro pole s atributem data-autocomplete (URL endpointu)
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('input[data-autocomplete]').forEach(function (input, n) {
+    const list = document.createElement('datalist');
+    list.id = 'autocomplete-list-' + n;
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.after(list);
+
+    const cache = {};
+    let timer = null;
+    let lastQuery = '';
+
+    function render(results) {
+      list.replaceChildren(...results.map(function (p) {
+        const option = document.createElement('option');
+        option.value = p.name;
+        option.label = '#' + p.id;
+        return option;
+      }));
+    }
+
+    input.addEventListener('input', function () {
+      const query = input.value.trim().toLowerCase();
+      clearTimeout(timer);
+      if (!query) {
+        return;
+      }
+      // Výběr z nabídky vyvolá událost, na kterou mohou stránky reagovat (aréna)
+      if (Array.from(list.options).some(option => option.value === query)) {
+        input.dispatchEvent(new CustomEvent('pokemon-selected', { detail: query, bubbles: true }));
+      }
+      if (query === lastQuery) {
+        return;
+      }
+      lastQuery = query;
+      if (cache[query]) {
+        render(cache[query]);
+        return;
+      }
+      timer = setTimeout(function () {
+        fetch(input.dataset.autocomplete + '?q=' + encodeURIComponent(query))
+          .then(response => response.ok ? response.json() : { results: [] })
+          .then(function (data) {
+            cache[query] = data.results;
+            if (input.value.trim().toLowerCase() === query) {
+              render(data.results);
+            }
+          })
+          .catch(() => {});
+      }, 120);
+    });
+  });
+});